@@ -0,0 +1,118 @@
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+
+
+def config_fingerprint(config) -> str:
+    """Huella estable de una configuración de análisis (independiente del orden de campos)"""
+    if config is None:
+        return "default"
+    if hasattr(config, "model_dump"):
+        data = config.model_dump(mode="json")
+    elif hasattr(config, "dict"):
+        data = config.dict()
+    else:
+        data = dict(config)
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def data_fingerprint(df: pd.DataFrame) -> Tuple:
+    """
+    Huella de una ventana de velas: tamaño, primera y última vela y OHLCV de la última.
+
+    Cambia cuando cierra una vela nueva y también cuando se mueve la vela en
+    formación, así que un resultado cacheado nunca corresponde a otros precios.
+    """
+    last_values = tuple(
+        float(df[column].iat[-1])
+        for column in ('Open', 'High', 'Low', 'Close', 'Volume')
+        if column in df.columns
+    )
+    return (len(df), df.index[0], df.index[-1]) + last_values
+
+
+class AnalysisCache:
+    """
+    Caché LRU con expiración (TTL) para resultados de análisis.
+
+    Guarda tanto la señal final de `analyze_symbol` como el resultado de cada
+    analizador por separado, de modo que cambiar un peso o el umbral sólo
+    recalcula la confluencia.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor); distingue un None cacheado de un fallo"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return False, None
+
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return True, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Eliminar todas las entradas o las de un símbolo (claves con el símbolo en 2ª posición)"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if isinstance(k, tuple) and len(k) > 1 and k[1] == symbol]:
+                del self._entries[key]
+
+    def clear(self):
+        self.invalidate()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Caché compartida por las instancias de ConfluenceDetector del proceso
+analysis_cache = AnalysisCache()
@@ -0,0 +1,334 @@
+import pandas as pd
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import math
+import time
+
+from .analysis_cache import config_fingerprint
+from .confluence_detector import ConfluenceDetector
+
+# (par, temporalidad, huella de configuración, modo de disparo)
+GroupKey = Tuple[str, str, str, str]
+
+# Descarga de velas: (par, temporalidad, cantidad) -> DataFrame OHLCV
+DataFetcher = Callable[[str, str, int], Awaitable[Optional[pd.DataFrame]]]
+
+# Entrega de resultados: (subscriber_id, par, temporalidad, config, señal)
+ResultCallback = Callable[[str, str, str, Any, Any], Awaitable[None]]
+
+# Throttles intrabar permitidos, en múltiplos del mínimo (`intrabar_throttle`): el
+# valor pedido se ajusta al siguiente para que los suscriptores compartan grupo
+INTRABAR_THROTTLE_STEPS = (1, 2, 4, 8)
+
+# Hora actual del servidor de MT5 (epoch), p. ej. la del último tick
+ServerClock = Callable[[], Awaitable[Optional[float]]]
+
+
+# Duración de cada vela en segundos (MN1 se calcula por calendario)
+TIMEFRAME_SECONDS = {
+    "M1": 60, "M5": 300, "M15": 900, "M30": 1800,
+    "H1": 3600, "H4": 14400, "D1": 86400, "W1": 604800,
+}
+
+
+def next_bar_close(bar_open: int, timeframe: str) -> int:
+    """Hora de cierre (epoch del servidor) de la vela que abrió en `bar_open`"""
+    if timeframe == "MN1":
+        opened = pd.Timestamp(bar_open, unit="s")
+        return int((opened + pd.offsets.MonthBegin(1)).timestamp())
+    return bar_open + TIMEFRAME_SECONDS.get(timeframe, 3600)
+
+
+class AnalysisGroup:
+    """
+    Análisis único (par, temporalidad, config, modo) compartido por varios suscriptores.
+
+    Modo al cierre de vela (`intrabar_throttle=None`): se analiza una vez por vela
+    nueva. Modo intrabar: se re-analiza la vela en formación como máximo cada
+    `intrabar_throttle` segundos si el precio cambió.
+    """
+
+    def __init__(self, pair: str, timeframe: str, fingerprint: str, config,
+                 intrabar_throttle: Optional[float] = None):
+        self.pair = pair
+        self.timeframe = timeframe
+        self.fingerprint = fingerprint
+        self.config = config
+        self.intrabar_throttle = intrabar_throttle
+        self.subscribers: Dict[str, ResultCallback] = {}
+        self.last_bar_time: Optional[int] = None
+        self.last_close: Optional[float] = None
+        # Cierre esperado de la vela actual (hora del servidor), sólo modo al cierre
+        self.close_at: Optional[int] = None
+        # Próxima ejecución mínima (reloj del planificador); 0 = lo antes posible
+        self.next_run = 0.0
+
+    @property
+    def mode(self) -> str:
+        return "bar_close" if self.intrabar_throttle is None else f"intrabar:{self.intrabar_throttle:g}"
+
+    @property
+    def key(self) -> GroupKey:
+        return (self.pair, self.timeframe, self.fingerprint, self.mode)
+
+
+class AnalysisScheduler:
+    """
+    Planificador central del análisis en tiempo real.
+
+    Agrupa las suscripciones por (par, temporalidad, huella de config, modo) y
+    ejecuta cada análisis único una sola vez, repartiendo el resultado a todos
+    los suscriptores del grupo. En lugar de sondear a intervalo fijo, cada grupo
+    duerme hasta el cierre de su próxima vela (+ `bar_close_delay`); el modo
+    intrabar re-analiza cada `intrabar_throttle` segundos. El número de análisis
+    simultáneos está acotado por `max_concurrent`.
+
+    Las horas de las velas vienen en hora del servidor de MT5: el desfase con
+    `clock` se estima con `server_clock` (hora del último tick) y con las velas
+    recibidas. Si se despierta antes de que exista la vela nueva, reintenta en
+    intervalos cortos.
+    """
+
+    def __init__(self, detector: ConfluenceDetector, fetch_data: DataFetcher,
+                 max_concurrent: int = 10, bars: int = 200, bar_close_delay: float = 2.0,
+                 intrabar_throttle: float = 15.0, clock: Callable[[], float] = time.time,
+                 server_clock: Optional[ServerClock] = None):
+        self.detector = detector
+        self.fetch_data = fetch_data
+        self.server_clock = server_clock
+        self.bars = bars
+        self.bar_close_delay = bar_close_delay
+        self.intrabar_throttle = intrabar_throttle
+        self.clock = clock
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._groups: Dict[GroupKey, AnalysisGroup] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        # Hora del servidor - clock (cota inferior, se ajusta con cada tick/vela observados)
+        self._server_offset: Optional[float] = None
+        self.logger = logging.getLogger(__name__)
+        self.stats = {
+            'cycles': 0,
+            'fetches': 0,
+            'analyses': 0,
+            'skipped_same_bar': 0,
+            'early_wakeups': 0,
+            'deliveries': 0,
+            'errors': 0,
+        }
+
+    # ========== SUSCRIPCIONES ==========
+
+    def intrabar_throttle_for(self, throttle: Any = None) -> float:
+        """
+        Throttle intrabar permitido para el valor pedido: nunca menor que
+        `intrabar_throttle` y ajustado a INTRABAR_THROTTLE_STEPS. ValueError si
+        no es un número positivo.
+        """
+        if throttle is None:
+            return self.intrabar_throttle
+        try:
+            value = float(throttle)
+        except (TypeError, ValueError):
+            raise ValueError(f"Throttle inválido: {throttle!r}")
+        if not math.isfinite(value) or value <= 0:
+            raise ValueError(f"Throttle inválido: {throttle!r}")
+
+        for step in INTRABAR_THROTTLE_STEPS:
+            if value <= self.intrabar_throttle * step:
+                return self.intrabar_throttle * step
+        return self.intrabar_throttle * INTRABAR_THROTTLE_STEPS[-1]
+
+    def subscribe(self, subscriber_id: str, pair: str, timeframe: str, config,
+                  callback: ResultCallback, intrabar: bool = False,
+                  throttle: Optional[float] = None) -> GroupKey:
+        """
+        Registrar un suscriptor; si ya seguía el par/temporalidad con otra config
+        o modo, se reemplaza. `intrabar=True` analiza la vela en formación cada
+        `throttle` segundos (ajustado con intrabar_throttle_for).
+        """
+        fingerprint = config_fingerprint(config)
+        group = AnalysisGroup(pair, timeframe, fingerprint, config,
+                              intrabar_throttle=self.intrabar_throttle_for(throttle) if intrabar else None)
+        self._remove_subscriber(subscriber_id, pair, timeframe, keep=group.key)
+
+        group = self._groups.setdefault(group.key, group)
+        group.subscribers[subscriber_id] = callback
+
+        self._ensure_running()
+        self._wakeup.set()
+        return group.key
+
+    def unsubscribe(self, subscriber_id: str, pair: Optional[str] = None,
+                    timeframe: Optional[str] = None):
+        """Quitar un suscriptor (de todo, de un par o de un par y temporalidad)"""
+        self._remove_subscriber(subscriber_id, pair, timeframe)
+        if not self._groups:
+            self.stop()
+
+    def _remove_subscriber(self, subscriber_id: str, pair: Optional[str],
+                           timeframe: Optional[str], keep: Optional[GroupKey] = None):
+        for key, group in list(self._groups.items()):
+            if pair is not None and group.pair != pair:
+                continue
+            if timeframe is not None and group.timeframe != timeframe:
+                continue
+            if keep is not None and key == keep:
+                continue
+            group.subscribers.pop(subscriber_id, None)
+            if not group.subscribers:
+                del self._groups[key]
+
+    # ========== LOOP ==========
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """Dormir hasta el próximo grupo pendiente (cierre de vela o throttle intrabar)"""
+        while self._groups:
+            try:
+                now = self.clock()
+                next_run = min(self._due_at(group) for group in self._groups.values())
+                if next_run <= now:
+                    await self.run_once()
+                    continue
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=next_run - now)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error en ciclo de análisis: {e}")
+                await asyncio.sleep(5)
+
+    async def run_once(self, force: bool = False):
+        """Un ciclo: una descarga por serie con grupos pendientes (todas si `force`)"""
+        self.stats['cycles'] += 1
+        await self._sync_server_clock()
+        now = self.clock()
+        series: Dict[Tuple[str, str], List[AnalysisGroup]] = defaultdict(list)
+        for group in list(self._groups.values()):
+            if force or self._due_at(group) <= now:
+                series[(group.pair, group.timeframe)].append(group)
+
+        await asyncio.gather(*(
+            self._process_series(pair, timeframe, groups)
+            for (pair, timeframe), groups in series.items()
+        ))
+
+    async def _process_series(self, pair: str, timeframe: str, groups: List[AnalysisGroup]):
+        try:
+            data = await self.fetch_data(pair, timeframe, self.bars)
+            self.stats['fetches'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error obteniendo datos para {pair} {timeframe}: {e}")
+            data = None
+
+        now = self.clock()
+        if data is None or data.empty:
+            self.logger.warning(f"No se pudieron obtener datos para {pair} en tiempo real")
+            for group in groups:
+                group.next_run = now + self._retry_delay(timeframe)
+            return
+
+        bar_time = int(data.index[-1].timestamp())
+        last_close = float(data['Close'].iloc[-1])
+        # La vela en formación ya abrió: hora del servidor >= bar_time
+        self._observe_server_time(bar_time, now)
+
+        due = []
+        for group in groups:
+            if group.intrabar_throttle is not None:
+                group.next_run = now + group.intrabar_throttle
+                changed = (bar_time, last_close) != (group.last_bar_time, group.last_close)
+            else:
+                changed = bar_time != group.last_bar_time
+                if changed:
+                    group.close_at = next_bar_close(bar_time, timeframe)
+                    group.next_run = 0.0
+                else:
+                    # Despertó antes de publicarse la vela nueva: reintentar pronto
+                    self.stats['early_wakeups'] += 1
+                    group.next_run = now + self._retry_delay(timeframe)
+
+            if changed:
+                due.append(group)
+            else:
+                self.stats['skipped_same_bar'] += 1
+
+        await asyncio.gather(*(self._analyze_group(group, data, bar_time, last_close) for group in due))
+
+    def _due_at(self, group: AnalysisGroup) -> float:
+        """Momento (en `clock`) de la próxima ejecución del grupo"""
+        if group.intrabar_throttle is not None or group.close_at is None:
+            return group.next_run
+        close_at = group.close_at - (self._server_offset or 0.0) + self.bar_close_delay
+        return max(close_at, group.next_run)
+
+    def _observe_server_time(self, server_time: float, now: float):
+        if self._server_offset is None or server_time - now > self._server_offset:
+            self._server_offset = server_time - now
+
+    async def _sync_server_clock(self):
+        if self.server_clock is None:
+            return
+        try:
+            server_time = await self.server_clock()
+        except Exception as e:
+            self.logger.debug(f"No se pudo leer la hora del servidor: {e}")
+            return
+        if server_time:
+            self._observe_server_time(float(server_time), self.clock())
+
+    @staticmethod
+    def _retry_delay(timeframe: str) -> float:
+        return min(max(TIMEFRAME_SECONDS.get(timeframe, 3600) * 0.05, 1.0), 30.0)
+
+    async def _analyze_group(self, group: AnalysisGroup, data: pd.DataFrame,
+                             bar_time: int, last_close: float):
+        try:
+            async with self._semaphore:
+                signal = await self.detector.analyze_symbol(group.pair, data, group.timeframe, group.config)
+            self.stats['analyses'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error analizando par en tiempo real {group.pair}: {e}")
+            return
+
+        group.last_bar_time = bar_time
+        group.last_close = last_close
+        await self._fan_out(group, signal)
+
+    async def _fan_out(self, group: AnalysisGroup, signal):
+        for subscriber_id, callback in list(group.subscribers.items()):
+            try:
+                await callback(subscriber_id, group.pair, group.timeframe, group.config, signal)
+                self.stats['deliveries'] += 1
+            except Exception as e:
+                self.logger.error(f"Error entregando análisis a {subscriber_id}: {e}")
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'groups': len(self._groups),
+            'subscriptions': sum(len(g.subscribers) for g in self._groups.values()),
+            'server_offset': self._server_offset,
+            'next_runs': {
+                f"{g.pair}:{g.timeframe}:{g.mode}": round(self._due_at(g) - self.clock(), 1)
+                for g in self._groups.values()
+            },
+        }
@@ -0,0 +1,323 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+import time
+
+from .confluence_detector import ConfluenceDetector
+from database.models import SignalType
+
+# Señal cruda: (posición de la vela, dirección +1/-1, entrada, stop loss, take profit)
+RawSignal = Tuple[int, int, float, float, float]
+
+
+@dataclass
+class BacktestReport:
+    """Resultado de un backtest (señales de la confluencia o de una estrategia)"""
+    name: str
+    trades: int
+    wins: int
+    losses: int
+    win_rate: float
+    total_r: float
+    avg_r: float
+    profit_factor: float
+    max_drawdown: float  # Fracción del pico de capital
+    final_equity: float  # Capital final (inicial = 1.0)
+    signals: int  # Señales emitidas (incluye las que coincidían con una operación abierta)
+    trade_list: List[Dict] = field(default_factory=list)
+
+    def to_dict(self, include_trades: bool = False) -> Dict:
+        data = {k: v for k, v in self.__dict__.items() if k != 'trade_list'}
+        if include_trades:
+            data['trade_list'] = self.trade_list
+        return data
+
+
+@dataclass
+class BacktestResult:
+    """Reporte de la confluencia, reporte por estrategia y rendimiento del recorrido"""
+    symbol: str
+    timeframe: str
+    bars: int
+    evaluated_bars: int
+    elapsed_seconds: float
+    bars_per_second: float
+    confluence: BacktestReport
+    strategies: Dict[str, BacktestReport]
+
+    def to_dict(self, include_trades: bool = False) -> Dict:
+        return {
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'bars': self.bars,
+            'evaluated_bars': self.evaluated_bars,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'bars_per_second': round(self.bars_per_second, 1),
+            'confluence': self.confluence.to_dict(include_trades),
+            'strategies': {name: report.to_dict(include_trades) for name, report in self.strategies.items()},
+        }
+
+
+def simulate_fills(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                   entries: np.ndarray, directions: np.ndarray,
+                   stops: np.ndarray, targets: np.ndarray,
+                   max_holding: int) -> Dict[str, np.ndarray]:
+    """
+    Salida de cada operación en las `max_holding` velas posteriores a su entrada,
+    todas a la vez. Si una vela toca el stop y el objetivo se asume el stop; sin
+    toque se cierra al cierre de la última vela del horizonte.
+    """
+    count = len(entries)
+    n = len(close)
+    if not count:
+        empty = np.empty(0)
+        return {'exit_index': empty.astype(np.int64), 'exit_price': empty, 'outcome': empty.astype(object)}
+
+    pad = np.full(max_holding, np.nan)
+    high_windows = np.lib.stride_tricks.sliding_window_view(np.concatenate((high, pad)), max_holding)[entries + 1]
+    low_windows = np.lib.stride_tricks.sliding_window_view(np.concatenate((low, pad)), max_holding)[entries + 1]
+
+    buy = (directions > 0)[:, None]
+    stop_hit = np.where(buy, low_windows <= stops[:, None], high_windows >= stops[:, None])
+    target_hit = np.where(buy, high_windows >= targets[:, None], low_windows <= targets[:, None])
+
+    # Primera vela con toque (max_holding = nunca)
+    first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), max_holding)
+    first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), max_holding)
+
+    by_stop = (first_stop <= first_target) & (first_stop < max_holding)
+    by_target = ~by_stop & (first_target < max_holding)
+    timeout = ~by_stop & ~by_target
+
+    exit_index = np.minimum(entries + max_holding, n - 1)
+    exit_index = np.where(by_stop, entries + 1 + first_stop, exit_index)
+    exit_index = np.where(by_target, entries + 1 + first_target, exit_index)
+    exit_price = np.where(by_stop, stops, np.where(by_target, targets, close[exit_index]))
+
+    outcome = np.where(by_stop, 'stop_loss', np.where(by_target, 'take_profit', 'timeout')).astype(object)
+    outcome[timeout & (entries + max_holding > n - 1)] = 'open'
+    return {'exit_index': exit_index, 'exit_price': exit_price, 'outcome': outcome}
+
+
+def build_report(name: str, signals: Sequence[RawSignal], df: pd.DataFrame,
+                 max_holding: int, risk_per_trade: float) -> BacktestReport:
+    """Simular las señales (una operación abierta a la vez) y resumir resultados"""
+    signals = sorted(signals)
+    high = df['High'].to_numpy(dtype=float)
+    low = df['Low'].to_numpy(dtype=float)
+    close = df['Close'].to_numpy(dtype=float)
+
+    if signals:
+        entries, directions, prices, stops, targets = (np.array(column) for column in zip(*signals))
+        entries = entries.astype(np.int64)
+    else:
+        entries = directions = prices = stops = targets = np.empty(0)
+        entries = entries.astype(np.int64)
+
+    fills = simulate_fills(high, low, close, entries, directions, stops, targets, max_holding)
+
+    # Una operación a la vez: se descartan las señales con una operación abierta
+    taken = []
+    busy_until = -1
+    for i in range(len(entries)):
+        if entries[i] > busy_until:
+            taken.append(i)
+            busy_until = fills['exit_index'][i]
+    taken = np.array(taken, dtype=np.int64)
+
+    trade_list = []
+    r_multiples = np.empty(0)
+    if len(taken):
+        risk = np.abs(prices[taken] - stops[taken])
+        pnl = directions[taken] * (fills['exit_price'][taken] - prices[taken])
+        r_multiples = np.divide(pnl, risk, out=np.zeros(len(taken)), where=risk > 0)
+        times = df.index
+        for j, i in enumerate(taken.tolist()):
+            trade_list.append({
+                'entry_time': str(times[entries[i]]),
+                'exit_time': str(times[fills['exit_index'][i]]),
+                'direction': 'BUY' if directions[i] > 0 else 'SELL',
+                'entry_price': float(prices[i]),
+                'stop_loss': float(stops[i]),
+                'take_profit': float(targets[i]),
+                'exit_price': float(fills['exit_price'][i]),
+                'outcome': fills['outcome'][i],
+                'r_multiple': float(r_multiples[j]),
+            })
+
+    # Capital compuesto arriesgando `risk_per_trade` % por operación
+    equity = np.cumprod(1.0 + r_multiples * risk_per_trade / 100.0)
+    peaks = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    drawdown = float(np.max(1.0 - equity / peaks)) if len(equity) else 0.0
+
+    wins = int((r_multiples > 0).sum())
+    losses = int((r_multiples < 0).sum())
+    gains = float(r_multiples[r_multiples > 0].sum())
+    lost = float(-r_multiples[r_multiples < 0].sum())
+    return BacktestReport(
+        name=name,
+        trades=len(taken),
+        wins=wins,
+        losses=losses,
+        win_rate=wins / len(taken) if len(taken) else 0.0,
+        total_r=float(r_multiples.sum()),
+        avg_r=float(r_multiples.mean()) if len(taken) else 0.0,
+        profit_factor=gains / lost if lost > 0 else (float('inf') if gains > 0 else 0.0),
+        max_drawdown=drawdown,
+        final_equity=float(equity[-1]) if len(equity) else 1.0,
+        signals=len(entries),
+        trade_list=trade_list,
+    )
+
+
+def chunk_positions(positions: range, count: int) -> List[Tuple[int, int]]:
+    """Hasta `count` tramos contiguos [inicio, fin) de posiciones a evaluar, alineados con su paso"""
+    if not len(positions):
+        return []
+    count = max(1, min(len(positions), count))
+    size = -(-len(positions) // count)
+    chunks = []
+    for i in range(0, len(positions), size):
+        start = positions[i]
+        stop = positions[min(i + size, len(positions)) - 1] + 1
+        chunks.append((start, stop))
+    return chunks
+
+
+def _backtest_chunk(symbol: str, timeframe: str, frame: pd.DataFrame, offset: int,
+                    start: int, stop: int, window: int, step: int, config,
+                    strategies: Optional[Sequence[str]]) -> Tuple[List[RawSignal], Dict[str, List[RawSignal]], int]:
+    """Recorrer las velas [start, stop) de un tramo (se ejecuta en un proceso del pool)"""
+    # Sin caché ni timeout (resultado determinista) y un solo hilo: el paralelismo son los procesos
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="backtest") as executor:
+        detector = ConfluenceDetector(cache=None, analysis_timeout=None, executor=executor)
+        return asyncio.run(_walk(detector, symbol, timeframe, frame, offset, start, stop,
+                                 window, step, config, strategies))
+
+
+async def _walk(detector, symbol, timeframe, frame, offset, start, stop, window, step, config, strategies):
+    components = {
+        name: component for name, component in detector.strategy_components.items()
+        if strategies is None or name in strategies
+    }
+    key = (symbol, timeframe)
+    confluence_signals: List[RawSignal] = []
+    strategy_signals: Dict[str, List[RawSignal]] = {name: [] for name in components}
+    evaluated = 0
+
+    for position in range(start, stop, step):
+        local = position - offset
+        snapshot = frame.iloc[max(local - window + 1, 0):local + 1]
+        evaluated += 1
+
+        # Estrategias: indicadores incrementales por serie (sólo avanzan con la vela nueva)
+        for name, component in components.items():
+            result = await component.analyze(snapshot, config, key=key)
+            for signal in (result or {}).get('signals', []):
+                direction = 1 if signal.get('type') == 'buy' else -1 if signal.get('type') == 'sell' else 0
+                if direction:
+                    raw = _strategy_signal(detector, snapshot, position, direction, config)
+                    if raw:
+                        strategy_signals[name].append(raw)
+
+        signal = await detector.analyze_symbol(symbol, snapshot, timeframe, config)
+        if signal is not None and signal.signal_type != SignalType.HOLD and signal.stop_loss:
+            direction = 1 if signal.signal_type == SignalType.BUY else -1
+            confluence_signals.append((position, direction, float(signal.entry_price),
+                                       float(signal.stop_loss), float(signal.take_profit)))
+
+    return confluence_signals, strategy_signals, evaluated
+
+
+def _strategy_signal(detector, snapshot: pd.DataFrame, position: int, direction: int, config) -> Optional[RawSignal]:
+    """Stop loss y objetivo de una señal de estrategia, igual que en _generate_signal_with_config"""
+    entry = float(snapshot['Close'].iloc[-1])
+    signal_type = SignalType.BUY if direction > 0 else SignalType.SELL
+    stop = float(detector._calculate_stop_loss_with_config(snapshot, signal_type, entry, config))
+    risk = abs(entry - stop)
+    if not risk:
+        return None
+    reward_ratio = config.risk_reward_ratio if config else 2.0
+    return position, direction, entry, stop, entry + direction * risk * reward_ratio
+
+
+class Backtester:
+    """
+    Backtest de ConfluenceDetector sobre un histórico: en cada vela evalúa la
+    confluencia y cada componente de estrategia sobre las últimas `window` velas
+    y simula los stops y objetivos de las señales.
+
+    El histórico se reparte en tramos entre procesos (cada tramo recalienta sus
+    indicadores con `window` velas previas); la simulación de salidas se hace
+    después, vectorizada, sobre la serie completa.
+    """
+
+    def __init__(self, window: int = 300, step: int = 1, max_holding: int = 500,
+                 workers: Optional[int] = None, chunks_per_worker: int = 4):
+        self.window = window
+        self.step = step
+        self.max_holding = max_holding
+        self.workers = workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, df: pd.DataFrame, symbol: str, timeframe: str, config=None,
+            strategies: Optional[Sequence[str]] = None) -> BacktestResult:
+        """Backtest de `df` (OHLCV con índice temporal, de la vela más antigua a la más reciente)"""
+        started = time.perf_counter()
+        first = self.window - 1
+        positions = range(first, len(df), self.step)
+        chunks = chunk_positions(positions, self.workers * self.chunks_per_worker)
+        self.logger.info(
+            f"Backtest {symbol} {timeframe}: {len(df)} velas, {len(positions)} evaluaciones, "
+            f"{len(chunks)} tramos en {self.workers} procesos"
+        )
+
+        jobs = [
+            (symbol, timeframe, df.iloc[max(start - self.window + 1, 0):stop], max(start - self.window + 1, 0),
+             start, stop, self.window, self.step, config, strategies)
+            for start, stop in chunks
+        ]
+        if self.workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(_backtest_chunk, *zip(*jobs)))
+        else:
+            results = [_backtest_chunk(*job) for job in jobs]
+
+        confluence_signals: List[RawSignal] = []
+        strategy_signals: Dict[str, List[RawSignal]] = {}
+        evaluated = 0
+        for chunk_confluence, chunk_strategies, chunk_evaluated in results:
+            confluence_signals.extend(chunk_confluence)
+            for name, signals in chunk_strategies.items():
+                strategy_signals.setdefault(name, []).extend(signals)
+            evaluated += chunk_evaluated
+
+        risk_per_trade = config.risk_per_trade if config else 2.0
+        confluence = build_report('confluence', confluence_signals, df, self.max_holding, risk_per_trade)
+        strategy_reports = {
+            name: build_report(name, signals, df, self.max_holding, risk_per_trade)
+            for name, signals in strategy_signals.items()
+        }
+
+        elapsed = time.perf_counter() - started
+        result = BacktestResult(
+            symbol=symbol,
+            timeframe=timeframe,
+            bars=len(df),
+            evaluated_bars=evaluated,
+            elapsed_seconds=elapsed,
+            bars_per_second=evaluated / elapsed if elapsed > 0 else 0.0,
+            confluence=confluence,
+            strategies=strategy_reports,
+        )
+        self.logger.info(
+            f"Backtest {symbol} {timeframe}: {confluence.trades} operaciones, "
+            f"win rate {confluence.win_rate:.1%}, {result.bars_per_second:.0f} velas/s"
+        )
+        return result
@@ -2,14 +2,28 @@ import pandas as pd
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
+from concurrent.futures import Executor
 from datetime import datetime
+import asyncio
 import logging
+import threading
 
 from .elliott_waves import ElliottWaveAnalyzer
 from .chart_patterns import ChartPatternDetector
 from .fibonacci import FibonacciAnalyzer
+from .support_resistance import SupportResistanceEngine
+from .indicators import ADX, EMA, MACD, RSI, SMA, Stochastic, IndicatorStream
+from .features import FeatureStore
+from .analysis_cache import AnalysisCache, analysis_cache, config_fingerprint, data_fingerprint
+from .workers import run_in_worker
+from .multi_timeframe import MultiTimeframeAnalyzer
+from .level_clustering import LevelClusters, cluster_levels, level_tolerance
 from database.models import TechnicalAnalysis, Signal, SignalType, AnalysisType
 
+class AnalyzerBusyError(RuntimeError):
+    """El analizador sigue ocupado con velas anteriores de la misma serie"""
+
+
 @dataclass
 class ConfluencePoint:
     """Punto de confluencia entre diferentes análisis"""
@@ -26,11 +40,38 @@ class TradingStrategyComponent:
         self.timeframes = timeframes
         self.description = description
         self.logger = logging.getLogger(__name__)
+        # Indicadores incrementales por serie (símbolo, temporalidad)
+        self._streams: Dict[Tuple[str, str], IndicatorStream] = {}
+        self._streams_lock = threading.Lock()
+        self.max_streams = 256
     
-    async def analyze(self, df: pd.DataFrame, config=None) -> Optional[Dict]:
-        """Método base para análisis de estrategia"""
+    async def analyze(self, df: pd.DataFrame, config=None, key: Optional[Tuple[str, str]] = None) -> Optional[Dict]:
+        """Método base para análisis de estrategia (`key` = (símbolo, temporalidad) para cálculo incremental)"""
         raise NotImplementedError("Subclasses must implement analyze method")
     
+    def create_indicators(self) -> Dict:
+        """Indicadores que usa la estrategia: {nombre: Indicator}"""
+        return {}
+    
+    def _indicator_values(self, df: pd.DataFrame, key: Optional[Tuple[str, str]] = None) -> Dict[str, List]:
+        """
+        Últimos valores de cada indicador ([-1] = última vela). Con `key` avanza el
+        estado de esa serie sólo con las velas nuevas; sin `key` calcula todo.
+        """
+        if key is None:
+            return IndicatorStream(self.create_indicators()).compute(df, FeatureStore.of(df))
+        
+        with self._streams_lock:
+            stream = self._streams.pop(key, None)
+            if stream is None:
+                stream = IndicatorStream(self.create_indicators())
+            self._streams[key] = stream
+            while len(self._streams) > self.max_streams:
+                self._streams.pop(next(iter(self._streams)))
+        
+        with stream.lock:
+            return stream.sync(df)
+    
     def get_weight_multiplier(self, timeframe: str) -> float:
         """Obtener multiplicador de peso según temporalidad"""
         if timeframe in self.timeframes:
@@ -47,18 +88,19 @@ class MaletaStrategy(TradingStrategyComponent):
             description="Estrategia Maleta con indicador Stochastic JR"
         )
     
-    async def analyze(self, df: pd.DataFrame, config=None) -> Optional[Dict]:
+    def create_indicators(self) -> Dict:
+        # Stochastic personalizado para Maleta
+        return {'stochastic': Stochastic(k_period=14, d_period=3)}
+    
+    async def analyze(self, df: pd.DataFrame, config=None, key: Optional[Tuple[str, str]] = None) -> Optional[Dict]:
         """Análisis específico de la estrategia Maleta"""
         try:
-            # Calcular Stochastic personalizado para Maleta
-            stoch_k, stoch_d = self._calculate_maleta_stochastic(df)
+            stochastic = self._indicator_values(df, key)['stochastic']
             
             # Detectar señales de la estrategia Maleta
             signals = []
-            current_k = stoch_k.iloc[-1]
-            current_d = stoch_d.iloc[-1]
-            prev_k = stoch_k.iloc[-2]
-            prev_d = stoch_d.iloc[-2]
+            current_k, current_d = stochastic[-1]
+            prev_k, prev_d = stochastic[-2]
             
             # Señal de compra: Stochastic sale de sobreventa
             if current_k > 20 and prev_k <= 20 and current_k > current_d:
@@ -94,22 +136,6 @@ class MaletaStrategy(TradingStrategyComponent):
             self.logger.error(f"Error en análisis Maleta: {e}")
             return None
     
-    def _calculate_maleta_stochastic(self, df: pd.DataFrame, k_period=14, d_period=3) -> Tuple[pd.Series, pd.Series]:
-        """Calcular Stochastic personalizado para estrategia Maleta"""
-        high = df['High']
-        low = df['Low']
-        close = df['Close']
-        
-        # Calcular %K
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
-        k_percent = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-        
-        # Calcular %D (media móvil de %K)
-        d_percent = k_percent.rolling(window=d_period).mean()
-        
-        return k_percent, d_percent
-
 class SwingTradingStrategy(TradingStrategyComponent):
     """Estrategia de Swing Trading"""
     
@@ -120,21 +146,24 @@ class SwingTradingStrategy(TradingStrategyComponent):
             description="Estrategia de swing trading con análisis de tendencia"
         )
     
-    async def analyze(self, df: pd.DataFrame, config=None) -> Optional[Dict]:
+    def create_indicators(self) -> Dict:
+        return {
+            # Medias móviles para tendencia
+            'ma_20': SMA(20),
+            'ma_50': SMA(50),
+            'rsi': RSI(14, zero_first_delta=True),
+        }
+    
+    async def analyze(self, df: pd.DataFrame, config=None, key: Optional[Tuple[str, str]] = None) -> Optional[Dict]:
         """Análisis específico de swing trading"""
         try:
-            # Calcular medias móviles para tendencia
-            ma_20 = df['Close'].rolling(window=20).mean()
-            ma_50 = df['Close'].rolling(window=50).mean()
-            
-            # Calcular RSI
-            rsi = self._calculate_rsi(df['Close'])
+            values = self._indicator_values(df, key)
             
             signals = []
             current_price = float(df['Close'].iloc[-1])
-            current_ma20 = ma_20.iloc[-1]
-            current_ma50 = ma_50.iloc[-1]
-            current_rsi = rsi.iloc[-1]
+            current_ma20 = values['ma_20'][-1]
+            current_ma50 = values['ma_50'][-1]
+            current_rsi = values['rsi'][-1]
             
             # Señal de compra swing
             if (current_ma20 > current_ma50 and 
@@ -175,15 +204,6 @@ class SwingTradingStrategy(TradingStrategyComponent):
             self.logger.error(f"Error en análisis Swing Trading: {e}")
             return None
     
-    def _calculate_rsi(self, prices: pd.Series, period=14) -> pd.Series:
-        """Calcular RSI"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
-
 class ScalpingStrategy(TradingStrategyComponent):
     """Estrategia de Scalping"""
     
@@ -194,22 +214,25 @@ class ScalpingStrategy(TradingStrategyComponent):
             description="Estrategia de scalping con análisis de momentum"
         )
     
-    async def analyze(self, df: pd.DataFrame, config=None) -> Optional[Dict]:
+    def create_indicators(self) -> Dict:
+        return {
+            # EMA rápidas para scalping
+            'ema_5': EMA(5),
+            'ema_10': EMA(10),
+            # MACD para momentum
+            'macd': MACD(12, 26, 9),
+        }
+    
+    async def analyze(self, df: pd.DataFrame, config=None, key: Optional[Tuple[str, str]] = None) -> Optional[Dict]:
         """Análisis específico de scalping"""
         try:
-            # Calcular EMA rápidas para scalping
-            ema_5 = df['Close'].ewm(span=5).mean()
-            ema_10 = df['Close'].ewm(span=10).mean()
-            
-            # Calcular MACD para momentum
-            macd_line, macd_signal, macd_histogram = self._calculate_macd(df['Close'])
+            values = self._indicator_values(df, key)
             
             signals = []
             current_price = float(df['Close'].iloc[-1])
-            current_ema5 = ema_5.iloc[-1]
-            current_ema10 = ema_10.iloc[-1]
-            current_macd = macd_line.iloc[-1]
-            current_signal = macd_signal.iloc[-1]
+            current_ema5 = values['ema_5'][-1]
+            current_ema10 = values['ema_10'][-1]
+            current_macd, current_signal, _ = values['macd'][-1]
             
             # Señal de compra scalping
             if (current_ema5 > current_ema10 and 
@@ -250,15 +273,6 @@ class ScalpingStrategy(TradingStrategyComponent):
             self.logger.error(f"Error en análisis Scalping: {e}")
             return None
     
-    def _calculate_macd(self, prices: pd.Series, fast=12, slow=26, signal=9):
-        """Calcular MACD"""
-        ema_fast = prices.ewm(span=fast).mean()
-        ema_slow = prices.ewm(span=slow).mean()
-        macd_line = ema_fast - ema_slow
-        macd_signal = macd_line.ewm(span=signal).mean()
-        macd_histogram = macd_line - macd_signal
-        return macd_line, macd_signal, macd_histogram
-
 class PositionTradingStrategy(TradingStrategyComponent):
     """Estrategia de Position Trading"""
     
@@ -269,21 +283,25 @@ class PositionTradingStrategy(TradingStrategyComponent):
             description="Estrategia de position trading con análisis de tendencia a largo plazo"
         )
     
-    async def analyze(self, df: pd.DataFrame, config=None) -> Optional[Dict]:
+    def create_indicators(self) -> Dict:
+        return {
+            # Medias móviles de largo plazo
+            'ma_50': SMA(50),
+            'ma_200': SMA(200),
+            # ADX para fuerza de tendencia
+            'adx': ADX(14),
+        }
+    
+    async def analyze(self, df: pd.DataFrame, config=None, key: Optional[Tuple[str, str]] = None) -> Optional[Dict]:
         """Análisis específico de position trading"""
         try:
-            # Calcular medias móviles de largo plazo
-            ma_50 = df['Close'].rolling(window=50).mean()
-            ma_200 = df['Close'].rolling(window=200).mean()
-            
-            # Calcular ADX para fuerza de tendencia
-            adx = self._calculate_adx(df)
+            values = self._indicator_values(df, key)
             
             signals = []
             current_price = float(df['Close'].iloc[-1])
-            current_ma50 = ma_50.iloc[-1]
-            current_ma200 = ma_200.iloc[-1]
-            current_adx = adx.iloc[-1]
+            current_ma50 = values['ma_50'][-1]
+            current_ma200 = values['ma_200'][-1]
+            current_adx = values['adx'][-1]
             
             # Señal de compra position trading
             if (current_ma50 > current_ma200 and 
@@ -324,48 +342,27 @@ class PositionTradingStrategy(TradingStrategyComponent):
             self.logger.error(f"Error en análisis Position Trading: {e}")
             return None
     
-    def _calculate_adx(self, df: pd.DataFrame, period=14) -> pd.Series:
-        """Calcular ADX (Average Directional Index)"""
-        high = df['High']
-        low = df['Low']
-        close = df['Close']
-        
-        # Calcular True Range
-        tr1 = high - low
-        tr2 = abs(high - close.shift(1))
-        tr3 = abs(low - close.shift(1))
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        
-        # Calcular Directional Movement
-        dm_plus = high.diff()
-        dm_minus = low.diff() * -1
-        
-        dm_plus[dm_plus < 0] = 0
-        dm_minus[dm_minus < 0] = 0
-        
-        # Suavizar con media móvil
-        tr_smooth = tr.rolling(window=period).mean()
-        dm_plus_smooth = dm_plus.rolling(window=period).mean()
-        dm_minus_smooth = dm_minus.rolling(window=period).mean()
-        
-        # Calcular DI+ y DI-
-        di_plus = 100 * (dm_plus_smooth / tr_smooth)
-        di_minus = 100 * (dm_minus_smooth / tr_smooth)
-        
-        # Calcular ADX
-        dx = 100 * abs(di_plus - di_minus) / (di_plus + di_minus)
-        adx = dx.rolling(window=period).mean()
-        
-        return adx
-
 class ConfluenceDetector:
     """Detector principal de confluencias para señales de trading con estrategias personalizadas"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[AnalysisCache] = analysis_cache,
+                 analysis_timeout: Optional[float] = 10.0, executor: Optional[Executor] = None):
         self.elliott_analyzer = ElliottWaveAnalyzer()
         self.pattern_detector = ChartPatternDetector()
         self.fibonacci_analyzer = FibonacciAnalyzer()
+        self.sr_engine = SupportResistanceEngine()
         self.logger = logging.getLogger(__name__)
+        # Caché de resultados (señal completa y cada analizador); None la desactiva
+        self.cache = cache
+        # Límite por analizador (segundos) y pool donde corren; None = pool compartido
+        self.analysis_timeout = analysis_timeout
+        self.executor = executor
+        # Cálculos en curso por clave de caché: los hilos no se cancelan al superar
+        # el timeout, así que las mismas velas reutilizan ese trabajo. Una serie
+        # (analizador, símbolo, temporalidad) con un cálculo que ya superó el
+        # timeout no admite otro hasta que termine
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._overdue: Dict[Tuple, Tuple] = {}
         
         # ✅ NUEVO: Inicializar componentes de estrategias
         self.strategy_components = {
@@ -385,6 +382,9 @@ class ConfluenceDetector:
         
         # Umbral mínimo de confluencia para generar señal (por defecto)
         self.min_confluence_score = 0.6
+        
+        # Confluencias entre temporalidades (config.combined_timeframes)
+        self.multi_timeframe = MultiTimeframeAnalyzer(self)
     
     async def analyze_symbol(self, 
                            symbol: str, 
@@ -392,79 +392,134 @@ class ConfluenceDetector:
                            timeframe: str,
                            config=None) -> Optional[Signal]:
         """
-        Análisis completo de un símbolo para detectar señales con configuración personalizada
+        Análisis completo de un símbolo para detectar señales con configuración personalizada.
+        El resultado se cachea por (símbolo, temporalidad, velas, configuración).
         """
+        cache_key = None
+        if self.cache is not None and df is not None and not df.empty:
+            cache_key = ('signal', symbol, timeframe, data_fingerprint(df), config_fingerprint(config))
+            found, signal = self.cache.lookup(cache_key)
+            if found:
+                self.logger.info(f"Análisis de {symbol} {timeframe} servido desde caché")
+                return signal
+        
+        dropped = []
         try:
-            # ✅ NUEVO: Usar configuración personalizada si se proporciona
-            if config:
-                min_confluence_score = config.confluence_threshold
-                # Actualizar pesos si están en la configuración
-                analysis_weights = {
-                    AnalysisType.ELLIOTT_WAVE: config.elliott_wave_weight,
-                    AnalysisType.CHART_PATTERN: config.chart_patterns_weight,
-                    AnalysisType.FIBONACCI: config.fibonacci_weight,
-                    AnalysisType.SUPPORT_RESISTANCE: config.support_resistance_weight
-                }
-                self.logger.info(f"Usando configuración personalizada: confluencia={min_confluence_score}")
-                
-                # ✅ NUEVO: Log de tipo de trader y estrategia
-                if hasattr(config, 'trader_type') and config.trader_type:
-                    self.logger.info(f"Tipo de trader: {config.trader_type}")
-                if hasattr(config, 'trading_strategy') and config.trading_strategy:
-                    self.logger.info(f"Estrategia de trading: {config.trading_strategy}")
-            else:
-                min_confluence_score = self.min_confluence_score
-                analysis_weights = self.analysis_weights
-            
-            self.logger.info(f"Analizando {symbol} en {timeframe}")
-            
-            # ✅ MODIFICADO: Realizar análisis filtrados según configuración
-            analyses = await self._perform_filtered_analyses(df, symbol, timeframe, config)
-            
-            # ✅ NUEVO: Agregar análisis de estrategia específica
-            if config and hasattr(config, 'trading_strategy') and config.trading_strategy:
-                strategy_analysis = await self._perform_strategy_analysis(
-                    df, config.trading_strategy, timeframe, config
-                )
-                if strategy_analysis:
-                    analyses.append(strategy_analysis)
-            
-            if not analyses:
-                self.logger.info(f"No se encontraron análisis válidos para {symbol}")
-                return None
-            
-            # Detectar confluencias con pesos personalizados
-            confluences = await self._detect_confluence_signals_with_weights(analyses, df, analysis_weights)
-            
-            if not confluences:
-                self.logger.info(f"No se detectaron confluencias para {symbol}")
-                return None
-            
-            # Evaluar la mejor confluencia
-            best_confluence = max(confluences, key=lambda x: x.strength)
-            
-            if best_confluence.strength < min_confluence_score:
-                self.logger.info(f"Confluencia insuficiente para {symbol}: {best_confluence.strength:.2f} < {min_confluence_score}")
-                return None
-            
-            # ✅ MODIFICADO: Generar señal con configuración
-            signal = await self._generate_signal_with_config(
-                symbol, timeframe, df, best_confluence, analyses, config
-            )
-            
-            self.logger.info(f"Señal generada para {symbol}: {signal.signal_type} con confluencia {signal.confluence_score:.2f}")
-            return signal
-            
+            signal = await self._analyze_symbol(symbol, df, timeframe, config, dropped)
         except Exception as e:
             self.logger.error(f"Error analizando {symbol}: {e}")
             return None
+        
+        # Sin los analizadores descartados la señal está incompleta: la siguiente
+        # llamada la reconstruye desde la caché de cada analizador
+        if cache_key is not None and not dropped:
+            self.cache.set(cache_key, signal)
+        return signal
     
+    async def _analyze_symbol(self, 
+                            symbol: str, 
+                            df: pd.DataFrame, 
+                            timeframe: str,
+                            config=None,
+                            dropped: Optional[List[str]] = None) -> Optional[Signal]:
+        """Análisis sin caché; las excepciones se propagan a analyze_symbol"""
+        # Instantánea propia compartida por todos los analizadores (ninguno la modifica):
+        # sus extremos, pivots e indicadores se calculan una vez en FeatureStore.of(df)
+        df = df.copy()
+        
+        min_confluence_score, analysis_weights = self._confluence_settings(config)
+        
+        self.logger.info(f"Analizando {symbol} en {timeframe}")
+        
+        # ✅ MODIFICADO: Realizar análisis filtrados según configuración y, en
+        # paralelo, el análisis de la estrategia específica
+        if config and hasattr(config, 'trading_strategy') and config.trading_strategy:
+            analyses, strategy_analysis = await asyncio.gather(
+                self._perform_filtered_analyses(df, symbol, timeframe, config, dropped),
+                self._perform_strategy_analysis(
+                    df, config.trading_strategy, timeframe, config, symbol=symbol, dropped=dropped
+                )
+            )
+            if strategy_analysis:
+                analyses.append(strategy_analysis)
+        else:
+            analyses = await self._perform_filtered_analyses(df, symbol, timeframe, config, dropped)
+        
+        if not analyses:
+            self.logger.info(f"No se encontraron análisis válidos para {symbol}")
+            return None
+        
+        # Detectar confluencias con pesos personalizados
+        confluences = await self._detect_confluence_signals_with_weights(analyses, df, analysis_weights, config)
+        
+        if not confluences:
+            self.logger.info(f"No se detectaron confluencias para {symbol}")
+            return None
+        
+        # Evaluar la mejor confluencia
+        best_confluence = max(confluences, key=lambda x: x.strength)
+        
+        if best_confluence.strength < min_confluence_score:
+            self.logger.info(f"Confluencia insuficiente para {symbol}: {best_confluence.strength:.2f} < {min_confluence_score}")
+            return None
+        
+        # ✅ MODIFICADO: Generar señal con configuración
+        signal = await self._generate_signal_with_config(
+            symbol, timeframe, df, best_confluence, analyses, config
+        )
+        
+        self.logger.info(f"Señal generada para {symbol}: {signal.signal_type} con confluencia {signal.confluence_score:.2f}")
+        return signal
+    
+    async def analyze_multi_timeframe(self,
+                                      symbol: str,
+                                      df: pd.DataFrame,
+                                      base_timeframe: str,
+                                      timeframe: str,
+                                      config=None,
+                                      native: Optional[Dict[str, pd.DataFrame]] = None) -> Optional[Signal]:
+        """
+        Señal en `timeframe` con confluencias de `config.combined_timeframes`. `df`
+        son velas de `base_timeframe` (la de `multi_timeframe.plan`); `native`, las
+        temporalidades descargadas aparte (`multi_timeframe.native_timeframes`).
+        """
+        timeframes = self.multi_timeframe.timeframes_for(timeframe, config)
+        return await self.multi_timeframe.analyze(
+            symbol, df, base_timeframe, timeframes, config, signal_timeframe=timeframe, native=native
+        )
+    
+    def _confluence_settings(self, config=None) -> Tuple[float, Dict]:
+        """Umbral de confluencia y pesos por tipo de análisis (de la configuración o por defecto)"""
+        # ✅ NUEVO: Usar configuración personalizada si se proporciona
+        if config:
+            min_confluence_score = config.confluence_threshold
+            # Actualizar pesos si están en la configuración
+            analysis_weights = {
+                AnalysisType.ELLIOTT_WAVE: config.elliott_wave_weight,
+                AnalysisType.CHART_PATTERN: config.chart_patterns_weight,
+                AnalysisType.FIBONACCI: config.fibonacci_weight,
+                AnalysisType.SUPPORT_RESISTANCE: config.support_resistance_weight
+            }
+            self.logger.info(f"Usando configuración personalizada: confluencia={min_confluence_score}")
+            
+            # ✅ NUEVO: Log de tipo de trader y estrategia
+            if hasattr(config, 'trader_type') and config.trader_type:
+                self.logger.info(f"Tipo de trader: {config.trader_type}")
+            if hasattr(config, 'trading_strategy') and config.trading_strategy:
+                self.logger.info(f"Estrategia de trading: {config.trading_strategy}")
+        else:
+            min_confluence_score = self.min_confluence_score
+            analysis_weights = self.analysis_weights
+        return min_confluence_score, analysis_weights
+        
     async def _perform_strategy_analysis(self, 
                                        df: pd.DataFrame, 
                                        strategy_name: str, 
                                        timeframe: str,
-                                       config=None) -> Optional[TechnicalAnalysis]:
-        """✅ NUEVO: Realizar análisis específico de estrategia"""
+                                       config=None,
+                                       symbol: str = "",
+                                       dropped: Optional[List[str]] = None) -> Optional[TechnicalAnalysis]:
+        """✅ NUEVO: Realizar análisis específico de estrategia (ver `dropped` en _perform_filtered_analyses)"""
         try:
             strategy_key = strategy_name.lower().replace(' ', '_')
             
@@ -477,8 +532,12 @@ class ConfluenceDetector:
             # Obtener multiplicador de peso según temporalidad
             weight_multiplier = strategy_component.get_weight_multiplier(timeframe)
             
-            # Realizar análisis de la estrategia
-            strategy_result = await strategy_component.analyze(df, config)
+            # Realizar análisis de la estrategia (depende de la config: entra en la clave)
+            strategy_result = await self._run_analyzer(
+                f"strategy:{strategy_key}", symbol, timeframe, df,
+                lambda: strategy_component.analyze(df, config, key=(symbol, timeframe) if symbol else None),
+                config_fingerprint(config)
+            )
             
             if not strategy_result:
                 return None
@@ -493,6 +552,11 @@ class ConfluenceDetector:
                 description=f"Estrategia {strategy_name}: {strategy_result['description']}"
             )
             
+        except (asyncio.TimeoutError, AnalyzerBusyError) as e:
+            self.logger.warning(f"Análisis de estrategia {strategy_name} descartado: {e or 'timeout'}")
+            if dropped is not None:
+                dropped.append(f"strategy:{strategy_name}")
+            return None
         except Exception as e:
             self.logger.error(f"Error en análisis de estrategia {strategy_name}: {e}")
             return None
@@ -501,8 +565,14 @@ class ConfluenceDetector:
                                        df: pd.DataFrame, 
                                        symbol: str, 
                                        timeframe: str,
-                                       config=None) -> List[TechnicalAnalysis]:
-        """Realizar análisis técnicos filtrados según configuración"""
+                                       config=None,
+                                       dropped: Optional[List[str]] = None) -> List[TechnicalAnalysis]:
+        """
+        Realizar análisis técnicos filtrados según configuración.
+        Los analizadores habilitados corren en paralelo en el pool de trabajo; el que
+        supera `analysis_timeout` se descarta sin frenar al resto. Los descartados por
+        timeout u ocupación se añaden a `dropped`: la señal resultante no debe cachearse.
+        """
         analyses = []
         
         # ✅ NUEVO: Verificar qué análisis están habilitados
@@ -514,94 +584,180 @@ class ConfluenceDetector:
         # ✅ NUEVO: Aplicar multiplicadores según tipo de trader
         trader_multiplier = self._get_trader_type_multiplier(timeframe, config)
         
-        # Análisis de ondas de Elliott
+        jobs = {}
         if enable_elliott:
-            try:
-                elliott_result = await self.elliott_analyzer.analyze(df)
-                if elliott_result:
-                    description = elliott_result.get('description', 'Análisis Elliott Wave')
-                    if description is None:
-                        description = 'Análisis Elliott Wave'
-                    
-                    # Aplicar multiplicador de tipo de trader
-                    adjusted_confidence = elliott_result.get('confidence', 0.5) * trader_multiplier
-                        
-                    analyses.append(TechnicalAnalysis(
-                        type=AnalysisType.ELLIOTT_WAVE,
-                        confidence=min(adjusted_confidence, 1.0),
-                        data=elliott_result,
-                        description=description
-                    ))
-            except Exception as e:
-                self.logger.warning(f"Error en análisis Elliott Wave: {e}")
+            jobs['elliott'] = lambda: self.elliott_analyzer.analyze(df)
+        if enable_patterns:
+            jobs['patterns'] = lambda: [
+                pattern.to_dict() for pattern in self.pattern_detector.detect_patterns(df, timeframe)
+            ]
+        if enable_fibonacci:
+            if hasattr(self.fibonacci_analyzer, 'analyze'):
+                jobs['fibonacci'] = lambda: self.fibonacci_analyzer.analyze(df)
+            elif hasattr(self.fibonacci_analyzer, 'calculate_levels'):
+                jobs['fibonacci'] = lambda: self.fibonacci_analyzer.calculate_levels(df)
+            else:
+                jobs['fibonacci'] = lambda: self._basic_fibonacci_analysis(df)
+        if enable_sr:
+            jobs['support_resistance'] = lambda: self._analyze_support_resistance(df)
+        
+        results = await asyncio.gather(*(
+            self._run_analyzer(name, symbol, timeframe, df, compute)
+            for name, compute in jobs.items()
+        ), return_exceptions=True)
+        results = dict(zip(jobs, results))
+        if dropped is not None:
+            dropped.extend(
+                name for name, result in results.items()
+                if isinstance(result, (asyncio.TimeoutError, AnalyzerBusyError))
+            )
+        
+        # Análisis de ondas de Elliott
+        elliott_result = self._analyzer_result(results, 'elliott', 'Elliott Wave')
+        if elliott_result:
+            description = elliott_result.get('description', 'Análisis Elliott Wave')
+            if description is None:
+                description = 'Análisis Elliott Wave'
+            
+            # Aplicar multiplicador de tipo de trader
+            adjusted_confidence = elliott_result.get('confidence', 0.5) * trader_multiplier
+                
+            analyses.append(TechnicalAnalysis(
+                type=AnalysisType.ELLIOTT_WAVE,
+                confidence=min(adjusted_confidence, 1.0),
+                data=elliott_result,
+                description=description
+            ))
         
         # Análisis de patrones
-        if enable_patterns:
-            try:
-                pattern_results = await self.pattern_detector.detect_patterns(df, timeframe)
-                for pattern in pattern_results:
-                    description = pattern.get('description', 'Patrón chartista detectado')
-                    if description is None:
-                        description = 'Patrón chartista detectado'
-                    
-                    # Aplicar multiplicador de tipo de trader
-                    adjusted_confidence = pattern.get('confidence', 0.5) * trader_multiplier
-                        
-                    analyses.append(TechnicalAnalysis(
-                        type=AnalysisType.CHART_PATTERN,
-                        confidence=min(adjusted_confidence, 1.0),
-                        data=pattern,
-                        description=description
-                    ))
-            except Exception as e:
-                self.logger.warning(f"Error en análisis de patrones: {e}")
+        pattern_results = self._analyzer_result(results, 'patterns', 'de patrones')
+        for pattern in pattern_results or []:
+            description = pattern.get('description', 'Patrón chartista detectado')
+            if description is None:
+                description = 'Patrón chartista detectado'
+            
+            # Aplicar multiplicador de tipo de trader
+            adjusted_confidence = pattern.get('confidence', 0.5) * trader_multiplier
+                
+            analyses.append(TechnicalAnalysis(
+                type=AnalysisType.CHART_PATTERN,
+                confidence=min(adjusted_confidence, 1.0),
+                data=pattern,
+                description=description
+            ))
         
         # Análisis Fibonacci
-        if enable_fibonacci:
-            try:
-                if hasattr(self.fibonacci_analyzer, 'analyze'):
-                    fib_result = await self.fibonacci_analyzer.analyze(df)
-                elif hasattr(self.fibonacci_analyzer, 'calculate_levels'):
-                    fib_result = await self.fibonacci_analyzer.calculate_levels(df)
-                else:
-                    fib_result = await self._basic_fibonacci_analysis(df)
-                    
-                if fib_result:
-                    description = fib_result.get('description', 'Análisis Fibonacci')
-                    if description is None:
-                        description = 'Análisis Fibonacci'
-                    
-                    # Aplicar multiplicador de tipo de trader
-                    adjusted_confidence = fib_result.get('confidence', 0.5) * trader_multiplier
-                        
-                    analyses.append(TechnicalAnalysis(
-                        type=AnalysisType.FIBONACCI,
-                        confidence=min(adjusted_confidence, 1.0),
-                        data=fib_result,
-                        description=description
-                    ))
-            except Exception as e:
-                self.logger.warning(f"Error en análisis Fibonacci: {e}")
+        fib_result = self._analyzer_result(results, 'fibonacci', 'Fibonacci')
+        if fib_result:
+            description = fib_result.get('description', 'Análisis Fibonacci')
+            if description is None:
+                description = 'Análisis Fibonacci'
+            
+            # Aplicar multiplicador de tipo de trader
+            adjusted_confidence = fib_result.get('confidence', 0.5) * trader_multiplier
+                
+            analyses.append(TechnicalAnalysis(
+                type=AnalysisType.FIBONACCI,
+                confidence=min(adjusted_confidence, 1.0),
+                data=fib_result,
+                description=description
+            ))
         
         # Análisis de soporte y resistencia
-        if enable_sr:
-            try:
-                sr_result = await self._analyze_support_resistance(df)
-                if sr_result:
-                    # Aplicar multiplicador de tipo de trader
-                    adjusted_confidence = sr_result['confidence'] * trader_multiplier
-                    
-                    analyses.append(TechnicalAnalysis(
-                        type=AnalysisType.SUPPORT_RESISTANCE,
-                        confidence=min(adjusted_confidence, 1.0),
-                        data=sr_result,
-                        description=sr_result['description']
-                    ))
-            except Exception as e:
-                self.logger.warning(f"Error en análisis S/R: {e}")
+        sr_result = self._analyzer_result(results, 'support_resistance', 'S/R')
+        if sr_result:
+            # Aplicar multiplicador de tipo de trader
+            adjusted_confidence = sr_result['confidence'] * trader_multiplier
+            
+            analyses.append(TechnicalAnalysis(
+                type=AnalysisType.SUPPORT_RESISTANCE,
+                confidence=min(adjusted_confidence, 1.0),
+                data=sr_result,
+                description=sr_result['description']
+            ))
         
         return analyses
     
+    async def _run_analyzer(self, name: str, symbol: str, timeframe: str, df: pd.DataFrame,
+                            compute, *extra):
+        """Ejecutar un analizador en el pool de trabajo (con caché y timeout)"""
+        return await self._cached_analysis(
+            name, symbol, timeframe, df,
+            lambda: run_in_worker(compute, executor=self.executor),
+            *extra
+        )
+    
+    def _analyzer_result(self, results: Dict, name: str, label: str):
+        """Resultado de un analizador; los errores y timeouts se registran y se descartan"""
+        result = results.get(name)
+        if isinstance(result, asyncio.TimeoutError):
+            self.logger.warning(f"Análisis {label} descartado: superó {self.analysis_timeout}s")
+            return None
+        if isinstance(result, AnalyzerBusyError):
+            self.logger.warning(f"Análisis {label} descartado: {result}")
+            return None
+        if isinstance(result, Exception):
+            self.logger.warning(f"Error en análisis {label}: {result}")
+            return None
+        return result
+    
+    async def _cached_analysis(self, name: str, symbol: str, timeframe: str, df: pd.DataFrame,
+                               compute, *extra):
+        """
+        Resultado crudo de un analizador, cacheado por velas. Los multiplicadores y
+        pesos se aplican después, así que cambiarlos sólo recalcula la confluencia.
+
+        El cálculo sigue aunque quien espera abandone por timeout: al terminar se
+        cachea, y mientras tanto las mismas velas esperan ese trabajo en vez de
+        lanzar otro. Otras velas de la serie calculan aparte, salvo que un cálculo
+        de la serie ya haya superado el timeout y siga corriendo (AnalyzerBusyError).
+        """
+        if df is None or df.empty:
+            return await asyncio.wait_for(compute(), timeout=self.analysis_timeout)
+        key = ('analysis:' + name, symbol, timeframe, data_fingerprint(df)) + extra
+        if self.cache is not None:
+            found, result = self.cache.lookup(key)
+            if found:
+                return result
+
+        stream = key[:3] + extra
+        future = self._running(key)
+        if future is None:
+            overdue = self._overdue.get(stream)
+            if overdue is not None and self._running(overdue) is not None:
+                raise AnalyzerBusyError(
+                    f"{name} de {symbol} {timeframe} sigue con un cálculo que superó {self.analysis_timeout}s"
+                )
+            future = asyncio.ensure_future(compute())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finish_analysis(stream, key, done))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.analysis_timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._overdue[stream] = key
+            raise
+
+    def _running(self, key: Tuple) -> Optional[asyncio.Future]:
+        """Cálculo en curso de `key` en este event loop"""
+        future = self._inflight.get(key)
+        if future is not None and future.get_loop() is not asyncio.get_running_loop():
+            # De un event loop anterior (p. ej. otro asyncio.run): no terminará aquí
+            del self._inflight[key]
+            return None
+        return future
+
+    def _finish_analysis(self, stream: Tuple, key: Tuple, future: asyncio.Future):
+        """Liberar la clave y la serie y cachear el resultado (también si ya nadie lo esperaba)"""
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if self._overdue.get(stream) == key:
+            del self._overdue[stream]
+        if future.cancelled() or future.exception() is not None:
+            return
+        if self.cache is not None:
+            self.cache.set(key, future.result())
+    
     def _get_trader_type_multiplier(self, timeframe: str, config=None) -> float:
         """✅ NUEVO: Obtener multiplicador según tipo de trader y temporalidad"""
         if not config or not hasattr(config, 'trader_type') or not config.trader_type:
@@ -631,10 +787,9 @@ class ConfluenceDetector:
         """Análisis básico de Fibonacci como fallback"""
         try:
             # Encontrar swing high y swing low recientes
-            recent_data = df.tail(100)  # Últimas 100 velas
-            
-            swing_high = recent_data['High'].max()
-            swing_low = recent_data['Low'].min()
+            features = FeatureStore.of(df)
+            swing_high, _ = features.window_extreme('High', 100, 'max')  # Últimas 100 velas
+            swing_low, _ = features.window_extreme('Low', 100, 'min')
             
             # Calcular niveles de Fibonacci
             diff = swing_high - swing_low
@@ -672,12 +827,20 @@ class ConfluenceDetector:
     async def _detect_confluence_signals_with_weights(self, 
                                                     analyses: List[TechnicalAnalysis], 
                                                     df: pd.DataFrame,
-                                                    weights: Dict) -> List[ConfluencePoint]:
+                                                    weights: Dict,
+                                                    config=None) -> List[ConfluencePoint]:
         """Detectar confluencias con pesos personalizados"""
-        confluences = []
         current_price = float(df['Close'].iloc[-1])
         
         # Agrupar niveles de precio similares con pesos
+        price_levels = self._weighted_price_levels(analyses, current_price, weights)
+        return self._confluences_from_levels(price_levels, current_price, df, config)
+    
+    def _weighted_price_levels(self,
+                               analyses: List[TechnicalAnalysis],
+                               current_price: float,
+                               weights: Dict) -> List[Dict]:
+        """Niveles de precio de cada análisis con su confianza ponderada por tipo"""
         price_levels = []
         
         for analysis in analyses:
@@ -688,26 +851,48 @@ class ConfluenceDetector:
                 level['weighted_confidence'] = level['confidence'] * weight
             price_levels.extend(levels)
         
+        return price_levels
+    
+    def _confluences_from_levels(self,
+                                 price_levels: List[Dict],
+                                 current_price: float,
+                                 df: Optional[pd.DataFrame] = None,
+                                 config=None) -> List[ConfluencePoint]:
+        """Confluencias (grupos de niveles cercanos de al menos 2 análisis), de mayor a menor fuerza"""
+        confluences = []
+        
         if not price_levels:
             return confluences
         
-        # Agrupar niveles cercanos
-        tolerance = current_price * 0.001  # 0.1%
-        grouped_levels = self._group_price_levels(price_levels, tolerance)
+        # Agrupar niveles cercanos (tolerancia según config.level_tolerance_model)
+        tolerance, model = self._level_tolerance(current_price, df, config)
+        clusters = self._cluster_price_levels(price_levels, tolerance, model)
         
-        # Evaluar cada grupo para confluencia
-        for group in grouped_levels:
-            if len(group['analyses']) >= 2:  # Al menos 2 análisis confluyen
-                confluence = ConfluencePoint(
-                    price_level=group['avg_price'],
-                    strength=self._calculate_weighted_confluence_strength(group),
-                    analyses=group['analyses'],
-                    description=self._generate_confluence_description(group)
-                )
-                confluences.append(confluence)
+        # Fuerza de todos los grupos a la vez; sólo se construyen los de al menos 2 análisis
+        strengths = self._cluster_strengths(clusters)
+        for i in np.flatnonzero(clusters.diversity >= 2):
+            group = {
+                'avg_price': float(clusters.centroid[i]),
+                'analyses': self._cluster_analyses(clusters, i, price_levels),
+            }
+            confluence = ConfluencePoint(
+                price_level=group['avg_price'],
+                strength=float(strengths[i]),
+                analyses=group['analyses'],
+                description=self._generate_confluence_description(group)
+            )
+            confluences.append(confluence)
         
         return sorted(confluences, key=lambda x: x.strength, reverse=True)
     
+    def _level_tolerance(self, current_price: float, df: Optional[pd.DataFrame] = None,
+                         config=None) -> Tuple[float, str]:
+        """(tolerancia absoluta, modelo) para agrupar niveles; el modelo ATR usa el ATR(14) de `df`"""
+        atr = None
+        if getattr(config, 'level_tolerance_model', None) == 'atr' and df is not None:
+            atr = self._calculate_atr(df, period=14)
+        return level_tolerance(current_price, config, atr)
+    
     def _extract_price_levels(self, 
                             analysis: TechnicalAnalysis, 
                             current_price: float) -> List[Dict]:
@@ -784,43 +969,49 @@ class ConfluenceDetector:
     
     def _group_price_levels(self, 
                           price_levels: List[Dict], 
-                          tolerance: float) -> List[Dict]:
+                          tolerance: float,
+                          model: str = 'percent') -> List[Dict]:
         """Agrupar niveles de precio cercanos"""
         if not price_levels:
             return []
         
-        # Ordenar por precio
-        sorted_levels = sorted(price_levels, key=lambda x: x['price'])
-        groups = []
-        current_group = [sorted_levels[0]]
-        
-        for level in sorted_levels[1:]:
-            if abs(level['price'] - current_group[-1]['price']) <= tolerance:
-                current_group.append(level)
-            else:
-                if len(current_group) > 0:
-                    groups.append(self._create_group_summary(current_group))
-                current_group = [level]
-        
-        # Agregar último grupo
-        if len(current_group) > 0:
-            groups.append(self._create_group_summary(current_group))
-        
-        return groups
+        clusters = self._cluster_price_levels(price_levels, tolerance, model, weight_key='confidence')
+        return [
+            {
+                'avg_price': float(clusters.centroid[i]),
+                'total_confidence': float(clusters.confidence[i]),
+                'analyses': self._cluster_analyses(clusters, i, price_levels),
+                'levels': [price_levels[j] for j in clusters.members(i)],
+                'count': int(clusters.count[i])
+            }
+            for i in range(len(clusters))
+        ]
     
-    def _create_group_summary(self, levels: List[Dict]) -> Dict:
-        """Crear resumen de un grupo de niveles"""
-        avg_price = sum(level['price'] for level in levels) / len(levels)
-        total_confidence = sum(level['confidence'] for level in levels)
-        analyses = list(set(level['analysis'] for level in levels))
-        
-        return {
-            'avg_price': avg_price,
-            'total_confidence': total_confidence,
-            'analyses': analyses,
-            'levels': levels,
-            'count': len(levels)
-        }
+    def _cluster_price_levels(self,
+                              price_levels: List[Dict],
+                              tolerance: float,
+                              model: str = 'percent',
+                              weight_key: str = 'weighted_confidence') -> LevelClusters:
+        """Niveles como arrays (precio, confianza, id de análisis) agrupados en ai.level_clustering"""
+        ids: Dict[str, int] = {}
+        count = len(price_levels)
+        prices = np.fromiter((level['price'] for level in price_levels), dtype=float, count=count)
+        weights = np.fromiter((level.get(weight_key, level['confidence']) for level in price_levels),
+                              dtype=float, count=count)
+        analysis_ids = np.fromiter((ids.setdefault(level['analysis'], len(ids)) for level in price_levels),
+                                   dtype=np.int64, count=count)
+        return cluster_levels(prices, weights, analysis_ids, tolerance, model)
+    
+    def _cluster_analyses(self, clusters: LevelClusters, cluster: int, price_levels: List[Dict]) -> List[str]:
+        """Análisis distintos de un grupo, en orden de precio"""
+        return list(dict.fromkeys(price_levels[j]['analysis'] for j in clusters.members(cluster)))
+    
+    def _cluster_strengths(self, clusters: LevelClusters) -> np.ndarray:
+        """_calculate_weighted_confluence_strength de todos los grupos a la vez"""
+        diversity_score = np.minimum(clusters.diversity / 4.0, 1.0)
+        count_bonus = np.minimum(clusters.count / 5.0, 0.2)
+        strength = (diversity_score * 0.4 + clusters.mean_confidence * 0.6) + count_bonus
+        return np.minimum(strength, 1.0)
     
     def _calculate_confluence_strength(self, group: Dict) -> float:
         """Calcular la fuerza de confluencia de un grupo (método original)"""
@@ -939,12 +1130,13 @@ class ConfluenceDetector:
         """Calcular stop loss con configuración personalizada"""
         
         # ✅ NUEVO: Usar multiplicador ATR de la configuración
+        features = FeatureStore.of(df)
         atr = self._calculate_atr(df, period=14)
         atr_multiplier = config.atr_multiplier_sl if config else 2.0
         
         if signal_type == SignalType.BUY:
             # Para compra: stop loss debajo del precio de entrada
-            recent_low = df['Low'].tail(20).min()
+            recent_low, _ = features.window_extreme('Low', 20, 'min')
             atr_stop = entry_price - (atr * atr_multiplier)
             structure_stop = recent_low * 0.999  # 0.1% debajo del mínimo reciente
             
@@ -953,7 +1145,7 @@ class ConfluenceDetector:
             
         else:  # SELL
             # Para venta: stop loss arriba del precio de entrada
-            recent_high = df['High'].tail(20).max()
+            recent_high, _ = features.window_extreme('High', 20, 'max')
             atr_stop = entry_price + (atr * atr_multiplier)
             structure_stop = recent_high * 1.001  # 0.1% arriba del máximo reciente
             
@@ -964,171 +1156,14 @@ class ConfluenceDetector:
     
     def _calculate_atr(self, df: pd.DataFrame, period: int = 14) -> float:
         """Calcular Average True Range"""
-        high = df['High']
-        low = df['Low']
-        close = df['Close'].shift(1)
-        
-        tr1 = high - low
-        tr2 = abs(high - close)
-        tr3 = abs(low - close)
-        
-        true_range = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = true_range.rolling(window=period).mean().iloc[-1]
+        atr = FeatureStore.of(df).atr(period)[-1]
         
         return float(atr) if not pd.isna(atr) else 0.001
     
     async def _analyze_support_resistance(self, df: pd.DataFrame) -> Optional[Dict]:
-        """Análisis básico de soporte y resistencia"""
+        """Análisis básico de soporte y resistencia (motor vectorizado)"""
         try:
-            levels = []
-            
-            # Encontrar máximos y mínimos locales
-            highs = self._find_local_extrema(df['High'], order=5, mode='max')
-            lows = self._find_local_extrema(df['Low'], order=5, mode='min')
-            
-            # Procesar resistencias (máximos)
-            for idx in highs:
-                price = float(df['High'].iloc[idx])
-                strength = self._calculate_level_strength(df, price, 'resistance')
-                if strength > 0.3:  # Mínimo de fuerza
-                    levels.append({
-                        'price': price,
-                        'type': 'resistance',
-                        'strength': strength,
-                        'touches': self._count_touches(df, price, tolerance=0.001)
-                    })
-            
-            # Procesar soportes (mínimos)
-            for idx in lows:
-                price = float(df['Low'].iloc[idx])
-                strength = self._calculate_level_strength(df, price, 'support')
-                if strength > 0.3:  # Mínimo de fuerza
-                    levels.append({
-                        'price': price,
-                        'type': 'support',
-                        'strength': strength,
-                        'touches': self._count_touches(df, price, tolerance=0.001)
-                    })
-            
-            if not levels:
-                return None
-            
-            # Calcular confianza general
-            avg_strength = sum(level['strength'] for level in levels) / len(levels)
-            
-            return {
-                'levels': levels,
-                'confidence': min(avg_strength * 1.2, 1.0),
-                'description': f"Identificados {len(levels)} niveles de S/R"
-            }
-            
+            return self.sr_engine.analyze(df)
         except Exception as e:
             self.logger.error(f"Error en análisis S/R: {e}")
             return None
-    
-    def _find_local_extrema(self, series: pd.Series, order: int = 5, mode: str = 'max') -> List[int]:
-        """Encontrar extremos locales en una serie"""
-        try:
-            from scipy.signal import argrelextrema
-            
-            if mode == 'max':
-                extrema = argrelextrema(series.values, np.greater, order=order)[0]
-            else:
-                extrema = argrelextrema(series.values, np.less, order=order)[0]
-            
-            return extrema.tolist()
-        except ImportError:
-            # Fallback sin scipy
-            return self._find_extrema_simple(series, order, mode)
-    
-    def _find_extrema_simple(self, series: pd.Series, order: int = 5, mode: str = 'max') -> List[int]:
-        """Encontrar extremos locales sin scipy (fallback)"""
-        extrema = []
-        values = series.values
-        
-        for i in range(order, len(values) - order):
-            if mode == 'max':
-                if all(values[i] >= values[i-j] for j in range(1, order+1)) and \
-                   all(values[i] >= values[i+j] for j in range(1, order+1)):
-                    extrema.append(i)
-            else:
-                if all(values[i] <= values[i-j] for j in range(1, order+1)) and \
-                   all(values[i] <= values[i+j] for j in range(1, order+1)):
-                    extrema.append(i)
-        
-        return extrema
-    
-    def _calculate_level_strength(self, df: pd.DataFrame, price: float, level_type: str) -> float:
-        """Calcular la fuerza de un nivel de S/R"""
-        touches = self._count_touches(df, price, tolerance=0.001)
-        volume_strength = self._calculate_volume_strength(df, price)
-        age_factor = self._calculate_age_factor(df, price)
-        
-        # Combinar factores
-        base_strength = min(touches / 3.0, 1.0)  # Normalizar por 3 toques
-        volume_factor = min(volume_strength, 0.3)  # Máximo 30% de bonificación
-        age_bonus = min(age_factor, 0.2)  # Máximo 20% de bonificación
-        
-        total_strength = base_strength + volume_factor + age_bonus
-        return min(total_strength, 1.0)
-    
-    def _count_touches(self, df: pd.DataFrame, price: float, tolerance: float = 0.001) -> int:
-        """Contar cuántas veces el precio tocó un nivel"""
-        price_range = (price * (1 - tolerance), price * (1 + tolerance))
-        
-        high_touches = ((df['High'] >= price_range[0]) & (df['High'] <= price_range[1])).sum()
-        low_touches = ((df['Low'] >= price_range[0]) & (df['Low'] <= price_range[1])).sum()
-        
-        return int(max(high_touches, low_touches))
-    
-    def _calculate_volume_strength(self, df: pd.DataFrame, price: float) -> float:
-        """Calcular fuerza basada en volumen cerca del nivel"""
-        tolerance = 0.002  # 0.2%
-        price_range = (price * (1 - tolerance), price * (1 + tolerance))
-        
-        # Encontrar velas que tocaron el nivel
-        touches_mask = (
-            ((df['High'] >= price_range[0]) & (df['High'] <= price_range[1])) |
-            ((df['Low'] >= price_range[0]) & (df['Low'] <= price_range[1]))
-        )
-        
-        if not touches_mask.any():
-            return 0.0
-        
-        # Si no hay columna Volume, retornar 0
-        if 'Volume' not in df.columns:
-            return 0.0
-        
-        # Volumen promedio en toques vs volumen general
-        touch_volume = df.loc[touches_mask, 'Volume'].mean()
-        avg_volume = df['Volume'].mean()
-        
-        if avg_volume > 0:
-            volume_ratio = touch_volume / avg_volume
-            return min(volume_ratio - 1.0, 1.0) if volume_ratio > 1.0 else 0.0
-        
-        return 0.0
-    
-    def _calculate_age_factor(self, df: pd.DataFrame, price: float) -> float:
-        """Calcular factor de antigüedad del nivel"""
-        tolerance = 0.001
-        price_range = (price * (1 - tolerance), price * (1 + tolerance))
-        
-        # Encontrar primera y última vez que se tocó el nivel
-        touches_mask = (
-            ((df['High'] >= price_range[0]) & (df['High'] <= price_range[1])) |
-            ((df['Low'] >= price_range[0]) & (df['Low'] <= price_range[1]))
-        )
-        
-        if not touches_mask.any():
-            return 0.0
-        
-        touch_indices = df.index[touches_mask]
-        first_touch = touch_indices[0]
-        last_touch = touch_indices[-1]
-        
-        # Calcular antigüedad (períodos entre primer y último toque)
-        age_periods = df.index.get_loc(last_touch) - df.index.get_loc(first_touch)
-        max_age = len(df) * 0.5  # 50% del dataset como máximo
-        
-        return min(age_periods / max_age, 1.0) if max_age > 0 else 0.0
@@ -4,6 +4,9 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 
+from .indicators import Stochastic
+from .features import FeatureStore
+
 class TradingStrategyComponents:
     """Componentes específicos para cada estrategia de trading"""
     
@@ -46,8 +49,8 @@ class TradingStrategyComponents:
     def apply_swing_trading_strategy(df: pd.DataFrame, config) -> Dict:
         """Estrategia Swing Trading - Enfoque en H4, D1, W1"""
         try:
-            swing_highs = TradingStrategyComponents._find_swing_points(df['High'], order=10, mode='max')
-            swing_lows = TradingStrategyComponents._find_swing_points(df['Low'], order=10, mode='min')
+            swing_highs = TradingStrategyComponents._find_swing_points(df, 'High', order=10, mode='max')
+            swing_lows = TradingStrategyComponents._find_swing_points(df, 'Low', order=10, mode='min')
             trend = TradingStrategyComponents._calculate_trend(df, period=50)
             retracement = TradingStrategyComponents._detect_retracement(df, trend)
             
@@ -86,13 +89,8 @@ class TradingStrategyComponents:
     @staticmethod
     def _calculate_stochastic(df: pd.DataFrame, k_period: int = 14, d_period: int = 3) -> Tuple[pd.Series, pd.Series]:
         """Calcular indicador Stochastic"""
-        low_min = df['Low'].rolling(window=k_period).min()
-        high_max = df['High'].rolling(window=k_period).max()
-        
-        k_percent = 100 * ((df['Close'] - low_min) / (high_max - low_min))
-        d_percent = k_percent.rolling(window=d_period).mean()
-        
-        return k_percent, d_percent
+        k_percent, d_percent = Stochastic(k_period, d_period).batch(df['Close'], df['High'], df['Low'])
+        return pd.Series(k_percent, index=df.index), pd.Series(d_percent, index=df.index)
     
     @staticmethod
     def _detect_stochastic_divergence(df: pd.DataFrame, stoch_k: pd.Series, stoch_d: pd.Series) -> bool:
@@ -159,14 +157,10 @@ class TradingStrategyComponents:
             return False
     
     @staticmethod
-    def _find_swing_points(series: pd.Series, order: int = 5, mode: str = 'max') -> List[int]:
-        """Encontrar puntos de swing"""
+    def _find_swing_points(df: pd.DataFrame, column: str, order: int = 5, mode: str = 'max') -> List[int]:
+        """Encontrar puntos de swing (extremos compartidos de la instantánea)"""
         try:
-            from scipy.signal import argrelextrema
-            if mode == 'max':
-                return argrelextrema(series.values, np.greater, order=order)[0].tolist()
-            else:
-                return argrelextrema(series.values, np.less, order=order)[0].tolist()
+            return FeatureStore.of(df).extrema(column, order, mode).tolist()
         except:
             return []
 
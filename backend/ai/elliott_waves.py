@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Optional, Tuple
-from scipy.signal import argrelextrema
 import logging
 
+from .features import FeatureStore
+
 class ElliottWaveAnalyzer:
     """Analizador de Ondas de Elliott con IA"""
     
@@ -21,73 +22,115 @@ class ElliottWaveAnalyzer:
         # Parámetros para detección
         self.min_wave_length = 5  # Mínimo de velas por onda
         self.extrema_order = 3    # Orden para encontrar extremos
+        self.degree_orders = (3, 5, 8, 13, 21)  # Órdenes del modo multi-grado
+        self.degree_min_bars = 2000  # Desde aquí analyze usa el modo multi-grado
     
     async def analyze(self, df: pd.DataFrame) -> Optional[Dict]:
-        """Análisis principal de ondas de Elliott"""
+        """
+        Análisis principal de ondas de Elliott. Con historiales largos se analizan
+        todos los grados y se devuelve el de mayor confianza (con su 'degree').
+        """
         try:
-            if len(df) < 50:  # Necesitamos suficientes datos
-                return None
-            
-            # Encontrar extremos locales
-            highs, lows = self._find_extrema(df)
-            
-            if len(highs) < 3 or len(lows) < 3:
-                return None
-            
-            # Crear secuencia de puntos pivot
-            pivots = self._create_pivot_sequence(df, highs, lows)
-            
-            if len(pivots) < 5:  # Necesitamos al menos 5 puntos para una onda de 5
-                return None
-            
-            # Detectar patrones de 5 ondas
-            wave_patterns = self._detect_five_wave_patterns(pivots)
-            
-            if not wave_patterns:
-                return None
-            
-            # Seleccionar el mejor patrón
-            best_pattern = max(wave_patterns, key=lambda x: x['confidence'])
-            
-            # Generar proyecciones
-            projections = self._generate_projections(best_pattern, df)
-            
-            # Determinar estado actual del mercado
-            market_state = self._determine_market_state(best_pattern, df)
-            
-            return {
-                'pattern': best_pattern,
-                'projections': projections,
-                'market_state': market_state,
-                'confidence': best_pattern['confidence'],
-                'targets': self._calculate_targets(best_pattern, projections),
-                'description': self._generate_description(best_pattern, market_state)
-            }
-            
+            if len(df) >= self.degree_min_bars:
+                return self._best_degree(await self.analyze_degrees(df))
+            return self._analyze_order(df, self.extrema_order)
         except Exception as e:
             self.logger.error(f"Error en análisis Elliott Wave: {e}")
             return None
     
-    def _find_extrema(self, df: pd.DataFrame) -> Tuple[List[int], List[int]]:
+    def _best_degree(self, results: Dict[int, Optional[Dict]]) -> Optional[Dict]:
+        """Resultado de mayor confianza entre grados"""
+        found = [(order, result) for order, result in results.items() if result]
+        if not found:
+            return None
+        order, best = max(found, key=lambda item: item[1]['confidence'])
+        return {**best, 'degree': order}
+    
+    async def analyze_degrees(self, df: pd.DataFrame, orders: Optional[Tuple[int, ...]] = None) -> Dict[int, Optional[Dict]]:
+        """
+        Análisis por grados: un resultado por orden de extremos (de menor a mayor
+        escala). Los extremos de cada orden se obtienen refinando los del anterior.
+        """
+        orders = tuple(sorted(set(orders or self.degree_orders)))
+        try:
+            features = FeatureStore.of(df)
+            features.extrema_orders('High', orders, 'max')
+            features.extrema_orders('Low', orders, 'min')
+        except Exception as e:
+            self.logger.error(f"Error en análisis Elliott Wave por grados: {e}")
+            return {order: None for order in orders}
+        
+        results = {}
+        for order in orders:
+            try:
+                results[order] = self._analyze_order(df, order)
+            except Exception as e:
+                self.logger.error(f"Error en análisis Elliott Wave (orden {order}): {e}")
+                results[order] = None
+        return results
+    
+    def _analyze_order(self, df: pd.DataFrame, order: int) -> Optional[Dict]:
+        """Análisis completo con extremos de orden `order`"""
+        if len(df) < 50:  # Necesitamos suficientes datos
+            return None
+        
+        # Encontrar extremos locales
+        highs, lows = self._find_extrema(df, order)
+        
+        if len(highs) < 3 or len(lows) < 3:
+            return None
+        
+        # Crear secuencia de puntos pivot
+        pivots = self._create_pivot_sequence(df, highs, lows)
+        
+        if len(pivots['index']) < 5:  # Necesitamos al menos 5 puntos para una onda de 5
+            return None
+        
+        # Detectar patrones de 5 ondas
+        wave_patterns = self._detect_five_wave_patterns(pivots, df.index)
+        
+        if not wave_patterns:
+            return None
+        
+        # Seleccionar el mejor patrón
+        best_pattern = max(wave_patterns, key=lambda x: x['confidence'])
+        
+        # Generar proyecciones
+        projections = self._generate_projections(best_pattern, df)
+        
+        # Determinar estado actual del mercado
+        market_state = self._determine_market_state(best_pattern, df)
+        
+        return {
+            'pattern': best_pattern,
+            'projections': projections,
+            'market_state': market_state,
+            'confidence': best_pattern['confidence'],
+            'targets': self._calculate_targets(best_pattern, projections),
+            'description': self._generate_description(best_pattern, market_state)
+        }
+    
+    def _find_extrema(self, df: pd.DataFrame, order: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
         """Encontrar máximos y mínimos locales"""
-        highs = argrelextrema(df['High'].values, np.greater, order=self.extrema_order)[0]
-        lows = argrelextrema(df['Low'].values, np.less, order=self.extrema_order)[0]
+        order = order or self.extrema_order
+        features = FeatureStore.of(df)
+        highs = features.extrema('High', order, 'max')
+        lows = features.extrema('Low', order, 'min')
         
         # Filtrar extremos muy cercanos
-        highs = self._filter_close_extrema(df, highs, 'High')
-        lows = self._filter_close_extrema(df, lows, 'Low')
+        highs = self._filter_close_extrema(features.column('High'), highs)
+        lows = self._filter_close_extrema(features.column('Low'), lows)
         
-        return highs.tolist(), lows.tolist()
+        return highs, lows
     
-    def _filter_close_extrema(self, df: pd.DataFrame, extrema: np.ndarray, column: str) -> np.ndarray:
+    def _filter_close_extrema(self, prices: np.ndarray, extrema: np.ndarray) -> np.ndarray:
         """Filtrar extremos que están muy cerca en precio o tiempo"""
         if len(extrema) <= 1:
             return extrema
         
-        filtered = [extrema[0]]
+        filtered = [int(extrema[0])]
         
-        for i in range(1, len(extrema)):
-            current_idx = extrema[i]
+        for current_idx in extrema[1:].tolist():
             last_idx = filtered[-1]
             
             # Filtrar por distancia temporal (mínimo 5 velas)
@@ -95,53 +138,78 @@ class ElliottWaveAnalyzer:
                 continue
             
             # Filtrar por diferencia de precio (mínimo 0.1%)
-            current_price = df[column].iloc[current_idx]
-            last_price = df[column].iloc[last_idx]
-            price_diff = abs(current_price - last_price) / last_price
+            last_price = prices[last_idx]
+            price_diff = abs(prices[current_idx] - last_price) / last_price
             
             if price_diff >= 0.001:  # 0.1% mínimo
                 filtered.append(current_idx)
         
         return np.array(filtered)
     
-    def _create_pivot_sequence(self, df: pd.DataFrame, highs: List[int], lows: List[int]) -> List[Dict]:
-        """Crear secuencia ordenada de puntos pivot"""
-        pivots = []
-        
-        # Agregar highs
-        for idx in highs:
-            pivots.append({
-                'index': idx,
-                'price': float(df['High'].iloc[idx]),
-                'type': 'high',
-                'timestamp': df.index[idx]
-            })
-        
-        # Agregar lows
-        for idx in lows:
-            pivots.append({
+    def _create_pivot_sequence(self, df: pd.DataFrame, highs: np.ndarray, lows: np.ndarray) -> Dict[str, np.ndarray]:
+        """Secuencia ordenada de puntos pivot como arrays: posición, precio y tipo (1 = high, -1 = low)"""
+        features = FeatureStore.of(df)
+        highs = np.asarray(highs, dtype=np.int64)
+        lows = np.asarray(lows, dtype=np.int64)
+        
+        index = np.concatenate((highs, lows))
+        price = np.concatenate((features.column('High')[highs], features.column('Low')[lows]))
+        kind = np.concatenate((np.ones(len(highs), dtype=np.int8), -np.ones(len(lows), dtype=np.int8)))
+        
+        # Ordenar por índice temporal (estable: en empate el high va primero)
+        order = np.argsort(index, kind='stable')
+        return {'index': index[order], 'price': price[order], 'kind': kind[order]}
+    
+    def _wave_candidates(self, pivots: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Inicio de cada ventana de 5 pivots que cumple las reglas duras: alternancia
+        high/low, la onda 3 no es la más corta y la onda 4 no solapa la onda 1.
+        """
+        count = len(pivots['index']) - 4
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+        
+        kind = pivots['kind'].astype(np.int64)
+        price = pivots['price']
+        p = [price[k:k + count] for k in range(5)]
+        
+        # Alternancia: low-high-low-high-low o high-low-high-low-high
+        keep = np.ones(count, dtype=bool)
+        for k in range(1, 5):
+            keep &= kind[k:k + count] == kind[:count] * (-1) ** k
+        
+        # Onda 3 no puede ser la más corta
+        wave1 = np.abs(p[1] - p[0])
+        wave3 = np.abs(p[3] - p[2])
+        wave5 = np.abs(p[4] - p[3])
+        keep &= wave3 != np.minimum(np.minimum(wave1, wave3), wave5)
+        
+        # Onda 4 no debe solaparse con la onda 1 (en precio)
+        bullish = p[4] > p[0]
+        keep &= np.where(bullish, p[4] > p[1], p[4] < p[1])
+        
+        return np.flatnonzero(keep)
+    
+    def _pivot_dicts(self, pivots: Dict[str, np.ndarray], time_index: pd.Index, start: int) -> List[Dict]:
+        """Los 5 pivots desde `start` en el formato de salida"""
+        waves = []
+        for k in range(start, start + 5):
+            idx = int(pivots['index'][k])
+            waves.append({
                 'index': idx,
-                'price': float(df['Low'].iloc[idx]),
-                'type': 'low',
-                'timestamp': df.index[idx]
+                'price': float(pivots['price'][k]),
+                'type': 'high' if pivots['kind'][k] > 0 else 'low',
+                'timestamp': time_index[idx]
             })
-        
-        # Ordenar por índice temporal
-        pivots.sort(key=lambda x: x['index'])
-        
-        return pivots
+        return waves
     
-    def _detect_five_wave_patterns(self, pivots: List[Dict]) -> List[Dict]:
+    def _detect_five_wave_patterns(self, pivots: Dict[str, np.ndarray], time_index: pd.Index) -> List[Dict]:
         """Detectar patrones de 5 ondas de Elliott"""
         patterns = []
         
-        # Buscar secuencias de 5 ondas
-        for i in range(len(pivots) - 4):
-            wave_sequence = pivots[i:i+5]
-            
-            # Validar que alternen high-low o low-high
-            if not self._is_valid_alternation(wave_sequence):
-                continue
+        # Sólo las ventanas que pasan las reglas duras llegan a la puntuación
+        for i in self._wave_candidates(pivots).tolist():
+            wave_sequence = self._pivot_dicts(pivots, time_index, i)
             
             # Validar proporciones de Fibonacci
             fib_score = self._validate_fibonacci_ratios(wave_sequence)
@@ -159,20 +227,6 @@ class ElliottWaveAnalyzer:
         
         return patterns
     
-    def _is_valid_alternation(self, waves: List[Dict]) -> bool:
-        """Validar que los pivots alternen correctamente"""
-        if len(waves) != 5:
-            return False
-        
-        types = [wave['type'] for wave in waves]
-        
-        # Patrón alcista: low-high-low-high-low
-        bullish_pattern = ['low', 'high', 'low', 'high', 'low']
-        # Patrón bajista: high-low-high-low-high
-        bearish_pattern = ['high', 'low', 'high', 'low', 'high']
-        
-        return types == bullish_pattern or types == bearish_pattern
-    
     def _validate_fibonacci_ratios(self, waves: List[Dict]) -> float:
         """Validar ratios de Fibonacci entre ondas"""
         if len(waves) != 5:
@@ -0,0 +1,170 @@
+import pandas as pd
+import numpy as np
+from typing import Any, Callable, Dict, Hashable, Tuple
+import threading
+import weakref
+
+from scipy.signal import argrelextrema, find_peaks
+
+from .indicators import ATR
+
+
+class FeatureStore:
+    """
+    Series derivadas de una instantánea de velas (extremos locales, pivots,
+    máximos/mínimos de ventana, indicadores), calculadas al pedirlas y
+    memorizadas por parámetros.
+
+    `FeatureStore.of(df)` devuelve el almacén ligado a ese DataFrame concreto, de
+    modo que todos los analizadores que reciben la misma instantánea comparten
+    los cálculos: cada serie se calcula una sola vez por `analyze_symbol`. Los
+    valores devueltos son compartidos y no deben modificarse.
+    """
+
+    # id(df) -> (referencia débil al DataFrame, almacén). RLock: el recolector puede
+    # liberar otra instantánea (y llamar a _release) mientras se tiene el lock
+    _registry: Dict[int, Tuple[weakref.ref, "FeatureStore"]] = {}
+    _registry_lock = threading.RLock()
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = weakref.ref(df)
+        self._values: Dict[Hashable, Any] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @classmethod
+    def of(cls, df: pd.DataFrame) -> "FeatureStore":
+        """Almacén de la instantánea `df` (se libera junto con el DataFrame)"""
+        key = id(df)
+        with cls._registry_lock:
+            entry = cls._registry.get(key)
+            if entry is not None and entry[0]() is df:
+                return entry[1]
+
+            store = cls(df)
+            cls._registry[key] = (weakref.ref(df, lambda _, key=key: cls._release(key)), store)
+            return store
+
+    @classmethod
+    def _release(cls, key: int):
+        with cls._registry_lock:
+            entry = cls._registry.get(key)
+            if entry is not None and entry[0]() is None:
+                del cls._registry[key]
+
+    @property
+    def df(self) -> pd.DataFrame:
+        df = self._df()
+        if df is None:
+            raise ReferenceError("La instantánea de velas ya no existe")
+        return df
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Valor memorizado de `key`; lo calcula una sola vez aunque lo pidan varios hilos"""
+        with self._lock:
+            if key in self._values:
+                self.stats['hits'] += 1
+                return self._values[key]
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._values:
+                    self.stats['hits'] += 1
+                    return self._values[key]
+            value = compute()
+            with self._lock:
+                self._values[key] = value
+                self._locks.pop(key, None)
+                self.stats['misses'] += 1
+            return value
+
+    # ========== SERIES ==========
+
+    def resolve(self, name: str) -> str:
+        """Nombre real de la columna; admite 'high' o 'High' indistintamente"""
+        columns = self.df.columns
+        if name in columns:
+            return name
+        for column in columns:
+            if str(column).lower() == name.lower():
+                return column
+        raise KeyError(name)
+
+    def column(self, name: str) -> np.ndarray:
+        """Columna como array float"""
+        name = self.resolve(name)
+        return self.get(('column', name), lambda: self.df[name].to_numpy(dtype=float))
+
+    def extrema(self, column: str, order: int, mode: str = 'max') -> np.ndarray:
+        """Posiciones de máximos/mínimos locales estrictos (argrelextrema)"""
+        def compute():
+            comparator = np.greater if mode == 'max' else np.less
+            return argrelextrema(self.column(column), comparator, order=order)[0]
+        return self.get(('extrema', self.resolve(column), order, mode), compute)
+
+    def extrema_orders(self, column: str, orders, mode: str = 'max') -> Dict[int, np.ndarray]:
+        """
+        Extremos locales para varios órdenes. Los de orden mayor son un subconjunto
+        de los de orden menor, así que sólo el menor recorre toda la serie y cada
+        orden siguiente refina los candidatos del anterior.
+        """
+        orders = sorted(set(orders))
+        if not orders:
+            return {}
+        result = {orders[0]: self.extrema(column, orders[0], mode)}
+        for previous, order in zip(orders, orders[1:]):
+            candidates = result[previous]
+            result[order] = self.get(
+                ('extrema', self.resolve(column), order, mode),
+                lambda candidates=candidates, order=order: self._refine_extrema(column, candidates, order, mode)
+            )
+        return result
+
+    def _refine_extrema(self, column: str, candidates: np.ndarray, order: int, mode: str) -> np.ndarray:
+        """Candidatos que siguen siendo extremos estrictos con ventana `order` (bordes como argrelextrema, mode='clip')"""
+        values = self.column(column)
+        if not len(candidates):
+            return candidates
+        padded = np.concatenate((np.repeat(values[:1], order), values, np.repeat(values[-1:], order)))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * order + 1)[candidates]
+        center = values[candidates]
+        if mode == 'max':
+            keep = (center > windows[:, :order].max(axis=1)) & (center > windows[:, order + 1:].max(axis=1))
+        else:
+            keep = (center < windows[:, :order].min(axis=1)) & (center < windows[:, order + 1:].min(axis=1))
+        return candidates[keep]
+
+    def peaks(self, column: str, distance: int, mode: str = 'max', tail: int = 0) -> np.ndarray:
+        """Posiciones de picos (find_peaks) en las últimas `tail` velas (0 = todas), relativas a esa ventana"""
+        def compute():
+            values = self.column(column)
+            if tail:
+                values = values[-tail:]
+            found, _ = find_peaks(values if mode == 'max' else -values, distance=distance)
+            return found
+        return self.get(('peaks', self.resolve(column), distance, mode, tail), compute)
+
+    def window_extreme(self, column: str, period: int, mode: str = 'max') -> Tuple[float, Hashable]:
+        """(valor, etiqueta del índice) del máximo/mínimo de las últimas `period` velas"""
+        def compute():
+            values = self.column(column)[-period:]
+            if not len(values) or np.isnan(values).all():
+                return np.nan, None
+            position = int(np.nanargmax(values) if mode == 'max' else np.nanargmin(values))
+            return float(values[position]), self.df.index[len(self.df) - len(values) + position]
+        return self.get(('window', self.resolve(column), period, mode), compute)
+
+    def indicator(self, indicator) -> Any:
+        """Serie completa (`batch`) de un indicador de ai.indicators, memorizada por `spec`"""
+        def compute():
+            return indicator.batch(self.column('Close'), self.column('High'), self.column('Low'))
+        return self.get(('indicator',) + indicator.spec, compute)
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        return self.indicator(ATR(period))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'features': len(self._values)}
@@ -3,6 +3,12 @@ import pandas as pd
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 
+from .indicators import RSI
+from .features import FeatureStore
+from .fibonacci_engine import (
+    extension_matrix, proximity, ratio_strength, retracement_matrix, swing_extremes, unique_swings
+)
+
 
 @dataclass
 class FibonacciLevel:
@@ -27,16 +33,7 @@ class FibonacciSignal:
 
 
 def calculate_rsi(series: pd.Series, period: int = 14) -> pd.Series:
-    delta = series.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-
-    avg_gain = gain.rolling(window=period, min_periods=period).mean()
-    avg_loss = loss.rolling(window=period, min_periods=period).mean()
-
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    return pd.Series(RSI(period).batch(series), index=series.index)
 
 
 class FibonacciAnalyzer:
@@ -47,6 +44,8 @@ class FibonacciAnalyzer:
         self.extension_levels = [1.272, 1.414, 1.618, 2.0, 2.618]
         # Tolerancia para considerar que el precio está en un nivel
         self.level_tolerance = 0.001  # 0.1%
+        # Ventanas (velas) en las que se buscan swings
+        self.swing_lookbacks = [20, 30, 50]
         
     def analyze_fibonacci(self, df: pd.DataFrame, timeframe: str) -> List[FibonacciSignal]:
         """Analiza todos los niveles de Fibonacci en los datos"""
@@ -54,89 +53,83 @@ class FibonacciAnalyzer:
         
         # Encontrar swings significativos
         swings = self._find_significant_swings(df)
-        
-        for swing in swings:
-            # Analizar retrocesos de Fibonacci
-            retracement_signals = self._analyze_fibonacci_retracements(
-                df, swing['high'], swing['low'], swing['direction'], timeframe
-            )
-            signals.extend(retracement_signals)
-            
-            # Analizar extensiones de Fibonacci
-            extension_signals = self._analyze_fibonacci_extensions(
-                df, swing['high'], swing['low'], swing['direction'], timeframe
-            )
-            signals.extend(extension_signals)
+        if not swings:
+            return signals
+        
+        # Todos los niveles de todos los swings a la vez (swings × ratios) y su distancia al precio
+        current_price = float(FeatureStore.of(df).column('close')[-1])
+        swing_highs = np.array([swing['high'] for swing in swings])
+        swing_lows = np.array([swing['low'] for swing in swings])
+        retracements = retracement_matrix(swing_highs, swing_lows, np.array(self.retracement_levels))
+        extensions = extension_matrix(swing_highs, swing_lows, np.array(self.extension_levels))
+        retracement_distance = proximity(retracements, current_price)
+        extension_distance = proximity(extensions, current_price)
+        
+        # Sólo los swings con algún nivel dentro de la tolerancia pueden generar señales
+        for i, swing in enumerate(swings):
+            if (retracement_distance[i] <= self.level_tolerance).any():
+                signals.extend(self._analyze_fibonacci_retracements(
+                    df, swing['high'], swing['low'], swing['direction'], timeframe,
+                    retracements[i], retracement_distance[i]
+                ))
+            if (extension_distance[i] <= self.level_tolerance).any():
+                signals.extend(self._analyze_fibonacci_extensions(
+                    df, swing['high'], swing['low'], swing['direction'], timeframe,
+                    extensions[i], extension_distance[i]
+                ))
         
         return signals
     
     def _find_significant_swings(self, df: pd.DataFrame, min_swing_size: float = 0.02) -> List[Dict]:
         """Encuentra swings significativos para análisis de Fibonacci"""
-        swings = []
-        
-        # Buscar en diferentes períodos
-        for period in [20, 30, 50]:
-            if len(df) < period:
-                continue
-                
-            recent_data = df.tail(period)
-            high_price = recent_data['high'].max()
-            low_price = recent_data['low'].min()
-            
-            # Verificar que el swing sea significativo
-            swing_size = (high_price - low_price) / low_price
-            
-            if swing_size >= min_swing_size:
-                # Determinar dirección del swing
-                high_idx = recent_data['high'].idxmax()
-                low_idx = recent_data['low'].idxmin()
-                
-                direction = 'bullish' if high_idx > low_idx else 'bearish'
-                
-                swings.append({
-                    'high': high_price,
-                    'low': low_price,
-                    'high_idx': high_idx,
-                    'low_idx': low_idx,
-                    'direction': direction,
-                    'size': swing_size,
-                    'period': period
-                })
+        features = FeatureStore.of(df)
+        lookbacks = [period for period in self.swing_lookbacks if period <= len(df)]
+        if not lookbacks:
+            return []
+        
+        # Máximo y mínimo de cada ventana en un solo recorrido
+        highs, high_positions, lows, low_positions = swing_extremes(
+            features.column('high'), features.column('low'), lookbacks
+        )
+        sizes = (highs - lows) / lows
+        significant = np.flatnonzero(sizes >= min_swing_size)
         
         # Eliminar duplicados y ordenar por tamaño
-        unique_swings = []
-        for swing in swings:
-            is_duplicate = False
-            for existing in unique_swings:
-                if (abs(swing['high'] - existing['high']) / swing['high'] < 0.005 and
-                    abs(swing['low'] - existing['low']) / swing['low'] < 0.005):
-                    is_duplicate = True
-                    break
-            if not is_duplicate:
-                unique_swings.append(swing)
-        
-        return sorted(unique_swings, key=lambda x: x['size'], reverse=True)[:3]
+        significant = significant[unique_swings(highs[significant], lows[significant])]
+        significant = significant[np.argsort(-sizes[significant], kind='stable')][:3]
+        
+        return [
+            {
+                'high': float(highs[i]),
+                'low': float(lows[i]),
+                'high_idx': df.index[high_positions[i]],
+                'low_idx': df.index[low_positions[i]],
+                'direction': 'bullish' if high_positions[i] > low_positions[i] else 'bearish',
+                'size': float(sizes[i]),
+                'period': lookbacks[i]
+            }
+            for i in significant
+        ]
     
     def _analyze_fibonacci_retracements(self, df: pd.DataFrame, swing_high: float, 
-                                      swing_low: float, direction: str, timeframe: str) -> List[FibonacciSignal]:
-        """Analiza niveles de retroceso de Fibonacci"""
+                                      swing_low: float, direction: str, timeframe: str,
+                                      prices: np.ndarray, distances: np.ndarray) -> List[FibonacciSignal]:
+        """Analiza niveles de retroceso de Fibonacci (`prices`/`distances`: fila del swing)"""
         signals = []
-        current_price = df['close'].iloc[-1]
-        
-        # Calcular niveles de retroceso
-        fib_levels = self._calculate_fibonacci_levels(swing_high, swing_low, 'retracement')
+        current_price = float(FeatureStore.of(df).column('close')[-1])
+        ratios = np.array(self.retracement_levels)
+        fib_levels = None
         
-        # Encontrar el nivel más relevante
-        relevant_levels = self._find_relevant_levels(current_price, fib_levels)
+        # Niveles dentro del 2%, los más cercanos (y fuertes) primero
+        strengths = ratio_strength(ratios)
+        relevant = np.flatnonzero(distances <= 0.02)
+        relevant = relevant[np.lexsort((-strengths[relevant], distances[relevant]))][:3]
         
-        for level_info in relevant_levels:
-            level = level_info['level']
-            price = level_info['price']
+        for i in relevant:
+            level, price = float(ratios[i]), float(prices[i])
             
             # Verificar si el precio está cerca del nivel
-            distance_to_level = abs(current_price - price) / current_price
-            
-            if distance_to_level <= self.level_tolerance:
+            if distances[i] <= self.level_tolerance:
                 # Determinar tipo de señal
                 signal_type, trade_direction = self._determine_fibonacci_signal_type(
                     current_price, price, direction, level
@@ -148,6 +141,8 @@ class FibonacciAnalyzer:
                     )
                     
                     if confidence > 0.6:
+                        if fib_levels is None:
+                            fib_levels = self._calculate_fibonacci_levels(swing_high, swing_low, 'retracement', prices)
                         # Calcular stop loss y take profit
                         stop_loss, take_profit = self._calculate_fibonacci_targets(
                             current_price, price, trade_direction, fib_levels
@@ -171,121 +166,74 @@ class FibonacciAnalyzer:
         return signals
     
     def _analyze_fibonacci_extensions(self, df: pd.DataFrame, swing_high: float,
-                                    swing_low: float, direction: str, timeframe: str) -> List[FibonacciSignal]:
-        """Analiza niveles de extensión de Fibonacci"""
+                                    swing_low: float, direction: str, timeframe: str,
+                                    prices: np.ndarray, distances: np.ndarray) -> List[FibonacciSignal]:
+        """Analiza niveles de extensión de Fibonacci (`prices`/`distances`: fila del swing)"""
         signals = []
-        current_price = df['close'].iloc[-1]
-        
-        # Calcular niveles de extensión
-        fib_levels = self._calculate_fibonacci_levels(swing_high, swing_low, 'extension')
+        current_price = float(FeatureStore.of(df).column('close')[-1])
+        fib_levels = self._calculate_fibonacci_levels(swing_high, swing_low, 'extension', prices)
         
         # Verificar si el precio está cerca de algún nivel de extensión
-        for fib_level in fib_levels:
-            distance_to_level = abs(current_price - fib_level.price) / current_price
+        for i in np.flatnonzero(distances <= self.level_tolerance):
+            fib_level = fib_levels[i]
+            # Las extensiones suelen actuar como resistencia/soporte
+            if direction == 'bullish' and current_price >= fib_level.price:
+                signal_type = "FIBONACCI_RESISTANCE"
+                trade_direction = "SELL"
+            elif direction == 'bearish' and current_price <= fib_level.price:
+                signal_type = "FIBONACCI_SUPPORT"
+                trade_direction = "BUY"
+            else:
+                continue
             
-            if distance_to_level <= self.level_tolerance:
-                # Las extensiones suelen actuar como resistencia/soporte
-                if direction == 'bullish' and current_price >= fib_level.price:
-                    signal_type = "FIBONACCI_RESISTANCE"
-                    trade_direction = "SELL"
-                elif direction == 'bearish' and current_price <= fib_level.price:
-                    signal_type = "FIBONACCI_SUPPORT"
-                    trade_direction = "BUY"
-                else:
-                    continue
-                
-                confidence = self._calculate_fibonacci_confidence(
-                    df, fib_level.price, fib_level.level, direction
+            confidence = self._calculate_fibonacci_confidence(
+                df, fib_level.price, fib_level.level, direction
+            )
+            
+            if confidence > 0.65:
+                stop_loss, take_profit = self._calculate_extension_targets(
+                    current_price, fib_level.price, trade_direction, fib_levels
                 )
                 
-                if confidence > 0.65:
-                    stop_loss, take_profit = self._calculate_extension_targets(
-                        current_price, fib_level.price, trade_direction, fib_levels
-                    )
-                    
-                    signal = FibonacciSignal(
-                        signal_type=signal_type,
-                        confidence=confidence,
-                        entry_price=current_price,
-                        stop_loss=stop_loss,
-                        take_profit=take_profit,
-                        direction=trade_direction,
-                        fibonacci_levels=fib_levels,
-                        swing_high=swing_high,
-                        swing_low=swing_low,
-                        timeframe_detected=timeframe,
-                        timestamp=str(df.index[-1])
-                    )
-                    signals.append(signal)
+                signal = FibonacciSignal(
+                    signal_type=signal_type,
+                    confidence=confidence,
+                    entry_price=current_price,
+                    stop_loss=stop_loss,
+                    take_profit=take_profit,
+                    direction=trade_direction,
+                    fibonacci_levels=fib_levels,
+                    swing_high=swing_high,
+                    swing_low=swing_low,
+                    timeframe_detected=timeframe,
+                    timestamp=str(df.index[-1])
+                )
+                signals.append(signal)
         
         return signals
     
     def _calculate_fibonacci_levels(self, swing_high: float, swing_low: float, 
-                                  level_type: str) -> List[FibonacciLevel]:
-        """Calcula los niveles de Fibonacci"""
-        levels = []
-        swing_range = swing_high - swing_low
-        
+                                  level_type: str, prices: Optional[np.ndarray] = None) -> List[FibonacciLevel]:
+        """Calcula los niveles de Fibonacci (o los construye a partir de `prices` ya calculados)"""
         if level_type == 'retracement':
-            for level in self.retracement_levels:
-                price = swing_high - (swing_range * level)
-                strength = self._calculate_level_strength(level)
-                
-                levels.append(FibonacciLevel(
-                    level=level,
-                    price=price,
-                    level_type=level_type,
-                    strength=strength
-                ))
-        
+            ratios = np.array(self.retracement_levels)
+            if prices is None:
+                prices = retracement_matrix(np.array([swing_high]), np.array([swing_low]), ratios)[0]
         elif level_type == 'extension':
-            for level in self.extension_levels:
-                # Extensiones desde el swing low
-                price = swing_high + (swing_range * (level - 1))
-                strength = self._calculate_level_strength(level)
-                
-                levels.append(FibonacciLevel(
-                    level=level,
-                    price=price,
-                    level_type=level_type,
-                    strength=strength
-                ))
+            ratios = np.array(self.extension_levels)
+            if prices is None:
+                prices = extension_matrix(np.array([swing_high]), np.array([swing_low]), ratios)[0]
+        else:
+            return []
         
-        return levels
+        return [
+            FibonacciLevel(level=float(level), price=float(price), level_type=level_type, strength=float(strength))
+            for level, price, strength in zip(ratios, prices, ratio_strength(ratios))
+        ]
     
     def _calculate_level_strength(self, level: float) -> float:
         """Calcula la fuerza de un nivel de Fibonacci"""
-        # Niveles más importantes tienen mayor fuerza
-        important_levels = {
-            0.382: 0.8,
-            0.5: 0.9,
-            0.618: 1.0,  # Nivel más importante
-            0.786: 0.7,
-            1.272: 0.8,
-            1.618: 1.0,  # Golden ratio
-            2.0: 0.7
-        }
-        
-        return important_levels.get(level, 0.5)
-    
-    def _find_relevant_levels(self, current_price: float, 
-                            fib_levels: List[FibonacciLevel]) -> List[Dict]:
-        """Encuentra los niveles más relevantes cerca del precio actual"""
-        relevant = []
-        
-        for fib_level in fib_levels:
-            distance = abs(current_price - fib_level.price) / current_price
-            
-            if distance <= 0.02:  # Dentro del 2%
-                relevant.append({
-                    'level': fib_level.level,
-                    'price': fib_level.price,
-                    'strength': fib_level.strength,
-                    'distance': distance
-                })
-        
-        # Ordenar por distancia y fuerza
-        return sorted(relevant, key=lambda x: (x['distance'], -x['strength']))[:3]
+        return float(ratio_strength(np.array([level]))[0])
     
     def _determine_fibonacci_signal_type(self, current_price: float, fib_price: float,
                                        swing_direction: str, fib_level: float) -> Tuple[Optional[str], Optional[str]]:
@@ -318,16 +266,17 @@ class FibonacciAnalyzer:
             base_confidence += 0.1
         
         # Verificar volumen reciente
-        recent_volume = df['volume'].iloc[-5:].mean()
-        avg_volume = df['volume'].mean()
+        features = FeatureStore.of(df)
+        volume = features.column('volume')
+        recent_volume = np.nanmean(volume[-5:])
+        avg_volume = np.nanmean(volume)
         
         if recent_volume > avg_volume:
             base_confidence += 0.1
         
         # Verificar si RSI confirma la señal sin usar talib
         if len(df) >= 14:
-            rsi_series = calculate_rsi(df['close'], period=14)
-            rsi = rsi_series.iloc[-1]
+            rsi = features.indicator(RSI(14))[-1]
             if direction == 'bullish' and rsi < 40:  # Oversold con soporte Fib
                 base_confidence += 0.1
             elif direction == 'bearish' and rsi > 60:  # Overbought con resistencia Fib
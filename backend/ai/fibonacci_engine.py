@@ -0,0 +1,166 @@
+import numpy as np
+from typing import Sequence, Tuple
+
+# JIT opcional: con numba instalado los barridos se compilan; sin él se usa NumPy
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+RETRACEMENT_RATIOS = np.array([0.236, 0.382, 0.5, 0.618, 0.786])
+EXTENSION_RATIOS = np.array([1.272, 1.414, 1.618, 2.0, 2.618])
+
+# Fuerza de cada ratio (0.5 para los que no figuran)
+_RATIO_STRENGTH = {
+    0.382: 0.8,
+    0.5: 0.9,
+    0.618: 1.0,  # Nivel más importante
+    0.786: 0.7,
+    1.272: 0.8,
+    1.618: 1.0,  # Proporción áurea
+    2.0: 0.7,
+}
+
+
+def ratio_strength(ratios: np.ndarray) -> np.ndarray:
+    """Fuerza de cada ratio de Fibonacci"""
+    return np.array([_RATIO_STRENGTH.get(float(ratio), 0.5) for ratio in ratios])
+
+
+# ========== SWINGS ==========
+
+def _suffix_extremes_numpy(high: np.ndarray, low: np.ndarray):
+    """Máximo/mínimo (y su posición) de las últimas k velas para todo k, recorriendo hacia atrás"""
+    size = len(high)
+    steps = np.arange(size)
+    reversed_high = np.where(np.isnan(high), -np.inf, high)[::-1]
+    reversed_low = np.where(np.isnan(low), np.inf, low)[::-1]
+
+    high_value = np.maximum.accumulate(reversed_high)
+    low_value = np.minimum.accumulate(reversed_low)
+    # Último paso hacia atrás que alcanza el extremo = primera vela (cronológica) con ese valor
+    high_position = size - 1 - np.maximum.accumulate(np.where(reversed_high == high_value, steps, 0))
+    low_position = size - 1 - np.maximum.accumulate(np.where(reversed_low == low_value, steps, 0))
+    return high_value, high_position, low_value, low_position
+
+
+def _rolling_extreme_numpy(values: np.ndarray, window: int, is_max: bool):
+    """Extremo (y su posición) de cada ventana de `window` velas terminada en cada vela"""
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    offsets = windows.argmax(axis=1) if is_max else windows.argmin(axis=1)
+    positions = np.arange(len(windows)) + offsets
+    return values[positions], positions
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _suffix_extremes_jit(high, low):
+        size = len(high)
+        high_value = np.empty(size)
+        low_value = np.empty(size)
+        high_position = np.empty(size, dtype=np.int64)
+        low_position = np.empty(size, dtype=np.int64)
+        best_high, best_low = -np.inf, np.inf
+        at_high, at_low = size - 1, size - 1
+        for step in range(size):
+            i = size - 1 - step
+            if high[i] >= best_high:
+                best_high, at_high = high[i], i
+            if low[i] <= best_low:
+                best_low, at_low = low[i], i
+            high_value[step], high_position[step] = best_high, at_high
+            low_value[step], low_position[step] = best_low, at_low
+        return high_value, high_position, low_value, low_position
+
+    @njit(cache=True)
+    def _rolling_extreme_jit(values, window, is_max):
+        # Cola monótona: O(n) para cualquier ventana; al frente, el extremo más antiguo
+        count = len(values) - window + 1
+        result = np.empty(count)
+        positions = np.empty(count, dtype=np.int64)
+        queue = np.empty(len(values), dtype=np.int64)
+        head, tail = 0, 0
+        for i in range(len(values)):
+            while tail > head and (values[queue[tail - 1]] < values[i] if is_max
+                                   else values[queue[tail - 1]] > values[i]):
+                tail -= 1
+            queue[tail] = i
+            tail += 1
+            if queue[head] <= i - window:
+                head += 1
+            if i >= window - 1:
+                result[i - window + 1] = values[queue[head]]
+                positions[i - window + 1] = queue[head]
+        return result, positions
+
+    _suffix_extremes = _suffix_extremes_jit
+    _rolling_extreme = _rolling_extreme_jit
+else:
+    _suffix_extremes = _suffix_extremes_numpy
+    _rolling_extreme = _rolling_extreme_numpy
+
+
+def swing_extremes(high: np.ndarray, low: np.ndarray,
+                   lookbacks: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (máximo, posición del máximo, mínimo, posición del mínimo) de las últimas
+    `lookback` velas para cada lookback, en un solo recorrido hacia atrás.
+    Los lookbacks mayores que la serie se descartan (arrays más cortos).
+    """
+    high = np.ascontiguousarray(high, dtype=float)
+    low = np.ascontiguousarray(low, dtype=float)
+    steps = np.asarray([lookback for lookback in lookbacks if 0 < lookback <= len(high)], dtype=np.int64) - 1
+    if not len(steps):
+        empty = np.empty(0)
+        return empty, empty.astype(np.int64), empty, empty.astype(np.int64)
+    high_value, high_position, low_value, low_position = _suffix_extremes(high, low)
+    return high_value[steps], high_position[steps], low_value[steps], low_position[steps]
+
+
+def rolling_extremes(values: np.ndarray, window: int, mode: str = 'max') -> Tuple[np.ndarray, np.ndarray]:
+    """Extremo de la ventana de `window` velas terminada en cada vela (desde la vela window-1) y su posición"""
+    values = np.ascontiguousarray(values, dtype=float)
+    if window <= 0 or len(values) < window:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    return _rolling_extreme(values, window, mode == 'max')
+
+
+def unique_swings(highs: np.ndarray, lows: np.ndarray, tolerance: float = 0.005) -> np.ndarray:
+    """
+    Índices de los swings no duplicados, en orden: un swing es duplicado si su máximo
+    y su mínimo están a menos de `tolerance` de los de un swing ya conservado.
+    """
+    duplicate = (
+        (np.abs(highs[:, None] - highs[None, :]) / highs[:, None] < tolerance)
+        & (np.abs(lows[:, None] - lows[None, :]) / lows[:, None] < tolerance)
+    )
+    kept = []
+    for i in range(len(highs)):
+        if not duplicate[i, kept].any():
+            kept.append(i)
+    return np.array(kept, dtype=np.int64)
+
+
+# ========== NIVELES ==========
+
+def retracement_matrix(swing_high: np.ndarray, swing_low: np.ndarray,
+                       ratios: np.ndarray = RETRACEMENT_RATIOS) -> np.ndarray:
+    """Precios de retroceso (swings × ratios) medidos desde el máximo"""
+    swing_high = np.asarray(swing_high, dtype=float)
+    swing_range = swing_high - np.asarray(swing_low, dtype=float)
+    return swing_high[:, None] - swing_range[:, None] * np.asarray(ratios)[None, :]
+
+
+def extension_matrix(swing_high: np.ndarray, swing_low: np.ndarray,
+                     ratios: np.ndarray = EXTENSION_RATIOS) -> np.ndarray:
+    """Precios de extensión (swings × ratios) proyectados sobre el máximo"""
+    swing_high = np.asarray(swing_high, dtype=float)
+    swing_range = swing_high - np.asarray(swing_low, dtype=float)
+    return swing_high[:, None] + swing_range[:, None] * (np.asarray(ratios)[None, :] - 1)
+
+
+def proximity(levels: np.ndarray, price: float) -> np.ndarray:
+    """Distancia relativa de cada nivel al precio"""
+    return np.abs(price - levels) / price
@@ -0,0 +1,570 @@
+import pandas as pd
+import numpy as np
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
+import math
+import threading
+
+NAN = float('nan')
+
+# Cada cuántas velas se recalcula la suma de una ventana para no acumular error
+_RESUM_EVERY = 1024
+
+
+def _div(a: float, b: float) -> float:
+    """División con la semántica de pandas/NumPy (x/0 = ±inf, 0/0 = NaN)"""
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _array(values) -> np.ndarray:
+    return np.asarray(values, dtype=float)
+
+
+# ========== VENTANAS ==========
+
+class RollingMean:
+    """Media móvil simple de ventana fija (equivale a rolling(period).mean())"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self._values: Deque[float] = deque()
+        self._sum = 0.0
+        self._nans = 0
+        self._pushes = 0
+
+    def value_with(self, x: float) -> float:
+        """Media que resultaría de agregar `x`, sin modificar el estado"""
+        if len(self._values) + 1 < self.period:
+            return NAN
+        total, nans = self._sum, self._nans
+        if len(self._values) == self.period:
+            old = self._values[0]
+            if old != old:
+                nans -= 1
+            else:
+                total -= old
+        if x != x:
+            nans += 1
+        else:
+            total += x
+        return total / self.period if nans == 0 else NAN
+
+    def push(self, x: float) -> float:
+        value = self.value_with(x)
+        if len(self._values) == self.period:
+            old = self._values.popleft()
+            if old != old:
+                self._nans -= 1
+            else:
+                self._sum -= old
+        self._values.append(x)
+        if x != x:
+            self._nans += 1
+        else:
+            self._sum += x
+
+        self._pushes += 1
+        if self._pushes % _RESUM_EVERY == 0:
+            self._sum = math.fsum(v for v in self._values if v == v)
+        return value
+
+    def load(self, values):
+        """Estado tras recorrer `values` (sólo importa la última ventana)"""
+        self.reset()
+        tail = _array(values)[-self.period:]
+        self._values.extend(tail.tolist())
+        valid = tail[~np.isnan(tail)]
+        self._sum = math.fsum(valid.tolist())
+        self._nans = len(tail) - len(valid)
+
+
+class RollingExtreme:
+    """Mínimo o máximo móvil con deque monótona: O(1) amortizado por vela"""
+
+    def __init__(self, period: int, mode: str = 'min'):
+        self.period = period
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        # (índice, valor) con valores estrictamente crecientes (min) o decrecientes (max)
+        self._deque: Deque[Tuple[int, float]] = deque()
+        self._index = -1
+        self._last_nan = -math.inf
+
+    def _better(self, a: float, b: float) -> bool:
+        return a < b if self.mode == 'min' else a > b
+
+    def value_with(self, x: float) -> float:
+        index = self._index + 1
+        start = index - self.period + 1
+        if start < 0 or x != x or self._last_nan >= start:
+            return NAN
+        best = x
+        for i, value in self._deque:
+            # Como mucho el primer elemento queda fuera de la ventana
+            if i >= start:
+                if self._better(value, best):
+                    best = value
+                break
+        return best
+
+    def push(self, x: float) -> float:
+        value = self.value_with(x)
+        self._index += 1
+        if x != x:
+            self._last_nan = self._index
+        else:
+            while self._deque and not self._better(self._deque[-1][1], x):
+                self._deque.pop()
+            self._deque.append((self._index, x))
+        while self._deque and self._deque[0][0] <= self._index - self.period:
+            self._deque.popleft()
+        return value
+
+    def load(self, values):
+        self.reset()
+        values = _array(values)
+        tail = values[-self.period:]
+        self._index = len(values) - len(tail) - 1
+        for x in tail.tolist():
+            self.push(x)
+
+
+class EWMean:
+    """Media exponencial con adjust=True (equivale a ewm(span=span).mean())"""
+
+    def __init__(self, span: float):
+        self.span = span
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        self.reset()
+
+    def reset(self):
+        self._num = 0.0
+        self._den = 0.0
+
+    def value_with(self, x: float) -> float:
+        if x != x:
+            return self._num / self._den if self._den else NAN
+        return (x + self.decay * self._num) / (1.0 + self.decay * self._den)
+
+    def push(self, x: float) -> float:
+        if x != x:
+            # Las posiciones sin dato también descuentan el peso (ignore_na=False)
+            self._num *= self.decay
+            self._den *= self.decay
+        else:
+            self._num = x + self.decay * self._num
+            self._den = 1.0 + self.decay * self._den
+        return self._num / self._den if self._den else NAN
+
+    def load(self, values):
+        values = _array(values)
+        weights = self.decay ** np.arange(len(values) - 1, -1, -1, dtype=float)
+        valid = ~np.isnan(values)
+        self._num = float(np.dot(values[valid], weights[valid]))
+        self._den = float(weights[valid].sum())
+
+
+# ========== INDICADORES ==========
+
+class Indicator:
+    """
+    Indicador incremental.
+
+    `update` confirma una vela y avanza el estado en O(1); `peek` evalúa una vela
+    en formación sin modificar el estado; `batch` calcula la serie completa de
+    forma vectorizada (calentamiento) y deja el estado listo para seguir con `update`.
+    """
+
+    outputs: Tuple[str, ...] = ('value',)
+
+    # Clase y parámetros: identifica la serie calculada (memoización en FeatureStore)
+    spec: Tuple = ()
+
+    def update(self, close: float, high: float = NAN, low: float = NAN):
+        return self._step(float(close), float(high), float(low), commit=True)
+
+    def peek(self, close: float, high: float = NAN, low: float = NAN):
+        return self._step(float(close), float(high), float(low), commit=False)
+
+    def batch(self, close, high=None, low=None):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def _step(self, close: float, high: float, low: float, commit: bool):
+        raise NotImplementedError
+
+    @staticmethod
+    def _push(window, x: float, commit: bool) -> float:
+        return window.push(x) if commit else window.value_with(x)
+
+
+class SMA(Indicator):
+    """Media móvil simple del cierre"""
+
+    def __init__(self, period: int):
+        self.spec = ('SMA', period)
+        self.period = period
+        self._mean = RollingMean(period)
+
+    def reset(self):
+        self._mean.reset()
+
+    def _step(self, close, high, low, commit):
+        return self._push(self._mean, close, commit)
+
+    def batch(self, close, high=None, low=None) -> np.ndarray:
+        close = pd.Series(_array(close))
+        self._mean.load(close)
+        return close.rolling(window=self.period).mean().to_numpy()
+
+
+class EMA(Indicator):
+    """Media móvil exponencial del cierre (adjust=True, como pandas)"""
+
+    def __init__(self, span: int):
+        self.spec = ('EMA', span)
+        self.span = span
+        self._mean = EWMean(span)
+
+    def reset(self):
+        self._mean.reset()
+
+    def _step(self, close, high, low, commit):
+        return self._push(self._mean, close, commit)
+
+    def batch(self, close, high=None, low=None) -> np.ndarray:
+        close = _array(close)
+        self._mean.load(close)
+        return pd.Series(close).ewm(span=self.span).mean().to_numpy()
+
+
+class RSI(Indicator):
+    """
+    RSI con medias simples de ganancias y pérdidas.
+
+    `zero_first_delta=True` trata la primera variación (sin cierre previo) como 0
+    en lugar de NaN, por lo que el primer valor aparece una vela antes.
+    """
+
+    def __init__(self, period: int = 14, zero_first_delta: bool = False):
+        self.spec = ('RSI', period, zero_first_delta)
+        self.period = period
+        self.zero_first_delta = zero_first_delta
+        self._gain = RollingMean(period)
+        self._loss = RollingMean(period)
+        self._prev_close = NAN
+
+    def reset(self):
+        self._gain.reset()
+        self._loss.reset()
+        self._prev_close = NAN
+
+    def _step(self, close, high, low, commit):
+        delta = close - self._prev_close
+        if delta != delta:
+            gain = loss = 0.0 if self.zero_first_delta else NAN
+        else:
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+
+        avg_gain = self._push(self._gain, gain, commit)
+        avg_loss = self._push(self._loss, loss, commit)
+        if commit:
+            self._prev_close = close
+        return 100 - _div(100, 1 + _div(avg_gain, avg_loss))
+
+    def batch(self, close, high=None, low=None) -> np.ndarray:
+        close = pd.Series(_array(close))
+        delta = close.diff()
+        if self.zero_first_delta:
+            gain = delta.where(delta > 0, 0)
+            loss = -delta.where(delta < 0, 0)
+        else:
+            gain = delta.clip(lower=0)
+            loss = -delta.clip(upper=0)
+
+        self._gain.load(gain)
+        self._loss.load(loss)
+        self._prev_close = float(close.iloc[-1]) if len(close) else NAN
+
+        rs = gain.rolling(window=self.period).mean() / loss.rolling(window=self.period).mean()
+        return (100 - (100 / (1 + rs))).to_numpy()
+
+
+class MACD(Indicator):
+    """MACD: línea (EMA rápida - lenta), señal (EMA de la línea) e histograma"""
+
+    outputs = ('macd', 'signal', 'histogram')
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.spec = ('MACD', fast, slow, signal)
+        self._fast = EWMean(fast)
+        self._slow = EWMean(slow)
+        self._signal = EWMean(signal)
+
+    def reset(self):
+        self._fast.reset()
+        self._slow.reset()
+        self._signal.reset()
+
+    def _step(self, close, high, low, commit):
+        line = self._push(self._fast, close, commit) - self._push(self._slow, close, commit)
+        signal = self._push(self._signal, line, commit)
+        return line, signal, line - signal
+
+    def batch(self, close, high=None, low=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        close = pd.Series(_array(close))
+        line = close.ewm(span=self._fast.span).mean() - close.ewm(span=self._slow.span).mean()
+        signal = line.ewm(span=self._signal.span).mean()
+
+        self._fast.load(close)
+        self._slow.load(close)
+        self._signal.load(line)
+        return line.to_numpy(), signal.to_numpy(), (line - signal).to_numpy()
+
+
+class Stochastic(Indicator):
+    """Stochastic %K (rango de `k_period` velas) y %D (media simple de %K)"""
+
+    outputs = ('k', 'd')
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        self.spec = ('Stochastic', k_period, d_period)
+        self._lowest = RollingExtreme(k_period, 'min')
+        self._highest = RollingExtreme(k_period, 'max')
+        self._d = RollingMean(d_period)
+
+    def reset(self):
+        self._lowest.reset()
+        self._highest.reset()
+        self._d.reset()
+
+    def _step(self, close, high, low, commit):
+        lowest = self._push(self._lowest, low, commit)
+        highest = self._push(self._highest, high, commit)
+        k = 100 * _div(close - lowest, highest - lowest)
+        return k, self._push(self._d, k, commit)
+
+    def batch(self, close, high=None, low=None) -> Tuple[np.ndarray, np.ndarray]:
+        close = pd.Series(_array(close))
+        high = pd.Series(_array(high))
+        low = pd.Series(_array(low))
+        lowest = low.rolling(window=self._lowest.period).min()
+        highest = high.rolling(window=self._highest.period).max()
+        k = 100 * ((close - lowest) / (highest - lowest))
+
+        self._lowest.load(low)
+        self._highest.load(high)
+        self._d.load(k)
+        return k.to_numpy(), k.rolling(window=self._d.period).mean().to_numpy()
+
+
+def _true_range(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
+    previous = close.shift(1)
+    return pd.concat([high - low, (high - previous).abs(), (low - previous).abs()], axis=1).max(axis=1)
+
+
+def _true_range_step(high: float, low: float, previous: float) -> float:
+    values = [v for v in (high - low, abs(high - previous), abs(low - previous)) if v == v]
+    return max(values) if values else NAN
+
+
+class ATR(Indicator):
+    """Average True Range con media simple"""
+
+    def __init__(self, period: int = 14):
+        self.spec = ('ATR', period)
+        self._mean = RollingMean(period)
+        self._prev_close = NAN
+
+    def reset(self):
+        self._mean.reset()
+        self._prev_close = NAN
+
+    def _step(self, close, high, low, commit):
+        value = self._push(self._mean, _true_range_step(high, low, self._prev_close), commit)
+        if commit:
+            self._prev_close = close
+        return value
+
+    def batch(self, close, high=None, low=None) -> np.ndarray:
+        close = pd.Series(_array(close))
+        true_range = _true_range(pd.Series(_array(high)), pd.Series(_array(low)), close)
+
+        self._mean.load(true_range)
+        self._prev_close = float(close.iloc[-1]) if len(close) else NAN
+        return true_range.rolling(window=self._mean.period).mean().to_numpy()
+
+
+class ADX(Indicator):
+    """ADX con medias simples de TR y movimiento direccional (DM+ y DM- independientes)"""
+
+    def __init__(self, period: int = 14):
+        self.spec = ('ADX', period)
+        self.period = period
+        self._tr = RollingMean(period)
+        self._dm_plus = RollingMean(period)
+        self._dm_minus = RollingMean(period)
+        self._adx = RollingMean(period)
+        self._prev = (NAN, NAN, NAN)
+
+    def reset(self):
+        for window in (self._tr, self._dm_plus, self._dm_minus, self._adx):
+            window.reset()
+        self._prev = (NAN, NAN, NAN)
+
+    def _step(self, close, high, low, commit):
+        prev_high, prev_low, prev_close = self._prev
+        dm_plus = high - prev_high
+        dm_minus = prev_low - low
+        if dm_plus < 0:
+            dm_plus = 0.0
+        if dm_minus < 0:
+            dm_minus = 0.0
+
+        tr = self._push(self._tr, _true_range_step(high, low, prev_close), commit)
+        di_plus = 100 * _div(self._push(self._dm_plus, dm_plus, commit), tr)
+        di_minus = 100 * _div(self._push(self._dm_minus, dm_minus, commit), tr)
+        dx = 100 * _div(abs(di_plus - di_minus), di_plus + di_minus)
+        if commit:
+            self._prev = (high, low, close)
+        return self._push(self._adx, dx, commit)
+
+    def batch(self, close, high=None, low=None) -> np.ndarray:
+        close = pd.Series(_array(close))
+        high = pd.Series(_array(high))
+        low = pd.Series(_array(low))
+
+        true_range = _true_range(high, low, close)
+        dm_plus = high.diff()
+        dm_minus = low.diff() * -1
+        dm_plus[dm_plus < 0] = 0
+        dm_minus[dm_minus < 0] = 0
+
+        tr_smooth = true_range.rolling(window=self.period).mean()
+        di_plus = 100 * (dm_plus.rolling(window=self.period).mean() / tr_smooth)
+        di_minus = 100 * (dm_minus.rolling(window=self.period).mean() / tr_smooth)
+        dx = 100 * (di_plus - di_minus).abs() / (di_plus + di_minus)
+
+        self._tr.load(true_range)
+        self._dm_plus.load(dm_plus)
+        self._dm_minus.load(dm_minus)
+        self._adx.load(dx)
+        if len(close):
+            self._prev = (float(high.iloc[-1]), float(low.iloc[-1]), float(close.iloc[-1]))
+        return dx.rolling(window=self.period).mean().to_numpy()
+
+
+# ========== SERIES ==========
+
+IndicatorValue = Union[float, Tuple[float, ...]]
+
+
+def _recent(series, count: int) -> List[IndicatorValue]:
+    """Últimos `count` valores de la salida de `batch` (tuplas si hay varias salidas)"""
+    if isinstance(series, tuple):
+        return list(zip(*(s[-count:].tolist() for s in series)))
+    return series[-count:].tolist()
+
+
+class IndicatorStream:
+    """
+    Conjunto de indicadores de una serie (símbolo, temporalidad) que avanza vela a vela.
+
+    `sync(df)` confirma sólo las velas cerradas nuevas desde la llamada anterior
+    (normalmente una) y evalúa la última vela como vela en formación con `peek`.
+    Si el DataFrame no continúa el anterior (otro rango, velas corregidas) se
+    recalienta con `batch`. `compute(df)` calcula sin estado.
+
+    Ambos devuelven {nombre: últimos `history` valores}, donde [-1] es la última
+    vela del DataFrame. Las medias exponenciales arrastran toda la historia
+    recorrida, así que pueden diferir en ~1e-7 de recalcular sobre la ventana.
+    """
+
+    def __init__(self, indicators: Dict[str, Indicator], history: int = 16):
+        self.indicators = indicators
+        self.history = history
+        self.lock = threading.Lock()
+        self._values: Dict[str, Deque[IndicatorValue]] = {}
+        self._last_time = None
+        self._last_close = NAN
+        self.stats = {'warmups': 0, 'updates': 0, 'peeks': 0}
+
+    @staticmethod
+    def _columns(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (df['Close'].to_numpy(dtype=float),
+                df['High'].to_numpy(dtype=float),
+                df['Low'].to_numpy(dtype=float))
+
+    def compute(self, df: pd.DataFrame, features=None) -> Dict[str, List[IndicatorValue]]:
+        """Sin estado; con `features` (FeatureStore de `df`) reutiliza las series ya calculadas"""
+        if features is not None:
+            return {
+                name: _recent(features.indicator(indicator), self.history)
+                for name, indicator in self.indicators.items()
+            }
+        close, high, low = self._columns(df)
+        return {
+            name: _recent(indicator.batch(close, high, low), self.history)
+            for name, indicator in self.indicators.items()
+        }
+
+    def sync(self, df: pd.DataFrame) -> Dict[str, List[IndicatorValue]]:
+        close, high, low = self._columns(df)
+        if not len(close):
+            return {name: [] for name in self.indicators}
+
+        position = self._continuation(df, close)
+        if position is None:
+            self._warm_up(df, close, high, low)
+        else:
+            # Velas cerradas nuevas: todas menos la última
+            for i in range(position + 1, len(close) - 1):
+                for name, indicator in self.indicators.items():
+                    self._values[name].append(indicator.update(close[i], high[i], low[i]))
+                self.stats['updates'] += 1
+            if len(close) > 1:
+                self._last_time = df.index[-2]
+                self._last_close = close[-2]
+
+        self.stats['peeks'] += 1
+        return {
+            name: list(self._values[name]) + [indicator.peek(close[-1], high[-1], low[-1])]
+            for name, indicator in self.indicators.items()
+        }
+
+    def _continuation(self, df: pd.DataFrame, close: np.ndarray) -> Optional[int]:
+        """Posición de la última vela confirmada si `df` continúa la serie; None si no"""
+        if self._last_time is None:
+            return None
+        try:
+            position = df.index.get_loc(self._last_time)
+        except KeyError:
+            return None
+        if not isinstance(position, (int, np.integer)) or position >= len(close) - 1:
+            return None
+        if close[position] != self._last_close:
+            return None
+        return int(position)
+
+    def _warm_up(self, df: pd.DataFrame, close: np.ndarray, high: np.ndarray, low: np.ndarray):
+        closed = slice(0, len(close) - 1)
+        for name, indicator in self.indicators.items():
+            indicator.reset()
+            series = indicator.batch(close[closed], high[closed], low[closed])
+            self._values[name] = deque(_recent(series, self.history - 1) if self.history > 1 else [],
+                                       maxlen=max(self.history - 1, 0))
+        self._last_time = df.index[-2] if len(close) > 1 else None
+        self._last_close = close[-2] if len(close) > 1 else NAN
+        self.stats['warmups'] += 1
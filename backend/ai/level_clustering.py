@@ -0,0 +1,127 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Modelos de tolerancia para agrupar niveles de precio
+#   percent: niveles encadenados a menos de un % fijo del precio actual
+#   atr:     igual, con la tolerancia escalada por el ATR
+#   density: cortes en los valles de la densidad (kernel gaussiano) de los niveles
+TOLERANCE_MODELS = ('percent', 'atr', 'density')
+
+DEFAULT_TOLERANCE_PERCENT = 0.1
+DEFAULT_TOLERANCE_ATR = 0.25
+
+
+@dataclass
+class LevelClusters:
+    """Grupos de niveles de precio; los niveles del grupo i son order[starts[i]:ends[i]]"""
+    order: np.ndarray       # Índices de los niveles ordenados por precio
+    starts: np.ndarray
+    ends: np.ndarray
+    count: np.ndarray
+    centroid: np.ndarray    # Precio medio del grupo
+    confidence: np.ndarray  # Suma de los pesos (confianza) de sus niveles
+    diversity: np.ndarray   # Análisis distintos en el grupo
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def members(self, cluster: int) -> np.ndarray:
+        return self.order[self.starts[cluster]:self.ends[cluster]]
+
+    @property
+    def mean_confidence(self) -> np.ndarray:
+        return self.confidence / self.count
+
+
+def level_tolerance(current_price: float, config=None, atr: Optional[float] = None) -> Tuple[float, str]:
+    """(tolerancia absoluta, modelo) según la configuración; sin ATR válido se usa el porcentaje"""
+    model = getattr(config, 'level_tolerance_model', None) or 'percent'
+    if model not in TOLERANCE_MODELS:
+        raise ValueError(f"Modelo de tolerancia no soportado: {model}")
+
+    percent = getattr(config, 'level_tolerance_percent', DEFAULT_TOLERANCE_PERCENT)
+    tolerance = current_price * percent / 100.0
+    if model == 'atr':
+        multiplier = getattr(config, 'level_tolerance_atr', DEFAULT_TOLERANCE_ATR)
+        if atr and atr > 0:
+            tolerance = atr * multiplier
+    return tolerance, model
+
+
+def cluster_levels(prices: np.ndarray,
+                   weights: np.ndarray,
+                   analysis_ids: np.ndarray,
+                   tolerance: float,
+                   model: str = 'percent') -> LevelClusters:
+    """
+    Agrupar niveles (precio, peso, id de análisis) en una sola pasada vectorizada.
+
+    Con 'percent' y 'atr' un nivel se une al grupo si está a `tolerance` o menos
+    del anterior (igual que el agrupamiento original); con 'density' los grupos se
+    separan en los valles de la densidad de niveles con ancho de banda `tolerance`,
+    así que no se estiran indefinidamente aunque los niveles estén encadenados.
+    """
+    prices = np.asarray(prices, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    analysis_ids = np.asarray(analysis_ids, dtype=np.int64)
+    count = len(prices)
+    if not count:
+        empty = np.empty(0, dtype=np.int64)
+        return LevelClusters(empty, empty, empty, empty, np.empty(0), np.empty(0), empty)
+
+    order = np.argsort(prices, kind='stable')
+    sorted_prices = prices[order]
+
+    if model == 'density':
+        breaks = _density_breaks(sorted_prices, tolerance)
+    else:
+        breaks = np.flatnonzero(np.diff(sorted_prices) > tolerance) + 1
+
+    starts = np.concatenate(([0], breaks)).astype(np.int64)
+    ends = np.concatenate((breaks, [count])).astype(np.int64)
+    sizes = ends - starts
+    labels = np.repeat(np.arange(len(starts)), sizes)
+
+    # Análisis distintos por grupo: pares (grupo, análisis) únicos
+    ids = analysis_ids[order]
+    span = int(ids.max()) + 1
+    pairs = np.unique(labels * span + ids)
+    diversity = np.bincount(pairs // span, minlength=len(starts))
+
+    return LevelClusters(
+        order=order,
+        starts=starts,
+        ends=ends,
+        count=sizes,
+        centroid=np.add.reduceat(sorted_prices, starts) / sizes,
+        confidence=np.add.reduceat(weights[order], starts),
+        diversity=diversity,
+    )
+
+
+def _density_breaks(sorted_prices: np.ndarray, bandwidth: float, max_points: int = 4096) -> np.ndarray:
+    """
+    Posiciones (en los precios ordenados) donde empieza cada grupo según los valles
+    de densidad. La densidad cuenta niveles, no su confianza: los grupos no dependen
+    de los pesos por tipo de análisis.
+    """
+    low, high = sorted_prices[0], sorted_prices[-1]
+    if bandwidth <= 0 or high - low <= bandwidth:
+        return np.empty(0, dtype=np.int64)
+
+    # Histograma en una rejilla de bandwidth/4, suavizado con un kernel gaussiano
+    step = max(bandwidth / 4.0, (high - low) / (max_points - 1))
+    points = int(np.ceil((high - low) / step)) + 1
+    bins = np.rint((sorted_prices - low) / step).astype(np.int64)
+    histogram = np.bincount(bins, minlength=points).astype(float)
+
+    sigma = bandwidth / step
+    radius = int(np.ceil(3 * sigma))
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    density = np.convolve(histogram, kernel)[radius:radius + points]
+
+    # Valles: baja respecto al punto anterior y no sube hacia el siguiente
+    valleys = np.flatnonzero((density[1:-1] < density[:-2]) & (density[1:-1] <= density[2:])) + 1
+    breaks = np.unique(np.searchsorted(bins, valleys, side='left'))
+    return breaks[(breaks > 0) & (breaks < len(sorted_prices))]
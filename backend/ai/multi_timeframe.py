@@ -0,0 +1,229 @@
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from .analysis_cache import config_fingerprint, data_fingerprint
+
+# Temporalidades de MT5 -> regla de pandas (velas etiquetadas por su apertura)
+TIMEFRAME_RULES = {
+    'M1': '1min',
+    'M5': '5min',
+    'M15': '15min',
+    'M30': '30min',
+    'H1': '1h',
+    'H4': '4h',
+    'D1': '1D',
+    'W1': 'W-SUN',  # Semanas de MT5: domingo 00:00
+    'MN1': 'MS',
+}
+
+# Duración aproximada en minutos (para ordenar y dimensionar la descarga)
+TIMEFRAME_MINUTES = {
+    'M1': 1,
+    'M5': 5,
+    'M15': 15,
+    'M30': 30,
+    'H1': 60,
+    'H4': 240,
+    'D1': 1440,
+    'W1': 10080,
+    'MN1': 43200,
+}
+
+_AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+
+def resample_bars(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """Agregar velas OHLCV a una temporalidad mayor (la última vela puede estar en formación)"""
+    aggregation = {column: how for column, how in _AGGREGATION.items() if column in df.columns}
+    resampled = df.resample(TIMEFRAME_RULES[timeframe], label='left', closed='left').agg(aggregation)
+    # Sin velas en el período (fines de semana, feriados)
+    return resampled.dropna(subset=['Close'])
+
+
+def _divides(source: str, target: str) -> bool:
+    """Si las velas de `target` se componen de velas completas de `source`"""
+    if target in ('W1', 'MN1'):
+        return TIMEFRAME_MINUTES[source] <= TIMEFRAME_MINUTES['D1']
+    return TIMEFRAME_MINUTES[target] % TIMEFRAME_MINUTES[source] == 0
+
+
+def base_timeframe_for(timeframes: List[str]) -> str:
+    """Mayor temporalidad que compone todas las pedidas (W1 + MN1 -> D1)"""
+    lowest = min(timeframes, key=TIMEFRAME_MINUTES.get)
+    return max(
+        (tf for tf in TIMEFRAME_MINUTES
+         if TIMEFRAME_MINUTES[tf] <= TIMEFRAME_MINUTES[lowest] and all(_divides(tf, t) for t in timeframes)),
+        key=TIMEFRAME_MINUTES.get
+    )
+
+
+def resample_ladder(df: pd.DataFrame, base_timeframe: str, timeframes: List[str],
+                    native: Optional[Dict[str, pd.DataFrame]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Velas de cada temporalidad a partir de la más baja. Cada una se agrega desde la
+    mayor ya calculada que la compone (M15 -> H1 -> H4 -> D1), no desde la base.
+    `native` son temporalidades ya descargadas, que se usan tal cual.
+    """
+    frames = {base_timeframe: df, **(native or {})}
+    for timeframe in sorted(set(timeframes), key=TIMEFRAME_MINUTES.get):
+        if timeframe in frames:
+            continue
+        # Sin ninguna que la componga (base_timeframe_for lo evita) se agrega desde la base
+        source = max(
+            (tf for tf in frames if _divides(tf, timeframe)),
+            key=TIMEFRAME_MINUTES.get,
+            default=base_timeframe
+        )
+        frames[timeframe] = resample_bars(frames[source], timeframe)
+    return frames
+
+
+class MultiTimeframeAnalyzer:
+    """
+    Confluencias entre temporalidades: se descarga sólo la temporalidad más baja,
+    las demás se agregan en memoria y los analizadores de todas corren en paralelo.
+    Los niveles de precio se agrupan entre temporalidades; la confianza de cada
+    análisis ya viene ponderada por `_get_trader_type_multiplier` de su temporalidad.
+    """
+
+    def __init__(self, detector, max_base_bars: int = 20000):
+        self.detector = detector
+        self.max_base_bars = max_base_bars
+        self.logger = logging.getLogger(__name__)
+
+    def timeframes_for(self, timeframe: str, config=None) -> List[str]:
+        """Temporalidad de la señal más `config.combined_timeframes`, de menor a mayor"""
+        requested = [timeframe] + list(getattr(config, 'combined_timeframes', None) or [])
+        timeframes = []
+        for tf in requested:
+            tf = str(tf).upper()
+            if tf not in TIMEFRAME_RULES:
+                self.logger.warning(f"Temporalidad no soportada en multi-timeframe: {tf}")
+                continue
+            if tf not in timeframes:
+                timeframes.append(tf)
+        return sorted(timeframes, key=TIMEFRAME_MINUTES.get)
+
+    def plan(self, timeframe: str, config=None, bars: int = 500) -> Tuple[str, List[str], int]:
+        """(temporalidad base a descargar, temporalidades a analizar, velas base necesarias)"""
+        timeframes = self.timeframes_for(timeframe, config)
+        base = base_timeframe_for(timeframes)
+        ratio = TIMEFRAME_MINUTES[timeframes[-1]] // TIMEFRAME_MINUTES[base]
+        if bars * ratio > self.max_base_bars:
+            self.logger.info(
+                f"Velas {base} limitadas a {self.max_base_bars}: "
+                f"{', '.join(self.native_timeframes(base, timeframes, bars))} se descargan aparte"
+            )
+        return base, timeframes, max(bars, min(bars * ratio, self.max_base_bars))
+
+    def native_timeframes(self, base: str, timeframes: List[str], bars: int = 500) -> List[str]:
+        """Temporalidades que con el límite de velas base tendrían menos de `bars` velas"""
+        base_bars = max(bars, self.max_base_bars)
+        return [
+            tf for tf in timeframes
+            if tf != base and base_bars * TIMEFRAME_MINUTES[base] // TIMEFRAME_MINUTES[tf] < bars
+        ]
+
+    async def analyze(self,
+                      symbol: str,
+                      base_df: pd.DataFrame,
+                      base_timeframe: str,
+                      timeframes: List[str],
+                      config=None,
+                      signal_timeframe: Optional[str] = None,
+                      native: Optional[Dict[str, pd.DataFrame]] = None):
+        """
+        Señal de confluencia entre temporalidades (None si no hay confluencia suficiente).
+        `native` son velas descargadas aparte (ver native_timeframes), en vez de agregadas.
+        """
+        signal_timeframe = signal_timeframe or base_timeframe
+        native = {tf: df for tf, df in (native or {}).items() if df is not None and not df.empty}
+        detector = self.detector
+
+        cache_key = None
+        if detector.cache is not None and base_df is not None and not base_df.empty:
+            cache_key = ('signal-mtf', symbol, signal_timeframe, tuple(timeframes),
+                         data_fingerprint(base_df), config_fingerprint(config),
+                         tuple((tf, data_fingerprint(df)) for tf, df in sorted(native.items())))
+            found, signal = detector.cache.lookup(cache_key)
+            if found:
+                return signal
+
+        dropped = []
+        try:
+            signal = await self._analyze(symbol, base_df, base_timeframe, timeframes, config,
+                                         signal_timeframe, native, dropped)
+        except Exception as e:
+            self.logger.error(f"Error en análisis multi-timeframe de {symbol}: {e}")
+            return None
+
+        # Con analizadores descartados (timeout u ocupación) la señal no se cachea
+        if cache_key is not None and not dropped:
+            detector.cache.set(cache_key, signal)
+        return signal
+
+    async def _analyze(self, symbol, base_df, base_timeframe, timeframes, config, signal_timeframe, native, dropped):
+        detector = self.detector
+        min_confluence_score, analysis_weights = detector._confluence_settings(config)
+
+        # Copia propia de la base: cada temporalidad es una instantánea con su FeatureStore.
+        # Sólo se analizan las pedidas (la base puede ser menor, p. ej. D1 para W1 + MN1)
+        requested = list(dict.fromkeys(timeframes + [signal_timeframe]))
+        ladder = resample_ladder(base_df.copy(), base_timeframe, requested,
+                                 {tf: df.copy() for tf, df in native.items()})
+        frames = {tf: ladder[tf] for tf in requested}
+        self.logger.info(
+            f"Analizando {symbol} en {', '.join(frames)} (base {base_timeframe}, {len(base_df)} velas"
+            + (f"; {', '.join(native)} descargadas aparte)" if native else ")")
+        )
+
+        # Análisis de todas las temporalidades en paralelo (cada una es su propia instantánea)
+        jobs = [detector._perform_filtered_analyses(frames[tf], symbol, tf, config, dropped) for tf in frames]
+        if config and getattr(config, 'trading_strategy', None):
+            jobs.append(detector._perform_strategy_analysis(
+                frames[signal_timeframe], config.trading_strategy, signal_timeframe, config,
+                symbol=symbol, dropped=dropped
+            ))
+        results = await asyncio.gather(*jobs)
+
+        by_timeframe = dict(zip(frames, results))
+        if len(results) > len(frames) and results[-1]:
+            by_timeframe[signal_timeframe] = by_timeframe[signal_timeframe] + [results[-1]]
+
+        signal_df = frames[signal_timeframe]
+        current_price = float(signal_df['Close'].iloc[-1])
+
+        # Niveles de todas las temporalidades; cada análisis cuenta por separado en cada una
+        price_levels = []
+        analyses = []
+        for tf, tf_analyses in by_timeframe.items():
+            analyses.extend(tf_analyses)
+            for level in detector._weighted_price_levels(tf_analyses, current_price, analysis_weights):
+                level['analysis'] = f"{level['analysis']} {tf}"
+                level['timeframe'] = tf
+                price_levels.append(level)
+
+        confluences = detector._confluences_from_levels(price_levels, current_price, signal_df, config)
+        if not confluences:
+            self.logger.info(f"No se detectaron confluencias multi-timeframe para {symbol}")
+            return None
+
+        best_confluence = confluences[0]
+        if best_confluence.strength < min_confluence_score:
+            self.logger.info(
+                f"Confluencia multi-timeframe insuficiente para {symbol}: "
+                f"{best_confluence.strength:.2f} < {min_confluence_score}"
+            )
+            return None
+
+        return await detector._generate_signal_with_config(
+            symbol, signal_timeframe, signal_df, best_confluence, analyses, config
+        )
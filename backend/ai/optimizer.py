@@ -0,0 +1,419 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import itertools
+import json
+import logging
+import os
+import pickle
+import random
+import time
+
+from .backtest import BacktestReport, build_report, chunk_positions
+from .confluence_detector import ConfluenceDetector
+from .features import FeatureStore
+from .analysis_cache import config_fingerprint, data_fingerprint
+from database.models import AnalysisType
+
+# Campos de AnalysisConfig que se pueden optimizar
+SWEEP_FIELDS = (
+    'confluence_threshold',
+    'elliott_wave_weight',
+    'fibonacci_weight',
+    'chart_patterns_weight',
+    'support_resistance_weight',
+    'atr_multiplier_sl',
+    'risk_reward_ratio',
+)
+
+# Métricas de BacktestReport por las que se puede ordenar el barrido
+RANK_FIELDS = tuple(f.name for f in fields(BacktestReport) if f.name not in ('name', 'trade_list'))
+
+# Orden de las columnas de confianza por tipo de análisis y el peso que les corresponde
+_WEIGHT_FIELDS = (
+    (AnalysisType.ELLIOTT_WAVE, 'elliott_wave_weight'),
+    (AnalysisType.CHART_PATTERN, 'chart_patterns_weight'),
+    (AnalysisType.FIBONACCI, 'fibonacci_weight'),
+    (AnalysisType.SUPPORT_RESISTANCE, 'support_resistance_weight'),
+)
+_TYPE_COLUMN = {analysis_type: i for i, (analysis_type, _) in enumerate(_WEIGHT_FIELDS)}
+
+
+@dataclass
+class PrecomputedBars:
+    """
+    Salida de los analizadores en cada vela evaluada, reducida a lo que necesita
+    la confluencia: los grupos de niveles de precio no dependen de los pesos y la
+    fuerza de cada grupo es lineal en ellos, así que basta con guardar por grupo
+    la suma de confianzas de cada tipo de análisis.
+    """
+    positions: np.ndarray      # Posición de la vela evaluada en el histórico
+    current_price: np.ndarray
+    atr: np.ndarray
+    recent_low: np.ndarray     # Mínimo de las últimas 20 velas
+    recent_high: np.ndarray    # Máximo de las últimas 20 velas
+    group_bar: np.ndarray      # Fila (vela evaluada) de cada grupo, en orden de precio
+    group_price: np.ndarray
+    group_count: np.ndarray
+    group_base: np.ndarray     # Diversidad * 0.4 + bonificación por cantidad
+    group_sums: np.ndarray     # (grupos, 4) suma de confianzas por tipo de análisis
+
+
+@dataclass
+class OptimizationReport:
+    """Resultados ordenados de un barrido de parámetros"""
+    rank_by: str
+    evaluated: int
+    resumed: int
+    elapsed_seconds: float
+    precompute_seconds: float
+    results: List[Dict] = field(default_factory=list)
+
+    @property
+    def best(self) -> Optional[Dict]:
+        return self.results[0] if self.results else None
+
+    def to_dict(self, top: Optional[int] = None) -> Dict:
+        return {
+            'rank_by': self.rank_by,
+            'evaluated': self.evaluated,
+            'resumed': self.resumed,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'precompute_seconds': round(self.precompute_seconds, 3),
+            'best': self.best,
+            'results': self.results[:top] if top else self.results,
+        }
+
+
+# ========== ESPACIO DE BÚSQUEDA ==========
+
+def grid_search(space: Dict[str, Sequence[float]]) -> Iterator[Dict[str, float]]:
+    """Todas las combinaciones de los valores de cada campo"""
+    _check_fields(space)
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_search(space: Dict[str, Any], samples: int, seed: int = 0) -> Iterator[Dict[str, float]]:
+    """`samples` combinaciones al azar: (mín, máx) = uniforme, lista = uno de sus valores"""
+    _check_fields(space)
+    rng = random.Random(seed)
+    for _ in range(samples):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple) and len(values) == 2:
+                params[name] = round(rng.uniform(*values), 4)
+            else:
+                params[name] = rng.choice(list(values))
+        yield params
+
+
+def _check_fields(space: Dict):
+    unknown = set(space) - set(SWEEP_FIELDS)
+    if unknown:
+        raise ValueError(f"Campos no optimizables: {', '.join(sorted(unknown))}")
+
+
+def _params_key(params: Dict[str, float]) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+# ========== PRECÁLCULO (una vez por vela) ==========
+
+def _precompute_chunk(symbol: str, timeframe: str, frame: pd.DataFrame, offset: int,
+                      start: int, stop: int, window: int, step: int, config) -> List[Tuple]:
+    """Analizadores sobre las velas [start, stop) de un tramo (se ejecuta en un proceso del pool)"""
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="optimizer") as executor:
+        detector = ConfluenceDetector(cache=None, analysis_timeout=None, executor=executor)
+        return asyncio.run(_precompute_walk(detector, symbol, timeframe, frame, offset,
+                                            start, stop, window, step, config))
+
+
+async def _precompute_walk(detector, symbol, timeframe, frame, offset, start, stop, window, step, config):
+    rows = []
+    for position in range(start, stop, step):
+        local = position - offset
+        snapshot = frame.iloc[max(local - window + 1, 0):local + 1]
+
+        if config and getattr(config, 'trading_strategy', None):
+            analyses, strategy_analysis = await asyncio.gather(
+                detector._perform_filtered_analyses(snapshot, symbol, timeframe, config),
+                detector._perform_strategy_analysis(snapshot, config.trading_strategy, timeframe,
+                                                    config, symbol=symbol)
+            )
+            if strategy_analysis:
+                analyses.append(strategy_analysis)
+        else:
+            analyses = await detector._perform_filtered_analyses(snapshot, symbol, timeframe, config)
+
+        current_price = float(snapshot['Close'].iloc[-1])
+        levels = []
+        for analysis in analyses:
+            for level in detector._extract_price_levels(analysis, current_price):
+                level['column'] = _TYPE_COLUMN.get(analysis.type)
+                levels.append(level)
+
+        groups = []
+        tolerance, model = detector._level_tolerance(current_price, snapshot, config)
+        for group in detector._group_price_levels(levels, tolerance, model):
+            analysis_diversity = len(set(group['analyses']))
+            if analysis_diversity < 2:
+                continue
+            sums = [0.0] * len(_WEIGHT_FIELDS)
+            default = 0.0
+            for level in group['levels']:
+                if level['column'] is None:
+                    default += level['confidence']
+                else:
+                    sums[level['column']] += level['confidence']
+            # Mismo cálculo que _calculate_weighted_confluence_strength sin la parte ponderada
+            base = min(analysis_diversity / 4.0, 1.0) * 0.4 + min(group['count'] / 5.0, 0.2)
+            base += default * 0.25 * 0.6 / group['count']  # Tipos sin peso configurable
+            groups.append((group['avg_price'], group['count'], base, sums))
+
+        features = FeatureStore.of(snapshot)
+        rows.append((
+            position, current_price,
+            detector._calculate_atr(snapshot, period=14),
+            features.window_extreme('Low', 20, 'min')[0],
+            features.window_extreme('High', 20, 'max')[0],
+            groups,
+        ))
+    return rows
+
+
+def _assemble(rows: List[Tuple]) -> PrecomputedBars:
+    rows = sorted(rows, key=lambda row: row[0])
+    group_bar, group_price, group_count, group_base, group_sums = [], [], [], [], []
+    for bar, row in enumerate(rows):
+        for price, count, base, sums in row[5]:
+            group_bar.append(bar)
+            group_price.append(price)
+            group_count.append(count)
+            group_base.append(base)
+            group_sums.append(sums)
+    return PrecomputedBars(
+        positions=np.array([row[0] for row in rows], dtype=np.int64),
+        current_price=np.array([row[1] for row in rows], dtype=float),
+        atr=np.array([row[2] for row in rows], dtype=float),
+        recent_low=np.array([row[3] for row in rows], dtype=float),
+        recent_high=np.array([row[4] for row in rows], dtype=float),
+        group_bar=np.array(group_bar, dtype=np.int64),
+        group_price=np.array(group_price, dtype=float),
+        group_count=np.array(group_count, dtype=float),
+        group_base=np.array(group_base, dtype=float),
+        group_sums=np.array(group_sums, dtype=float).reshape(-1, len(_WEIGHT_FIELDS)),
+    )
+
+
+# ========== EVALUACIÓN (por combinación de parámetros) ==========
+
+def score_signals(bars: PrecomputedBars, config) -> List[Tuple[int, int, float, float, float]]:
+    """
+    Señales de una configuración a partir del precálculo: mismas reglas que
+    _detect_confluence_signals_with_weights, _generate_signal_with_config y
+    _calculate_stop_loss_with_config, vectorizadas sobre todas las velas.
+    """
+    if not len(bars.group_bar):
+        return []
+
+    weights = np.array([getattr(config, name) for _, name in _WEIGHT_FIELDS], dtype=float)
+    strength = np.minimum(bars.group_base + 0.6 * (bars.group_sums @ weights) / bars.group_count, 1.0)
+
+    # Mejor grupo de cada vela (el primero en orden de precio si hay empate, como max())
+    order = np.lexsort((np.arange(len(strength)), -strength, bars.group_bar))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = bars.group_bar[order][1:] != bars.group_bar[order][:-1]
+    best = order[first]
+    best = best[strength[best] >= config.confluence_threshold]
+
+    rows = bars.group_bar[best]
+    level = bars.group_price[best]
+    entry = bars.current_price[rows]
+    direction = np.where(level > entry * 1.001, 1, np.where(level < entry * 0.999, -1, 0))
+    keep = direction != 0
+    rows, entry, direction = rows[keep], entry[keep], direction[keep]
+
+    atr_stop = entry - direction * bars.atr[rows] * config.atr_multiplier_sl
+    stop = np.where(direction > 0,
+                    np.maximum(atr_stop, bars.recent_low[rows] * 0.999),
+                    np.minimum(atr_stop, bars.recent_high[rows] * 1.001))
+    target = entry + direction * np.abs(entry - stop) * config.risk_reward_ratio
+
+    valid = stop != entry
+    return list(zip(bars.positions[rows][valid].tolist(), direction[valid].tolist(),
+                    entry[valid].tolist(), stop[valid].tolist(), target[valid].tolist()))
+
+
+# Estado de cada proceso del pool de evaluación (se envía una sola vez)
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(bars: PrecomputedBars, df: pd.DataFrame, base_config, max_holding: int):
+    _worker_state.update(bars=bars, df=df, base_config=base_config, max_holding=max_holding)
+
+
+def _evaluate(params: Dict[str, float]) -> Dict:
+    state = _worker_state
+    config = state['base_config'].model_copy(update=params)
+    signals = score_signals(state['bars'], config)
+    report = build_report('sweep', signals, state['df'], state['max_holding'], config.risk_per_trade)
+    metrics = report.to_dict()
+    metrics.pop('name', None)
+    return {'params': params, **metrics}
+
+
+class ParameterOptimizer:
+    """
+    Barrido de parámetros de AnalysisConfig (grid o aleatorio) sobre un histórico.
+
+    Los analizadores corren una sola vez por vela (en paralelo por tramos); cada
+    combinación sólo recalcula la fuerza de las confluencias, las señales y la
+    simulación de salidas. El avance se guarda en un checkpoint JSON para
+    reanudar un barrido interrumpido (y el precálculo junto a él).
+    """
+
+    def __init__(self, window: int = 300, step: int = 1, max_holding: int = 500,
+                 workers: Optional[int] = None, checkpoint_path: Optional[str] = None,
+                 checkpoint_every: int = 50, rank_by: str = 'total_r', min_trades: int = 10):
+        if rank_by not in RANK_FIELDS:
+            raise ValueError(f"rank_by inválido: {rank_by}. Usar: {', '.join(RANK_FIELDS)}")
+        self.window = window
+        self.step = step
+        self.max_holding = max_holding
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.rank_by = rank_by
+        self.min_trades = min_trades
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, df: pd.DataFrame, symbol: str, timeframe: str, base_config,
+            candidates) -> OptimizationReport:
+        """Evaluar cada combinación de `candidates` (grid_search / random_search) sobre `df`"""
+        started = time.perf_counter()
+        fingerprint = self._fingerprint(df, symbol, timeframe, base_config)
+        completed = self._load_checkpoint(fingerprint)
+        resumed = len(completed)
+
+        bars = self._load_precomputed(fingerprint)
+        precompute_seconds = 0.0
+        if bars is None:
+            precompute_started = time.perf_counter()
+            bars = self.precompute(df, symbol, timeframe, base_config)
+            precompute_seconds = time.perf_counter() - precompute_started
+            self._save_precomputed(fingerprint, bars)
+
+        pending = []
+        seen = set(completed)
+        for params in candidates:
+            key = _params_key(params)
+            if key not in seen:
+                seen.add(key)
+                pending.append(params)
+        self.logger.info(f"Barrido {symbol} {timeframe}: {len(pending)} combinaciones ({resumed} del checkpoint)")
+
+        if pending:
+            if self.workers > 1 and len(pending) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(bars, df, base_config, self.max_holding)) as pool:
+                    self._collect(pool.map(_evaluate, pending, chunksize=8), completed, fingerprint)
+            else:
+                _init_worker(bars, df, base_config, self.max_holding)
+                self._collect(map(_evaluate, pending), completed, fingerprint)
+            self._save_checkpoint(fingerprint, completed)
+
+        return OptimizationReport(
+            rank_by=self.rank_by,
+            evaluated=len(completed),
+            resumed=resumed,
+            elapsed_seconds=time.perf_counter() - started,
+            precompute_seconds=precompute_seconds,
+            results=self._rank(completed.values()),
+        )
+
+    def precompute(self, df: pd.DataFrame, symbol: str, timeframe: str, config) -> PrecomputedBars:
+        """Salida de los analizadores en cada vela evaluada (no depende de los campos del barrido)"""
+        positions = range(self.window - 1, len(df), self.step)
+        jobs = []
+        for start, stop in chunk_positions(positions, self.workers * 4):
+            offset = max(start - self.window + 1, 0)
+            jobs.append((symbol, timeframe, df.iloc[offset:stop], offset, start, stop,
+                         self.window, self.step, config))
+
+        if self.workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                chunks = list(pool.map(_precompute_chunk, *zip(*jobs)))
+        else:
+            chunks = [_precompute_chunk(*job) for job in jobs]
+        return _assemble([row for chunk in chunks for row in chunk])
+
+    def _collect(self, results, completed: Dict[str, Dict], fingerprint: str):
+        for done, result in enumerate(results, 1):
+            completed[_params_key(result['params'])] = result
+            if done % self.checkpoint_every == 0:
+                self._save_checkpoint(fingerprint, completed)
+
+    def _rank(self, results) -> List[Dict]:
+        """Ordenar por `rank_by` (mayor es mejor; max_drawdown menor es mejor); sin mínimo de operaciones al final"""
+        sign = 1 if self.rank_by == 'max_drawdown' else -1
+
+        def sort_key(result):
+            enough = result['trades'] >= self.min_trades
+            value = result.get(self.rank_by) or 0.0
+            return (not enough, sign * value)
+        return sorted(results, key=sort_key)
+
+    # ========== CHECKPOINTS ==========
+
+    def _fingerprint(self, df: pd.DataFrame, symbol: str, timeframe: str, config) -> str:
+        fields = {name: getattr(config, name) for name in SWEEP_FIELDS}
+        base = config.model_copy(update={name: 0.0 for name in fields})
+        return json.dumps([symbol, timeframe, self.window, self.step, self.max_holding,
+                           config_fingerprint(base), list(map(str, data_fingerprint(df)))])
+
+    def _load_checkpoint(self, fingerprint: str) -> Dict[str, Dict]:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Checkpoint ilegible, se ignora: {e}")
+            return {}
+        if data.get('fingerprint') != fingerprint:
+            self.logger.warning("El checkpoint corresponde a otros datos o configuración; se ignora")
+            return {}
+        return {_params_key(result['params']): result for result in data.get('results', [])}
+
+    def _save_checkpoint(self, fingerprint: str, completed: Dict[str, Dict]):
+        if not self.checkpoint_path:
+            return
+        temporary = self.checkpoint_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'results': list(completed.values())}, f, default=str)
+        os.replace(temporary, self.checkpoint_path)
+
+    def _load_precomputed(self, fingerprint: str) -> Optional[PrecomputedBars]:
+        path = self.checkpoint_path and self.checkpoint_path + '.bars'
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                stored_fingerprint, bars = pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"Precálculo ilegible, se recalcula: {e}")
+            return None
+        return bars if stored_fingerprint == fingerprint else None
+
+    def _save_precomputed(self, fingerprint: str, bars: PrecomputedBars):
+        if not self.checkpoint_path:
+            return
+        path = self.checkpoint_path + '.bars'
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump((fingerprint, bars), f)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,407 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from .features import FeatureStore
+
+# Ventana máxima (en velas) que puede abarcar cada plantilla y velas mínimas para evaluarla
+TEMPLATE_WINDOWS = {
+    'triangle': 50,
+    'head_shoulders': 60,
+    'double': 40,
+    'flag': 30,
+    'wedge': 50,
+}
+TEMPLATE_MIN_BARS = {
+    'triangle': 20,
+    'head_shoulders': 30,
+    'double': 20,
+    'flag': 15,
+    'wedge': 25,
+}
+
+
+@dataclass
+class PatternOccurrence:
+    """Un patrón chartista en el histórico (posiciones de vela dentro del DataFrame escaneado)"""
+    pattern_type: str
+    direction: str           # 'BUY' o 'SELL'
+    confidence: float
+    start: int               # Primera vela del patrón
+    end: int                 # Último pivot (o vela) del patrón
+    confirmed: int           # Vela en la que el patrón ya es visible (pivots confirmados)
+    entry_price: float
+    stop_loss: float
+    take_profit: float
+    points: List[Tuple[int, float]]
+    times: List[str] = field(default_factory=list)  # Fecha de cada punto
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': self.pattern_type,
+            'pattern_type': self.pattern_type,
+            'direction': self.direction,
+            'confidence': self.confidence,
+            'start': self.start,
+            'end': self.end,
+            'confirmed': self.confirmed,
+            'entry_price': self.entry_price,
+            'stop_loss': self.stop_loss,
+            'take_profit': self.take_profit,
+            'target': self.take_profit,
+            'points': [
+                {'index': index, 'time': time, 'price': price}
+                for (index, price), time in zip(self.points, self.times)
+            ],
+        }
+
+
+@dataclass
+class _ScanContext:
+    """Series y pivots de una instantánea, compartidos por todas las plantillas"""
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: Optional[np.ndarray]
+    high_pivots: np.ndarray
+    low_pivots: np.ndarray
+    index: pd.Index
+    latest_only: bool
+    distance: int
+
+    @property
+    def size(self) -> int:
+        return len(self.close)
+
+
+class PatternScanner:
+    """
+    Escáner de patrones chartistas sobre todo el histórico en una pasada.
+
+    Los pivots (find_peaks sobre máximos y mínimos) se calculan una sola vez por
+    instantánea en FeatureStore; cada plantilla (triángulos, H&S, dobles techos y
+    suelos, banderas, cuñas) se evalúa vectorizada con una ventana deslizante sobre
+    los arrays de pivots: en cada pivot nuevo se toman los últimos pivots de cada
+    tipo y se comprueban las reglas de la plantilla para todos a la vez.
+
+    Un pivot sólo queda confirmado `distance` velas después (find_peaks compara con
+    las velas siguientes), así que cada aparición indica en `confirmed` la primera
+    vela en la que se podía ver; el backtester debe usar esa posición.
+    """
+
+    def __init__(self, pivot_distance: int = 5, windows: Optional[Dict[str, int]] = None):
+        self.pivot_distance = pivot_distance
+        self.windows = {**TEMPLATE_WINDOWS, **(windows or {})}
+        self.logger = logging.getLogger(__name__)
+
+    def scan(self, df: pd.DataFrame, latest_only: bool = False,
+             templates: Optional[Iterable[str]] = None) -> List[PatternOccurrence]:
+        """
+        Todas las apariciones de patrones en `df`, ordenadas por `confirmed`.
+        Con `latest_only` sólo se evalúan los pivots vigentes en la última vela.
+        """
+        if df is None or len(df) < min(TEMPLATE_MIN_BARS.values()):
+            return []
+
+        features = FeatureStore.of(df)
+        try:
+            volume = features.column('volume')
+        except KeyError:
+            volume = None
+        ctx = _ScanContext(
+            high=features.column('high'),
+            low=features.column('low'),
+            close=features.column('close'),
+            volume=volume,
+            high_pivots=features.peaks('high', self.pivot_distance, 'max'),
+            low_pivots=features.peaks('low', self.pivot_distance, 'min'),
+            index=df.index,
+            latest_only=latest_only,
+            distance=self.pivot_distance,
+        )
+
+        scanners = {
+            'triangle': self._scan_triangles,
+            'head_shoulders': self._scan_head_shoulders,
+            'double': self._scan_double_patterns,
+            'flag': self._scan_flags,
+            'wedge': self._scan_wedges,
+        }
+        occurrences = []
+        for name in templates or scanners:
+            occurrences.extend(scanners[name](ctx, self.windows[name]))
+
+        for occurrence in occurrences:
+            occurrence.times = [str(ctx.index[position]) for position, _ in occurrence.points]
+        return sorted(occurrences, key=lambda o: (o.confirmed, o.start, o.pattern_type))
+
+    # ========== ESTADOS (últimos pivots en cada evento) ==========
+
+    def _events(self, ctx: _ScanContext, *pivot_sets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(vela del evento, vela de evaluación): cada pivot nuevo o sólo la última vela"""
+        last = ctx.size - 1
+        if ctx.latest_only:
+            return np.array([last]), np.array([last])
+        events = np.unique(np.concatenate(pivot_sets))
+        return events, np.minimum(events + ctx.distance, last)
+
+    @staticmethod
+    def _last_index(pivots: np.ndarray, events: np.ndarray) -> np.ndarray:
+        """Índice (en `pivots`) del último pivot en o antes de cada evento (-1 si no hay)"""
+        return np.searchsorted(pivots, events, side='right') - 1
+
+    @staticmethod
+    def _slope(p0: np.ndarray, v0: np.ndarray, p1: np.ndarray, v1: np.ndarray) -> np.ndarray:
+        return (v1 - v0) / (p1 - p0)
+
+    def _pivot_pairs(self, ctx: _ScanContext, window: int, min_bars: int):
+        """Últimos dos máximos y dos mínimos en cada evento, dentro de `window` velas"""
+        events, at = self._events(ctx, ctx.high_pivots, ctx.low_pivots)
+        ih = self._last_index(ctx.high_pivots, events)
+        il = self._last_index(ctx.low_pivots, events)
+        valid = (ih >= 1) & (il >= 1) & (at >= min_bars - 1)
+        ih, il, at = ih[valid], il[valid], at[valid]
+
+        h0, h1 = ctx.high_pivots[ih - 1], ctx.high_pivots[ih]
+        l0, l1 = ctx.low_pivots[il - 1], ctx.low_pivots[il]
+        start = np.minimum(h0, l0)
+        inside = start > at - window
+        pairs = {
+            'h0': h0, 'h1': h1, 'l0': l0, 'l1': l1,
+            'hv0': ctx.high[h0], 'hv1': ctx.high[h1], 'lv0': ctx.low[l0], 'lv1': ctx.low[l1],
+            'start': start, 'end': np.maximum(h1, l1), 'at': at,
+        }
+        pairs = {key: values[inside] for key, values in pairs.items()}
+        pairs['high_slope'] = self._slope(pairs['h0'], pairs['hv0'], pairs['h1'], pairs['hv1'])
+        pairs['low_slope'] = self._slope(pairs['l0'], pairs['lv0'], pairs['l1'], pairs['lv1'])
+        return pairs
+
+    @staticmethod
+    def _pair_points(pairs: Dict, i: int) -> List[Tuple[int, float]]:
+        return [
+            (int(pairs['h0'][i]), float(pairs['hv0'][i])), (int(pairs['h1'][i]), float(pairs['hv1'][i])),
+            (int(pairs['l0'][i]), float(pairs['lv0'][i])), (int(pairs['l1'][i]), float(pairs['lv1'][i])),
+        ]
+
+    # ========== PLANTILLAS ==========
+
+    def _scan_triangles(self, ctx: _ScanContext, window: int) -> List[PatternOccurrence]:
+        """Triángulo simétrico (máximos descendentes, mínimos ascendentes) y ascendente"""
+        pairs = self._pivot_pairs(ctx, window, TEMPLATE_MIN_BARS['triangle'])
+        at = pairs['at']
+        high_slope, low_slope = pairs['high_slope'], pairs['low_slope']
+        occurrences = []
+
+        # Simétrico: líneas convergentes (no paralelas)
+        symmetric = (high_slope < 0) & (low_slope > 0) & (np.abs(high_slope - low_slope) >= 1e-6)
+        confidence = np.minimum(0.8 + 0.1 * self._volume_decreasing(ctx, at, window), 0.95)
+        momentum = ctx.close[at] - ctx.close[np.maximum(at - 5, 0)]
+        for i in np.flatnonzero(symmetric):
+            entry = float(ctx.close[at[i]])
+            buy = momentum[i] > 0
+            occurrences.append(PatternOccurrence(
+                pattern_type="SYMMETRIC_TRIANGLE",
+                direction="BUY" if buy else "SELL",
+                confidence=float(confidence[i]),
+                start=int(pairs['start'][i]), end=int(pairs['end'][i]), confirmed=int(at[i]),
+                entry_price=entry,
+                stop_loss=entry * (0.98 if buy else 1.02),
+                take_profit=entry * (1.04 if buy else 0.96),
+                points=self._pair_points(pairs, i),
+            ))
+
+        # Ascendente: resistencia horizontal y soporte ascendente, con el precio cerca de la resistencia
+        resistance = np.maximum(pairs['hv0'], pairs['hv1'])
+        ascending = (
+            (np.abs(pairs['hv1'] - pairs['hv0']) / pairs['hv0'] < 0.01) & (low_slope > 0)
+            & (ctx.close[at] >= resistance * 0.98)
+        )
+        for i in np.flatnonzero(ascending):
+            support = float(pairs['lv1'][i])
+            level = float(resistance[i])
+            occurrences.append(PatternOccurrence(
+                pattern_type="ASCENDING_TRIANGLE",
+                direction="BUY",
+                confidence=0.8,
+                start=int(pairs['start'][i]), end=int(pairs['end'][i]), confirmed=int(at[i]),
+                entry_price=level * 1.001,  # Nivel de ruptura
+                stop_loss=support,
+                take_profit=level + (level - support),
+                points=self._pair_points(pairs, i),
+            ))
+        return occurrences
+
+    def _scan_head_shoulders(self, ctx: _ScanContext, window: int) -> List[PatternOccurrence]:
+        """Cabeza y hombros: tres máximos consecutivos, cabeza más alta y hombros simétricos"""
+        pivots = ctx.high_pivots
+        if ctx.latest_only:
+            ih = np.array([len(pivots) - 1])
+            at = np.array([ctx.size - 1])
+        else:
+            ih = np.arange(2, len(pivots))
+            at = np.minimum(pivots[ih] + ctx.distance, ctx.size - 1)
+        valid = (ih >= 2) & (at >= TEMPLATE_MIN_BARS['head_shoulders'] - 1)
+        ih, at = ih[valid], at[valid]
+
+        left, head, right = ctx.high[pivots[ih - 2]], ctx.high[pivots[ih - 1]], ctx.high[pivots[ih]]
+        symmetry = np.abs(left - right) / head
+        confidence = 0.9 - symmetry * 10
+        found = (
+            (head > left) & (head > right) & (symmetry < 0.02) & (confidence > 0.75)
+            & (pivots[ih - 2] > at - window)
+        )
+
+        occurrences = []
+        for i in np.flatnonzero(found):
+            neckline = float((left[i] + right[i]) / 2)
+            positions = pivots[ih[i] - 2:ih[i] + 1]
+            occurrences.append(PatternOccurrence(
+                pattern_type="HEAD_AND_SHOULDERS",
+                direction="SELL",
+                confidence=float(confidence[i]),
+                start=int(positions[0]), end=int(positions[-1]), confirmed=int(at[i]),
+                entry_price=neckline * 0.999,  # Ruptura de la línea de cuello
+                stop_loss=float(right[i]),
+                take_profit=neckline - (float(head[i]) - neckline),
+                points=[(int(p), float(ctx.high[p])) for p in positions],
+            ))
+        return occurrences
+
+    def _scan_double_patterns(self, ctx: _ScanContext, window: int) -> List[PatternOccurrence]:
+        """Doble techo (dos máximos similares) y doble suelo (dos mínimos similares)"""
+        occurrences = []
+        for pivots, values, opposite, kind in (
+            (ctx.high_pivots, ctx.high, ctx.low, 'top'),
+            (ctx.low_pivots, ctx.low, ctx.high, 'bottom'),
+        ):
+            if len(pivots) < 2:
+                continue
+            if ctx.latest_only:
+                ih = np.array([len(pivots) - 1])
+                at = np.array([ctx.size - 1])
+            else:
+                ih = np.arange(1, len(pivots))
+                at = np.minimum(pivots[ih] + ctx.distance, ctx.size - 1)
+
+            first, second = values[pivots[ih - 1]], values[pivots[ih]]
+            average = (first + second) / 2
+            found = (
+                (np.abs(second - first) / average < 0.015)
+                & (pivots[ih - 1] > at - window) & (at >= TEMPLATE_MIN_BARS['double'] - 1)
+            )
+            # Valle (o pico) entre pivots consecutivos: [pivots[k], pivots[k + 1])
+            if kind == 'top':
+                between = np.minimum.reduceat(opposite, pivots)[ih - 1]
+            else:
+                between = np.maximum.reduceat(opposite, pivots)[ih - 1]
+
+            for i in np.flatnonzero(found):
+                level, avg = float(between[i]), float(average[i])
+                positions = pivots[ih[i] - 1:ih[i] + 1]
+                points = [(int(p), float(values[p])) for p in positions]
+                if kind == 'top':
+                    occurrence = PatternOccurrence(
+                        pattern_type="DOUBLE_TOP", direction="SELL", confidence=0.85,
+                        start=int(positions[0]), end=int(positions[-1]), confirmed=int(at[i]),
+                        entry_price=level * 0.999, stop_loss=avg,
+                        take_profit=level - (avg - level), points=points,
+                    )
+                else:
+                    occurrence = PatternOccurrence(
+                        pattern_type="DOUBLE_BOTTOM", direction="BUY", confidence=0.85,
+                        start=int(positions[0]), end=int(positions[-1]), confirmed=int(at[i]),
+                        entry_price=level * 1.001, stop_loss=avg,
+                        take_profit=level + (level - avg), points=points,
+                    )
+                occurrences.append(occurrence)
+        return occurrences
+
+    def _scan_flags(self, ctx: _ScanContext, window: int) -> List[PatternOccurrence]:
+        """Banderas: tendencia fuerte y consolidación estrecha (< 3%) en las últimas `window` velas"""
+        size = min(window, ctx.size) if ctx.latest_only else window
+        if size < TEMPLATE_MIN_BARS['flag'] or ctx.size < size:
+            return []
+        ends = np.array([ctx.size - 1]) if ctx.latest_only else np.arange(size - 1, ctx.size)
+        starts = ends - size + 1
+
+        closes = np.lib.stride_tricks.sliding_window_view(ctx.close, size)[starts]
+        resistance = np.lib.stride_tricks.sliding_window_view(ctx.high, size)[starts].max(axis=1)
+        support = np.lib.stride_tricks.sliding_window_view(ctx.low, size)[starts].min(axis=1)
+
+        # Pendiente de la regresión lineal normalizada por el precio medio
+        x = np.arange(size) - (size - 1) / 2
+        mean = closes.mean(axis=1)
+        trend = (closes @ x) / (x @ x) / mean
+        found = (np.abs(trend) > 0.6) & ((resistance - support) / mean < 0.03)
+        if not ctx.latest_only:
+            # Una aparición por racha de ventanas consecutivas
+            found &= ~np.concatenate(([False], found[:-1]))
+
+        occurrences = []
+        for i in np.flatnonzero(found):
+            bullish = trend[i] > 0
+            high, low = float(resistance[i]), float(support[i])
+            if bullish:
+                entry = high * 1.001
+                stop, target = low, entry + (entry - low)
+            else:
+                entry = low * 0.999
+                stop, target = high, entry - (high - entry)
+            occurrences.append(PatternOccurrence(
+                pattern_type="BULL_FLAG" if bullish else "BEAR_FLAG",
+                direction="BUY" if bullish else "SELL",
+                confidence=0.75,
+                start=int(starts[i]), end=int(ends[i]), confirmed=int(ends[i]),
+                entry_price=entry, stop_loss=stop, take_profit=target,
+                points=[(int(starts[i]), high), (int(ends[i]), low)],
+            ))
+        return occurrences
+
+    def _scan_wedges(self, ctx: _ScanContext, window: int) -> List[PatternOccurrence]:
+        """Cuña ascendente (bajista) y descendente (alcista): líneas en el mismo sentido y convergentes"""
+        pairs = self._pivot_pairs(ctx, window, TEMPLATE_MIN_BARS['wedge'])
+        high_slope, low_slope = pairs['high_slope'], pairs['low_slope']
+        rising = (high_slope > 0) & (low_slope > 0) & (low_slope > high_slope)
+        falling = (high_slope < 0) & (low_slope < 0) & (high_slope > low_slope)
+
+        occurrences = []
+        for i in np.flatnonzero(rising | falling):
+            common = dict(
+                confidence=0.8,
+                start=int(pairs['start'][i]), end=int(pairs['end'][i]), confirmed=int(pairs['at'][i]),
+                points=self._pair_points(pairs, i),
+            )
+            if rising[i]:
+                support = float(pairs['lv1'][i])
+                occurrences.append(PatternOccurrence(
+                    pattern_type="RISING_WEDGE", direction="SELL",
+                    entry_price=support * 0.999, stop_loss=float(pairs['hv1'][i]),
+                    take_profit=support * 0.96, **common,
+                ))
+            else:
+                resistance = float(pairs['hv1'][i])
+                occurrences.append(PatternOccurrence(
+                    pattern_type="FALLING_WEDGE", direction="BUY",
+                    entry_price=resistance * 1.001, stop_loss=float(pairs['lv1'][i]),
+                    take_profit=resistance * 1.04, **common,
+                ))
+        return occurrences
+
+    # ========== AUXILIARES ==========
+
+    def _volume_decreasing(self, ctx: _ScanContext, at: np.ndarray, window: int) -> np.ndarray:
+        """Si el volumen medio de las últimas 10 velas de la ventana es menor que el de las 10 primeras"""
+        if ctx.volume is None or not len(at):
+            return np.zeros(len(at), dtype=bool)
+        cumulative = np.concatenate(([0.0], np.cumsum(ctx.volume)))
+        first = np.maximum(at - window + 1, 0)
+        older = (cumulative[np.minimum(first + 10, at + 1)] - cumulative[first]) / np.minimum(10, at + 1 - first)
+        recent_start = np.maximum(at + 1 - 10, first)
+        recent = (cumulative[at + 1] - cumulative[recent_start]) / (at + 1 - recent_start)
+        return recent < older
+
+
+# Instancia global
+pattern_scanner = PatternScanner()
@@ -0,0 +1,266 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional, Tuple
+import logging
+import math
+
+from .features import FeatureStore
+
+
+def _sparse_table(values: np.ndarray, fn) -> np.ndarray:
+    """Tabla dispersa para mínimos/máximos de rango en O(1) (fila j = ventanas de 2**j)"""
+    n = len(values)
+    depth = max(int(math.log2(n)) + 1, 1) if n else 1
+    table = np.empty((depth, n), dtype=values.dtype)
+    if n:
+        table[0] = values
+    for j in range(1, depth):
+        half = 1 << (j - 1)
+        width = n - (1 << j) + 1
+        table[j, :width] = fn(table[j - 1, :width], table[j - 1, half:half + width])
+    return table
+
+
+def _range_query(table: np.ndarray, start: np.ndarray, stop: np.ndarray, fn) -> np.ndarray:
+    """fn sobre [start, stop) para cada consulta (rangos no vacíos)"""
+    j = np.floor(np.log2(stop - start)).astype(np.int64)
+    return fn(table[j, start], table[j, stop - (1 << j)])
+
+
+class BarIndex:
+    """
+    Índices ordenados de máximos y mínimos de una serie de velas.
+
+    Permite consultar para muchos niveles a la vez cuántas velas tienen el máximo
+    o el mínimo dentro de [lo, hi], el volumen de esas velas y la primera/última
+    vela que tocó, con búsquedas binarias sobre arrays ordenados y sumas prefijas
+    en lugar de una máscara sobre todo el DataFrame por nivel.
+    """
+
+    def __init__(self, high: np.ndarray, low: np.ndarray, volume: Optional[np.ndarray] = None):
+        self.length = len(high)
+        valid_high = ~np.isnan(high)
+        valid_low = ~np.isnan(low)
+
+        # Máximos y mínimos válidos ordenados, con la posición original de cada vela
+        high_positions = np.flatnonzero(valid_high)
+        low_positions = np.flatnonzero(valid_low)
+        by_high = np.argsort(high[valid_high], kind='stable')
+        by_low = np.argsort(low[valid_low], kind='stable')
+        self.high_sorted = high[valid_high][by_high]
+        self.low_sorted = low[valid_low][by_low]
+        self._first_high = _sparse_table(high_positions[by_high], np.minimum)
+        self._last_high = _sparse_table(high_positions[by_high], np.maximum)
+        self._first_low = _sparse_table(low_positions[by_low], np.minimum)
+        self._last_low = _sparse_table(low_positions[by_low], np.maximum)
+
+        # Velas con un solo extremo válido: sólo tocan por ese extremo (casos raros)
+        only_high = valid_high & ~valid_low
+        only_low = valid_low & ~valid_high
+        self._single = np.concatenate((high[only_high], low[only_low]))
+        self._single_volume = (np.concatenate((volume[only_high], volume[only_low]))
+                               if volume is not None else None)
+
+        # Para el volumen: velas con máximo y mínimo válidos
+        valid = valid_high & valid_low
+        high = high[valid]
+        low = low[valid]
+        self.count = len(high)
+        self.volume = volume[valid] if volume is not None else None
+        by_high = np.argsort(high, kind='stable')
+        by_low = np.argsort(low, kind='stable')
+        self._complete_high = high[by_high]
+        self._complete_low = low[by_low]
+
+        if self.volume is not None:
+            # Sumas prefijas del volumen en orden de máximo y de mínimo
+            self.volume_total = float(self.volume.sum())
+            self._volume_by_high = np.concatenate(([0.0], np.cumsum(self.volume[by_high], dtype=float)))
+            self._volume_by_low = np.concatenate(([0.0], np.cumsum(self.volume[by_low], dtype=float)))
+
+        # Bloques (en orden de mínimo) con los máximos ordenados, para contar velas
+        # que envuelven el rango (mínimo < lo y máximo > hi)
+        self._high_by_low = high[by_low]
+        self._volume_by_low_order = self.volume[by_low] if self.volume is not None else None
+        self._block = max(16, int(math.sqrt(self.count)))
+        self._blocks = []
+        for start in range(0, self.count, self._block):
+            block_high = self._high_by_low[start:start + self._block]
+            order = np.argsort(block_high, kind='stable')
+            suffix = None
+            if self._volume_by_low_order is not None:
+                block_volume = self._volume_by_low_order[start:start + self._block][order]
+                suffix = np.concatenate((np.cumsum(block_volume[::-1], dtype=float)[::-1], [0.0]))
+            self._blocks.append((block_high[order], suffix))
+
+    def _bounds(self, sorted_values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return (np.searchsorted(sorted_values, lo, side='left'),
+                np.searchsorted(sorted_values, hi, side='right'))
+
+    def touches(self, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        """max(velas con máximo en [lo, hi], velas con mínimo en [lo, hi])"""
+        high_start, high_stop = self._bounds(self.high_sorted, lo, hi)
+        low_start, low_stop = self._bounds(self.low_sorted, lo, hi)
+        return np.maximum(np.maximum(high_stop - high_start, 0), np.maximum(low_stop - low_start, 0))
+
+    def _straddles(self, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cantidad y volumen de velas con mínimo < lo y máximo > hi"""
+        prefix = np.searchsorted(self._complete_low, lo, side='left')
+        full_blocks = prefix // self._block
+        counts = np.zeros(len(lo), dtype=np.int64)
+        volumes = np.zeros(len(lo), dtype=float)
+        if not self.count:
+            return counts, volumes
+
+        # Bloques completos: búsqueda binaria en los máximos ordenados de cada bloque
+        for b in range(int(full_blocks.max(initial=0))):
+            active = np.flatnonzero(full_blocks > b)
+            block_high, suffix = self._blocks[b]
+            cut = np.searchsorted(block_high, hi[active], side='right')
+            counts[active] += len(block_high) - cut
+            if suffix is not None:
+                volumes[active] += suffix[cut]
+
+        # Resto del último bloque parcial: comparación directa (a lo sumo un bloque)
+        start = full_blocks * self._block
+        offsets = np.arange(self._block)
+        index = np.minimum(start[:, None] + offsets[None, :], max(self.count - 1, 0))
+        inside = (offsets[None, :] < (prefix - start)[:, None]) & (self._high_by_low[index] > hi[:, None])
+        counts += inside.sum(axis=1)
+        if self._volume_by_low_order is not None:
+            volumes += np.where(inside, self._volume_by_low_order[index], 0.0).sum(axis=1)
+        return counts, volumes
+
+    def touch_volume(self, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cantidad y volumen total de velas con máximo o mínimo en [lo, hi]"""
+        # Las velas que no tocan quedan completas debajo (máximo < lo), encima
+        # (mínimo > hi) o envuelven el rango; los tres casos son disjuntos
+        below = np.searchsorted(self._complete_high, lo, side='left')
+        above = np.searchsorted(self._complete_low, hi, side='right')
+        straddle_count, straddle_volume = self._straddles(lo, hi)
+        counts = self.count - below - (self.count - above) - straddle_count
+
+        single = np.zeros((len(lo), 0), dtype=bool)
+        if len(self._single):
+            single = (self._single[None, :] >= lo[:, None]) & (self._single[None, :] <= hi[:, None])
+            counts = counts + single.sum(axis=1)
+
+        if self.volume is None:
+            return counts, np.zeros(len(lo))
+        volumes = (self.volume_total - self._volume_by_high[below]
+                   - (self._volume_by_low[-1] - self._volume_by_low[above]) - straddle_volume)
+        if len(self._single):
+            volumes = volumes + np.where(single, self._single_volume[None, :], 0.0).sum(axis=1)
+        return counts, volumes
+
+    def touch_span(self, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Posición de la primera y última vela que tocó [lo, hi] (-1 si ninguna)"""
+        first = np.full(len(lo), np.iinfo(np.int64).max, dtype=np.int64)
+        last = np.full(len(lo), -1, dtype=np.int64)
+        for sorted_values, first_table, last_table in (
+            (self.high_sorted, self._first_high, self._last_high),
+            (self.low_sorted, self._first_low, self._last_low),
+        ):
+            start, stop = self._bounds(sorted_values, lo, hi)
+            hit = np.flatnonzero(stop > start)
+            if len(hit):
+                first[hit] = np.minimum(first[hit], _range_query(first_table, start[hit], stop[hit], np.minimum))
+                last[hit] = np.maximum(last[hit], _range_query(last_table, start[hit], stop[hit], np.maximum))
+        first[last < 0] = -1
+        return first, last
+
+
+class SupportResistanceEngine:
+    """
+    Motor vectorizado de soportes y resistencias.
+
+    Calcula toques, volumen relativo y antigüedad de todos los niveles candidatos
+    (extremos locales) en una sola pasada sobre arrays ordenados. Devuelve los
+    mismos campos que el análisis por nivel original de ConfluenceDetector.
+    """
+
+    def __init__(self, order: int = 5, touch_tolerance: float = 0.001,
+                 volume_tolerance: float = 0.002, min_strength: float = 0.3):
+        self.order = order
+        self.touch_tolerance = touch_tolerance
+        self.volume_tolerance = volume_tolerance
+        self.min_strength = min_strength
+        self.logger = logging.getLogger(__name__)
+
+    def analyze(self, df: pd.DataFrame) -> Optional[Dict]:
+        """Niveles de S/R con fuerza > min_strength y confianza general"""
+        features = FeatureStore.of(df)
+        high = features.column('High')
+        low = features.column('Low')
+
+        highs = features.extrema('High', self.order, 'max')
+        lows = features.extrema('Low', self.order, 'min')
+        prices = np.concatenate((high[highs], low[lows]))
+        if not len(prices):
+            return None
+
+        metrics = self.level_metrics(df, prices)
+        levels = []
+        for i in np.flatnonzero(metrics['strength'] > self.min_strength):
+            levels.append({
+                'price': float(prices[i]),
+                'type': 'resistance' if i < len(highs) else 'support',
+                'strength': float(metrics['strength'][i]),
+                'touches': int(metrics['touches'][i])
+            })
+
+        if not levels:
+            return None
+
+        # Calcular confianza general
+        avg_strength = sum(level['strength'] for level in levels) / len(levels)
+
+        return {
+            'levels': levels,
+            'confidence': min(avg_strength * 1.2, 1.0),
+            'description': f"Identificados {len(levels)} niveles de S/R"
+        }
+
+    def level_metrics(self, df: pd.DataFrame, prices: np.ndarray) -> Dict[str, np.ndarray]:
+        """Toques, fuerza por volumen, factor de antigüedad y fuerza total de cada precio"""
+        prices = np.asarray(prices, dtype=float)
+        features = FeatureStore.of(df)
+        volume = features.column('Volume') if 'Volume' in df.columns else None
+        index = features.get(('bar_index',), lambda: BarIndex(features.column('High'), features.column('Low'), volume))
+
+        touch_lo = prices * (1 - self.touch_tolerance)
+        touch_hi = prices * (1 + self.touch_tolerance)
+        touches = index.touches(touch_lo, touch_hi)
+
+        # Volumen promedio en las velas que tocan vs volumen promedio general
+        volume_strength = np.zeros(len(prices))
+        if volume is not None and len(volume):
+            counts, volumes = index.touch_volume(prices * (1 - self.volume_tolerance),
+                                                 prices * (1 + self.volume_tolerance))
+            avg_volume = np.nanmean(volume) if len(volume) else 0.0
+            if avg_volume > 0:
+                touched = counts > 0
+                ratio = np.zeros(len(prices))
+                ratio[touched] = volumes[touched] / counts[touched] / avg_volume
+                volume_strength = np.where(ratio > 1.0, np.minimum(ratio - 1.0, 1.0), 0.0)
+
+        # Períodos entre el primer y el último toque sobre el 50% del dataset
+        first, last = index.touch_span(touch_lo, touch_hi)
+        max_age = len(df) * 0.5
+        if max_age > 0:
+            age_factor = np.where(last >= 0, np.minimum((last - first) / max_age, 1.0), 0.0)
+        else:
+            age_factor = np.zeros(len(prices))
+
+        strength = np.minimum(
+            np.minimum(touches / 3.0, 1.0)        # Normalizar por 3 toques
+            + np.minimum(volume_strength, 0.3)    # Máximo 30% de bonificación
+            + np.minimum(age_factor, 0.2),        # Máximo 20% de bonificación
+            1.0
+        )
+        return {
+            'touches': touches,
+            'volume_strength': volume_strength,
+            'age_factor': age_factor,
+            'strength': strength,
+        }
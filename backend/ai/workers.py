@@ -0,0 +1,44 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import inspect
+import os
+import threading
+
+# Un event loop por hilo de trabajo para ejecutar los analizadores `async def`
+_thread_state = threading.local()
+
+
+def _call(fn: Callable, *args, **kwargs) -> Any:
+    """Ejecutar `fn` en el hilo actual; si devuelve una corrutina, completarla en el loop del hilo"""
+    result = fn(*args, **kwargs)
+    if not inspect.isawaitable(result):
+        return result
+
+    loop = getattr(_thread_state, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = _thread_state.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(result)
+
+
+async def run_in_worker(fn: Callable, *args, executor: Optional[Executor] = None, **kwargs) -> Any:
+    """
+    Ejecutar un analizador (función o corrutina sin E/S real) en el pool de
+    trabajo, sin bloquear el event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor if executor is not None else analysis_executor,
+        lambda: _call(fn, *args, **kwargs)
+    )
+
+
+# Pool compartido de análisis. Son hilos y no procesos para que los analizadores
+# lean el mismo DataFrame sin copiarlo ni serializarlo. Los bucles Python (Elliott,
+# patrones) no corren en paralelo por el GIL, y un hilo no se puede cancelar: el
+# ConfluenceDetector no lanza otro cálculo de una serie mientras siga corriendo
+# uno que superó el timeout.
+analysis_executor = ThreadPoolExecutor(
+    max_workers=min(8, (os.cpu_count() or 2) + 2),
+    thread_name_prefix="analysis"
+)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from api.serialization import JSONResponse
 from datetime import datetime
 import logging
 
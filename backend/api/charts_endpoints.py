@@ -1,8 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from api.serialization import JSONResponse
 from typing import List, Dict, Optional, Any
 import asyncio
-import json
 from datetime import datetime, timedelta
 import logging
 import numpy as np
@@ -10,8 +9,8 @@ import pandas as pd
 from database.user import User
 from database.connection import get_database
 from mt5.data_provider import MT5DataProvider
+from mt5.async_provider import AsyncMT5Provider
 from api.auth import get_current_user
-from bson import ObjectId
 import io
 import base64
 from PIL import Image, ImageDraw, ImageFont
@@ -30,42 +29,7 @@ plt.switch_backend('Agg')
 
 # Inicializar MT5 provider
 mt5_provider = MT5DataProvider()
-
-def prepare_for_json(data):
-    """Prepara datos para serialización JSON"""
-    if data is None:
-        return None
-    elif isinstance(data, dict):
-        result = {}
-        for key, value in data.items():
-            if key == "_id":
-                if isinstance(value, ObjectId):
-                    result["id"] = str(value)
-                else:
-                    result["id"] = str(value)
-            else:
-                result[key] = prepare_for_json(value)
-        return result
-    elif isinstance(data, (list, tuple)):
-        return [prepare_for_json(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    elif isinstance(data, datetime):
-        return data.isoformat()
-    elif isinstance(data, pd.Timestamp):
-        return data.isoformat()
-    elif isinstance(data, (np.float32, np.float64, np.floating)):
-        return float(data)
-    elif isinstance(data, (np.int32, np.int64, np.integer)):
-        return int(data)
-    elif isinstance(data, (np.bool_)):
-        return bool(data)
-    else:
-        try:
-            json.dumps(data)
-            return data
-        except (TypeError, ValueError):
-            return str(data)
+mt5_async = AsyncMT5Provider(mt5_provider)
 
 @router.post("/generate")
 async def generate_chart_image(
@@ -94,15 +58,15 @@ async def generate_chart_image(
         # ✅ MEJORADO: Intentar conectar a MT5 si no está conectado
         if not mt5_provider.connected:
             logger.info("MT5 not connected, attempting to connect...")
-            if not mt5_provider.connect():
+            if not await mt5_async.connect():
                 logger.warning("Failed to connect to MT5, using mock data")
                 # Usar datos simulados si MT5 no está disponible
                 data = generate_mock_data(symbol, timeframe)
             else:
                 logger.info("MT5 connected successfully")
-                data = mt5_provider.get_realtime_data(symbol, timeframe, 100)
+                data = await mt5_async.get_realtime_data(symbol, timeframe, 100)
         else:
-            data = mt5_provider.get_realtime_data(symbol, timeframe, 100)
+            data = await mt5_async.get_realtime_data(symbol, timeframe, 100)
         
         # ✅ MEJORADO: Generar datos mock si no hay datos reales
         if data is None or (hasattr(data, 'empty') and data.empty):
@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+from fastapi.responses import Response
+
+from mt5.candles import Candles
+
+# Historial incremental: los clientes piden sólo las velas desde su última vela
+# (since) o un rango (from/to) y revalidan con If-None-Match / If-Modified-Since.
+# El ETag es un hash de las velas devueltas y de los parámetros de la petición,
+# así que la vela en formación cambia el ETag aunque su hora no cambie. Es débil
+# (W/): el cuerpo lleva campos por petición (timestamp, last_updated).
+# Last-Modified / If-Modified-Since sólo se usan si la respuesta no incluye la
+# última vela de la serie, que puede seguir formándose sin cambiar de hora.
+# Las velas salen de las últimas `count`: si since/from es anterior a la primera,
+# la respuesta lleva truncated=True y first_time para que el cliente pida más.
+
+
+def parse_bar_time(value: Any) -> Optional[int]:
+    """Segundos epoch desde un número (o texto numérico) o una fecha ISO 8601 (sin zona = UTC)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    try:
+        return int(float(text))
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _lower_bound(since: Optional[int], start: Optional[int]) -> Optional[int]:
+    return max((bound for bound in (since, start) if bound is not None), default=None)
+
+
+def select_bars(candles: Candles,
+                since: Optional[int] = None,
+                start: Optional[int] = None,
+                end: Optional[int] = None) -> Candles:
+    """
+    Velas pedidas: desde `since` (incluida, para reenviar la vela en formación
+    actualizada) y/o dentro de [start, end].
+    """
+    lower = _lower_bound(since, start)
+    if lower is None and end is None:
+        return candles
+    return candles.between(lower, end)
+
+
+def is_truncated(window: Candles, since: Optional[int] = None, start: Optional[int] = None) -> bool:
+    """True si since/from es anterior a la primera vela de la ventana: puede faltar historial"""
+    lower = _lower_bound(since, start)
+    return lower is not None and not window.empty and lower < int(window.time[0])
+
+
+def history_window(window: Candles, since: Optional[int] = None, start: Optional[int] = None) -> Dict[str, Any]:
+    """Campos de la respuesta sobre la ventana disponible (first_time, truncated)"""
+    return {
+        "first_time": int(window.time[0]) if not window.empty else None,
+        "truncated": is_truncated(window, since, start),
+    }
+
+
+def closed_last_time(candles: Candles, window: Candles) -> Optional[int]:
+    """Hora de la última vela devuelta si es segura para Last-Modified (no es la última de la serie)"""
+    if candles.empty or candles.last_time >= window.last_time:
+        return None
+    return candles.last_time
+
+
+def history_etag(candles: Candles, *variant: Any) -> str:
+    """ETag débil: hash de las velas devueltas y de lo que cambia su representación"""
+    digest = hashlib.blake2b(repr(variant).encode("utf-8"), digest_size=16)
+    for column in (candles.time, candles.open, candles.high, candles.low, candles.close, candles.volume):
+        digest.update(column.tobytes())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def history_headers(etag: str, last_modified: Optional[int]) -> Dict[str, str]:
+    """Cabeceras de validación: ETag y, si hay (ver closed_last_time), Last-Modified"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def _opaque_tag(tag: str) -> str:
+    """Etiqueta sin el prefijo W/ (comparación débil de If-None-Match)"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: str, last_modified: Optional[int]) -> bool:
+    """
+    True si el cliente ya tiene esta versión. If-None-Match tiene prioridad;
+    If-Modified-Since sólo se usa con `last_modified` (None si se devuelve la
+    última vela de la serie, que puede estar en formación).
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {_opaque_tag(tag) for tag in if_none_match.split(",")}
+        return "*" in tags or _opaque_tag(etag) in tags
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
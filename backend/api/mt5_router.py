@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from api.serialization import CANDLE_FORMATS, JSONResponse, candle_columns, prepare_for_json, serialize_candles
+from api.wire_format import market_data_response, negotiate, tick_columns
+from api.history import (
+    closed_last_time, history_etag, history_headers, history_window, is_not_modified,
+    not_modified_response, parse_bar_time, select_bars,
+)
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any, Callable, Tuple
 from datetime import datetime, timedelta
 import logging
 import json
-import numpy as np
-import pandas as pd
-from bson import ObjectId
 import asyncio
 
 from database.ai_settings import AISettingsRequest, AISettings, AISettingsResponse, AISettingsValidation
@@ -27,58 +29,19 @@ from api.auth import get_current_user
 
 # Proveedor de datos MT5 (ajusta los métodos según tu wrapper)
 from mt5.data_provider import MT5DataProvider
+from mt5.async_provider import AsyncMT5Provider
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Inicializar MT5 provider
 mt5_provider = MT5DataProvider()
+# Fachada asíncrona: las llamadas bloqueantes a MT5 se ejecutan en el hilo dedicado
+mt5_async = AsyncMT5Provider(mt5_provider)
 
 # ------------------------
 # Helpers comunes
 # ------------------------
-def prepare_for_json(data):
-    """Prepara datos para serialización JSON"""
-    if data is None:
-        return None
-    elif isinstance(data, dict):
-        result = {}
-        for key, value in data.items():
-            if key == "_id":
-                if isinstance(value, ObjectId):
-                    result["id"] = str(value)
-                else:
-                    result["id"] = str(value)
-            else:
-                result[key] = prepare_for_json(value)
-        return result
-    elif isinstance(data, (list, tuple)):
-        return [prepare_for_json(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    elif isinstance(data, datetime):
-        return data.isoformat()
-    elif isinstance(data, pd.Timestamp):
-        return data.isoformat()
-    elif isinstance(data, (np.float32, np.float64, np.floating)):
-        return float(data)
-    elif isinstance(data, (np.int32, np.int64, np.integer)):
-        return int(data)
-    elif isinstance(data, (np.bool_)):
-        return bool(data)
-    elif hasattr(data, "__dict__"):
-        try:
-            return prepare_for_json(data.__dict__)
-        except Exception:
-            return str(data)
-    else:
-        try:
-            json.dumps(data)
-            return data
-        except (TypeError, ValueError):
-            return str(data)
-
-
 def _normalize_account_type(value: Optional[str]) -> str:
     if not value:
         return "real"
@@ -192,7 +155,7 @@ async def _get_account_info_safe(retries: int = 0, delay_ms: int = 0) -> Dict[st
     last_route = "none"
     info: Dict[str, Any] = {}
     while True:
-        raw, route = _get_account_info_raw_with_logs()
+        raw, route = await mt5_async.run(_get_account_info_raw_with_logs, name="account_info")
         last_route = route
         info = _obj_to_account_dict(raw)
 
@@ -200,7 +163,7 @@ async def _get_account_info_safe(retries: int = 0, delay_ms: int = 0) -> Dict[st
             if info.get("server") is None:
                 try:
                     if hasattr(mt5_provider, "get_server") and callable(getattr(mt5_provider, "get_server")):
-                        info["server"] = mt5_provider.get_server()
+                        info["server"] = await mt5_async.run(mt5_provider.get_server)
                 except Exception:
                     pass
             logger.info(
@@ -212,9 +175,9 @@ async def _get_account_info_safe(retries: int = 0, delay_ms: int = 0) -> Dict[st
         # "tocar" el proveedor y reintentar
         try:
             if hasattr(mt5_provider, "get_symbol_info"):
-                mt5_provider.get_symbol_info("EURUSD")
+                await mt5_async.get_symbol_info("EURUSD")
             elif hasattr(mt5_provider, "connect"):
-                mt5_provider.connect()  # sin kwargs
+                await mt5_async.connect()  # sin kwargs
         except Exception as e:
             logger.debug(f"[MT5 Account] Touch provider failed: {e}")
 
@@ -713,18 +676,18 @@ async def connect_mt5(body: ConnectRequest, current_user: User = Depends(get_cur
     ok = False
     try:
         if hasattr(mt5_provider, "login") and body.login and body.password and body.server:
-            ok = bool(mt5_provider.login(login=str(body.login), password=body.password, server=body.server))
+            ok = bool(await mt5_async.run(mt5_provider.login, login=str(body.login), password=body.password, server=body.server))
         elif hasattr(mt5_provider, "initialize"):
-            ok = bool(mt5_provider.initialize())
+            ok = bool(await mt5_async.run(mt5_provider.initialize))
         elif hasattr(mt5_provider, "connect"):
-            ok = bool(mt5_provider.connect())
+            ok = bool(await mt5_async.connect())
     except Exception as e:
         logger.warning(f"[MT5 Connect] Error conectando: {e}")
         ok = False
 
     if not ok and hasattr(mt5_provider, "connect"):
         try:
-            ok = bool(mt5_provider.connect())
+            ok = bool(await mt5_async.connect())
         except Exception as e:
             logger.warning(f"[MT5 Connect] Retry connect failed: {e}")
             ok = False
@@ -801,9 +764,9 @@ async def autoconnect_mt5(current_user: User = Depends(get_current_user), db=Dep
     ok = False
     try:
         if hasattr(mt5_provider, "connect"):
-            ok = bool(mt5_provider.connect())
+            ok = bool(await mt5_async.connect())
         elif hasattr(mt5_provider, "initialize"):
-            ok = bool(mt5_provider.initialize())
+            ok = bool(await mt5_async.run(mt5_provider.initialize))
     except Exception as e:
         logger.warning(f"[MT5 AutoConnect] Error: {e}")
         ok = False
@@ -898,7 +861,7 @@ async def disconnect_mt5(current_user: User = Depends(get_current_user), db=Depe
     """
     user_id = str(current_user.id)
 
-    ok = _disconnect_safe()
+    ok = await mt5_async.run(_disconnect_safe)
     
     # 🚨 Eliminar por completo la sesión de este usuario
     await db.mt5_sessions.delete_one({"user_id": user_id})
@@ -956,6 +919,21 @@ async def mt5_status(current_user: User = Depends(get_current_user), db=Depends(
     )
 
 
+@router.get("/metrics")
+async def mt5_executor_metrics(current_user: User = Depends(get_current_user)):
+    """
+    Métricas del hilo de MT5: profundidad de cola y latencia/espera por método.
+    """
+    return JSONResponse(
+        content={
+            "connected": mt5_provider.connected,
+            "executor": mt5_async.get_metrics(),
+            "bar_cache": mt5_provider.bar_cache.get_stats(),
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+    )
+
+
 # Perfil: guardar/obtener/eliminar (sin contraseña)
 @router.post("/profile/save", response_model=ProfileResponse)
 async def save_profile(body: Profile, current_user: User = Depends(get_current_user), db=Depends(get_database)):
@@ -1030,10 +1008,21 @@ async def delete_profile(current_user: User = Depends(get_current_user), db=Depe
 @router.post("/data")
 async def get_mt5_data(
     request_data: Dict[str, Any],
+    request: Request,
+    candle_format: str = Query("rows", alias="format", description="rows | columns"),
     current_user: User = Depends(get_current_user),
 ):
     """
-    Obtiene datos históricos reales de MT5
+    Obtiene datos históricos reales de MT5.
+    format=rows devuelve una lista de velas; format=columns, arrays paralelos
+    (time en segundos epoch, open, high, low, close, volume). Con Accept binario
+    (ver api.wire_format) se devuelven siempre las columnas como arrays tipados.
+
+    Historial incremental (en el body, epoch o ISO 8601, dentro de las últimas
+    `count` velas): since = velas desde esa hora, incluida la vela en formación;
+    from/to = rango. truncated=True si since/from es anterior a first_time (la
+    primera vela disponible). Las respuestas llevan ETag (y Last-Modified si no
+    incluyen la vela en formación) y devuelven 304 si el cliente ya tiene esas velas.
     """
     try:
         symbol = request_data.get("symbol")
@@ -1045,25 +1034,52 @@ async def get_mt5_data(
                 status_code=400,
                 content={"error": "Symbol is required"}
             )
+        try:
+            since = parse_bar_time(request_data.get("since"))
+            start = parse_bar_time(request_data.get("from"))
+            end = parse_bar_time(request_data.get("to"))
+        except ValueError as time_error:
+            return JSONResponse(
+                status_code=400,
+                content={"error": str(time_error)}
+            )
+        if candle_format not in CANDLE_FORMATS:
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"Invalid format. Use one of: {', '.join(CANDLE_FORMATS)}"}
+            )
 
         # Conectar a MT5 si no está conectado
         if not _is_connected_safe():
-            if not hasattr(mt5_provider, "connect") or not mt5_provider.connect():
+            if not hasattr(mt5_provider, "connect") or not await mt5_async.connect():
                 logger.error("Failed to connect to MT5")
                 return JSONResponse(
                     status_code=503,
                     content={"error": "Cannot connect to MetaTrader 5"}
                 )
 
-        # Obtener datos históricos
-        data = mt5_provider.get_realtime_data(symbol, timeframe, count)
+        # Obtener datos históricos (desde la caché de velas)
+        bars = await mt5_async.get_candles(symbol, timeframe, count)
 
-        if data is None or getattr(data, "empty", True):
+        if bars is None or bars.empty:
             return JSONResponse(
                 status_code=404,
                 content={"error": f"No data available for {symbol}"}
             )
 
+        # Sólo las velas pedidas; si el cliente ya las tiene, 304 sin serializar nada
+        window = bars
+        bars = select_bars(window, since, start, end)
+        coverage = history_window(window, since, start)
+        wire_format = negotiate(request.headers.get("accept"))
+        etag = history_etag(bars, symbol, timeframe, count, since, start, end, candle_format, wire_format, coverage)
+        last_modified = closed_last_time(bars, window)
+        cache_headers = history_headers(etag, last_modified)
+        if is_not_modified(request.headers, etag, last_modified):
+            return not_modified_response(cache_headers)
+
+        data = bars.to_frame()
+
         # Mapear nombres de columnas comunes de MT5
         column_mapping = {
             # Estándar MT5
@@ -1116,29 +1132,37 @@ async def get_mt5_data(
                 },
             )
 
-        # Convertir DataFrame a velas
-        candles: List[Dict[str, Any]] = []
-        for index, row in data.iterrows():
-            try:
-                candle = {
-                    "time": row.name.isoformat() if hasattr(row.name, "isoformat") else str(row.name),
-                    "open": float(row[mapped_columns["open"]]),
-                    "high": float(row[mapped_columns["high"]]),
-                    "low": float(row[mapped_columns["low"]]),
-                    "close": float(row[mapped_columns["close"]]),
-                    "volume": float(
-                        row[mapped_columns.get("volume", mapped_columns.get("tick_volume", available_columns[0]))]
-                    )
-                    if ("volume" in mapped_columns or "tick_volume" in mapped_columns)
-                    else 0.0,
-                }
-                candles.append(candle)
-            except Exception as row_error:
-                logger.error(f"Error processing row {index}: {row_error}")
-                logger.error(f"Row data: {row}")
-                continue
+        # Convertir DataFrame a velas (por columnas; las filas no numéricas se descartan)
+        candle_sources = {
+            "open": mapped_columns["open"],
+            "high": mapped_columns["high"],
+            "low": mapped_columns["low"],
+            "close": mapped_columns["close"],
+            "volume": mapped_columns.get("volume"),
+        }
+        if wire_format != "json":
+            columns = candle_columns(data, candle_sources)
+            return market_data_response(
+                {
+                    "symbol": symbol,
+                    "timeframe": timeframe,
+                    "count": len(columns["time"]),
+                    "last_time": bars.last_time,
+                    **coverage,
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "source": "MT5_Real",
+                },
+                columns,
+                wire_format,
+                headers=cache_headers,
+            )
+
+        candles = serialize_candles(data, candle_sources, candle_format)
+        processed_rows = len(candles["time"]) if candle_format == "columns" else len(candles)
+        if processed_rows < len(data):
+            logger.warning(f"Discarded {len(data) - processed_rows} non-numeric rows for {symbol}")
 
-        if not candles:
+        if not processed_rows and len(data):
             return JSONResponse(
                 status_code=422,
                 content={
@@ -1152,18 +1176,21 @@ async def get_mt5_data(
         response_data = {
             "symbol": symbol,
             "timeframe": timeframe,
-            "count": len(candles),
+            "count": processed_rows,
+            "format": candle_format,
+            "last_time": bars.last_time,
+            **coverage,
             "data": {"candles": candles},
             "debug_info": {
                 "original_columns": available_columns,
                 "mapped_columns": mapped_columns,
-                "processed_rows": len(candles),
+                "processed_rows": processed_rows,
             },
             "timestamp": datetime.utcnow().isoformat(),
             "source": "MT5_Real",
         }
 
-        return JSONResponse(content=response_data)
+        return JSONResponse(content=response_data, headers=cache_headers)
 
     except Exception as e:
         logger.error(f"Error getting MT5 data: {e}", exc_info=True)
@@ -1180,15 +1207,17 @@ async def get_mt5_data(
 @router.get("/price/{symbol}")
 async def get_current_price(
     symbol: str,
+    request: Request,
     current_user: User = Depends(get_current_user),
 ):
     """
-    Obtiene el precio actual en tiempo real de MT5
+    Obtiene el precio actual en tiempo real de MT5 (JSON, o el tick como columnas
+    si Accept pide un formato binario)
     """
     try:
         # Conectar a MT5 si no está conectado
         if not _is_connected_safe():
-            if not hasattr(mt5_provider, "connect") or not mt5_provider.connect():
+            if not hasattr(mt5_provider, "connect") or not await mt5_async.connect():
                 logger.error("Failed to connect to MT5")
                 return JSONResponse(
                     status_code=503,
@@ -1196,7 +1225,7 @@ async def get_current_price(
                 )
 
         # Obtener precio actual
-        current_price = mt5_provider.get_current_price(symbol)
+        current_price = await mt5_async.get_current_price(symbol)
 
         if current_price is None:
             return JSONResponse(
@@ -1205,9 +1234,25 @@ async def get_current_price(
             )
 
         # Obtener información adicional del símbolo
-        symbol_info_raw = mt5_provider.get_symbol_info(symbol) if hasattr(mt5_provider, "get_symbol_info") else None
+        symbol_info_raw = await mt5_async.get_symbol_info(symbol) if hasattr(mt5_provider, "get_symbol_info") else None
         symbol_info = _symbol_info_to_dict(symbol_info_raw)
 
+        wire_format = negotiate(request.headers.get("accept"))
+        if wire_format != "json" and isinstance(current_price, dict):
+            return market_data_response(
+                {
+                    "symbol": symbol,
+                    "source": "MT5_Real",
+                    "symbol_info": {
+                        "digits": symbol_info.get("digits", 5),
+                        "point": symbol_info.get("point", 0.00001),
+                        "spread": symbol_info.get("spread", 0),
+                    },
+                },
+                tick_columns(current_price),
+                wire_format,
+            )
+
         response_data = {
             "symbol": symbol,
             "price": float(current_price),
@@ -1279,7 +1324,7 @@ async def execute_order(
                     content={"error": "MT5 provider configuration error"}
                 )
             
-            connection_result = mt5_provider.connect()
+            connection_result = await mt5_async.connect()
             logger.info(f"🔌 MT5 connection attempt result: {connection_result}")
             
             if not connection_result:
@@ -1315,7 +1360,7 @@ async def execute_order(
         logger.info(f"   Price: {entry_price}, SL: {stop_loss}, TP: {take_profit}")
 
         # USAR execute_order EN LUGAR DE place_order
-        result = mt5_provider.execute_order(
+        result = await mt5_async.execute_order(
             symbol=symbol,
             order_type=signal_type.upper(),
             volume=lot_size,
@@ -1523,7 +1568,7 @@ async def get_open_positions(
     try:
         # Conectar a MT5 si no está conectado
         if not _is_connected_safe():
-            if not hasattr(mt5_provider, "connect") or not mt5_provider.connect():
+            if not hasattr(mt5_provider, "connect") or not await mt5_async.connect():
                 logger.error("Failed to connect to MT5")
                 return JSONResponse(
                     status_code=503,
@@ -1531,7 +1576,7 @@ async def get_open_positions(
                 )
 
         # Obtener posiciones abiertas
-        positions = mt5_provider.get_positions()
+        positions = await mt5_async.run(mt5_provider.get_positions)
 
         if positions is None:
             positions = []
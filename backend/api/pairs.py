@@ -1,29 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import List, Optional, Dict
 from datetime import datetime, timedelta
 import pandas as pd
 
 from database.user import User
-from database.mt5 import  TradingPair, OHLCV
+from database.mt5 import  TradingPair
 from mt5.data_provider import MT5DataProvider
+from mt5.async_provider import AsyncMT5Provider
 from api.auth import get_current_active_user
+from api.serialization import CANDLE_FORMATS, candle_columns, serialize_candles
+from api.wire_format import market_data_response, negotiate
+from api.history import (
+    closed_last_time, history_etag, history_headers, history_window, is_not_modified,
+    not_modified_response, parse_bar_time, select_bars,
+)
 from database.connection import db_manager
 
 router = APIRouter(prefix="/pairs", tags=["trading-pairs"])
 
 # Instancia global del proveedor de datos MT5
 mt5_provider = MT5DataProvider()
+# Fachada asíncrona: las llamadas a MT5 se ejecutan en el hilo dedicado
+mt5_async = AsyncMT5Provider(mt5_provider)
 
 @router.on_event("startup")
 async def startup_mt5():
     """Conectar a MT5 al iniciar la aplicación"""
-    if not mt5_provider.connect():
+    if not await mt5_async.connect():
         print("Warning: No se pudo conectar a MetaTrader 5")
 
 @router.on_event("shutdown") 
 async def shutdown_mt5():
     """Desconectar MT5 al cerrar la aplicación"""
-    mt5_provider.disconnect()
+    await mt5_async.disconnect()
 
 @router.get("/available", response_model=List[TradingPair])
 async def get_available_pairs(
@@ -34,7 +43,7 @@ async def get_available_pairs(
     if not mt5_provider.connected:
         raise HTTPException(status_code=503, detail="MT5 no está conectado")
     
-    pairs_data = mt5_provider.get_available_pairs()
+    pairs_data = await mt5_async.get_available_pairs()
     
     if category:
         pairs_data = [pair for pair in pairs_data if pair.get('category', '').lower() == category.lower()]
@@ -87,12 +96,12 @@ async def get_pair_info(
     if not mt5_provider.connected:
         raise HTTPException(status_code=503, detail="MT5 no está conectado")
     
-    symbol_info = mt5_provider.get_symbol_info(symbol.upper())
+    symbol_info = await mt5_async.get_symbol_info(symbol.upper())
     if not symbol_info:
         raise HTTPException(status_code=404, detail=f"Par {symbol} no encontrado")
     
     # Obtener precio actual
-    current_price = mt5_provider.get_current_price(symbol.upper())
+    current_price = await mt5_async.get_current_price(symbol.upper())
     
     return {
         "symbol_info": symbol_info,
@@ -104,11 +113,23 @@ async def get_pair_info(
 @router.get("/{symbol}/data")
 async def get_pair_data(
     symbol: str,
+    request: Request,
+    response: Response,
     timeframe: str = Query("H1", description="Timeframe: M1, M5, M15, M30, H1, H4, D1, W1, MN1"),
     count: int = Query(500, description="Número de velas", ge=1, le=5000),
+    candle_format: str = Query("rows", alias="format", description="rows | columns (arrays paralelos)"),
+    since: Optional[str] = Query(None, description="Velas desde esta hora (epoch o ISO 8601), incluida la vela en formación"),
+    start: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    end: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Obtener datos históricos de un par"""
+    """
+    Obtener datos históricos de un par (filas o columnas, ver serialize_candles).
+    Con Accept binario (ver api.wire_format) se devuelven las columnas como arrays tipados.
+    since/from/to filtran dentro de las últimas `count` velas (truncated=True si
+    piden velas anteriores a first_time); con If-None-Match o If-Modified-Since
+    se responde 304 si las velas no cambiaron.
+    """
     if not mt5_provider.connected:
         raise HTTPException(status_code=503, detail="MT5 no está conectado")
     
@@ -119,28 +140,61 @@ async def get_pair_data(
             status_code=400, 
             detail=f"Timeframe inválido. Usar: {', '.join(valid_timeframes)}"
         )
+    if candle_format not in CANDLE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato inválido. Usar: {', '.join(CANDLE_FORMATS)}"
+        )
+    try:
+        since_time, start_time, end_time = parse_bar_time(since), parse_bar_time(start), parse_bar_time(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    df = mt5_provider.get_realtime_data(symbol.upper(), timeframe, count)
-    if df is None or df.empty:
+    candles = await mt5_async.get_candles(symbol.upper(), timeframe, count)
+    if candles is None or candles.empty:
         raise HTTPException(status_code=404, detail=f"No se pudieron obtener datos para {symbol}")
     
-    # Convertir DataFrame a formato JSON
-    data = []
-    for idx, row in df.iterrows():
-        ohlcv = OHLCV(
-            timestamp=idx,
-            open=float(row['Open']),
-            high=float(row['High']),
-            low=float(row['Low']),
-            close=float(row['Close']),
-            volume=float(row['Volume'])
+    # Sólo las velas pedidas; si el cliente ya las tiene, 304 sin serializar nada
+    window = candles
+    candles = select_bars(window, since_time, start_time, end_time)
+    coverage = history_window(window, since_time, start_time)
+    wire_format = negotiate(request.headers.get("accept"))
+    etag = history_etag(candles, symbol.upper(), timeframe, count, since_time, start_time, end_time,
+                        candle_format, wire_format, coverage)
+    last_modified = closed_last_time(candles, window)
+    cache_headers = history_headers(etag, last_modified)
+    if is_not_modified(request.headers, etag, last_modified):
+        return not_modified_response(cache_headers)
+    
+    df = candles.to_frame()
+    candle_sources = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+    if wire_format != "json":
+        columns = candle_columns(df, candle_sources, time_key="timestamp")
+        return market_data_response(
+            {
+                "symbol": symbol.upper(),
+                "timeframe": timeframe,
+                "count": len(columns["timestamp"]),
+                "last_time": candles.last_time,
+                **coverage,
+                "last_updated": datetime.utcnow().isoformat(),
+            },
+            columns,
+            wire_format,
+            headers=cache_headers,
         )
-        data.append(ohlcv.dict())
+    
+    # Convertir DataFrame a formato JSON desde las columnas
+    data = serialize_candles(df, candle_sources, candle_format, time_key="timestamp")
+    response.headers.update(cache_headers)
     
     return {
         "symbol": symbol.upper(),
         "timeframe": timeframe,
-        "count": len(data),
+        "count": len(data["timestamp"]) if candle_format == "columns" else len(data),
+        "format": candle_format,
+        "last_time": candles.last_time,
+        **coverage,
         "data": data,
         "last_updated": datetime.utcnow()
     }
@@ -154,7 +208,7 @@ async def get_current_price(
     if not mt5_provider.connected:
         raise HTTPException(status_code=503, detail="MT5 no está conectado")
     
-    price_data = mt5_provider.get_current_price(symbol.upper())
+    price_data = await mt5_async.get_current_price(symbol.upper())
     if not price_data:
         raise HTTPException(status_code=404, detail=f"No se pudo obtener precio para {symbol}")
     
@@ -175,7 +229,7 @@ async def get_multiple_prices(
     
     prices = {}
     for symbol in symbol_list:
-        price_data = mt5_provider.get_current_price(symbol)
+        price_data = await mt5_async.get_current_price(symbol)
         if price_data:
             prices[symbol] = price_data
     
@@ -207,7 +261,7 @@ async def add_favorite_pair(
     if not mt5_provider.connected:
         raise HTTPException(status_code=503, detail="MT5 no está conectado")
     
-    symbol_info = mt5_provider.get_symbol_info(symbol)
+    symbol_info = await mt5_async.get_symbol_info(symbol)
     if not symbol_info:
         raise HTTPException(status_code=404, detail=f"Par {symbol} no encontrado")
     
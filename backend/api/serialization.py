@@ -0,0 +1,270 @@
+from fastapi.responses import JSONResponse as StarletteJSONResponse
+from typing import Any, Callable, Dict, Optional, Union
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from enum import Enum
+import json
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+# Codificador rápido opcional: con orjson instalado se usa en lugar de json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+# Sin serialización nativa de NumPy: los arrays pasan por json_default
+_ORJSON_FALLBACK_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def json_default(obj: Any) -> Any:
+    """
+    Conversión de los tipos que el codificador no conoce (ObjectId, fechas de pandas,
+    NumPy, pandas, modelos y objetos), con las mismas reglas que prepare_for_json.
+    Se llama durante la única serialización de la respuesta, sólo para los valores
+    que lo necesitan.
+    """
+    return _converter(obj)(obj)
+
+
+# ========== LIMPIEZA DE DOCUMENTOS ==========
+#
+# prepare_for_json convierte un documento (dicts de MongoDB, datos de análisis)
+# en tipos nativos de Python: "_id" pasa a "id" y ObjectId, fechas, NumPy y
+# pandas se convierten. El conversor de cada clase se resuelve una sola vez y
+# queda en _CONVERTERS; las hojas desconocidas se recorren por su __dict__ o se
+# pasan a str, sin probar json.dumps hoja a hoja.
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _to_none(value: Any) -> None:
+    return None
+
+
+def _isoformat(value: Any) -> str:
+    return value.isoformat()
+
+
+def _converter(value: Any) -> Callable[[Any], Any]:
+    return _CONVERTERS.get(value.__class__) or _resolve_converter(value.__class__)
+
+
+def _convert_dict(data: dict) -> dict:
+    result = {}
+    for key, value in data.items():
+        if key == "_id":
+            result["id"] = str(value)
+            continue
+        convert = _converter(value)
+        result[key] = value if convert is _identity else convert(value)
+    return result
+
+
+def _convert_sequence(data: Any) -> list:
+    result = []
+    for item in data:
+        convert = _converter(item)
+        result.append(item if convert is _identity else convert(item))
+    return result
+
+
+def _convert_array(data: np.ndarray) -> list:
+    """Arrays numéricos directamente con tolist(); fechas y objetos elemento a elemento"""
+    kind = data.dtype.kind
+    if kind in "biuf":
+        return data.tolist()
+    if kind == "M":
+        # En ns tolist() devuelve enteros: se pasa a µs para obtener datetime (NaT -> None)
+        return _convert_sequence(data.astype("datetime64[us]").tolist())
+    if kind == "m":
+        return _convert_sequence(data.astype("timedelta64[us]").tolist())
+    return _convert_sequence(data.tolist())
+
+
+def _convert_pandas(data: Any) -> list:
+    return _convert_array(data.to_numpy())
+
+
+def _convert_frame(data: pd.DataFrame) -> list:
+    return _convert_sequence(data.to_dict(orient="records"))
+
+
+def _convert_object(data: Any) -> Any:
+    return _convert_dict(vars(data))
+
+
+def _model_dump(data: Any) -> Any:
+    return data.model_dump(mode="json")
+
+
+# (clases, conversor) en orden de prioridad: NumPy antes que float (np.float64
+# hereda de float), NaT antes que datetime y Enum antes que str/int
+_CONVERSION_RULES = (
+    (dict, _convert_dict),
+    ((list, tuple, set, frozenset), _convert_sequence),
+    (np.ndarray, _convert_array),
+    ((pd.Series, pd.Index), _convert_pandas),
+    (pd.DataFrame, _convert_frame),
+    (np.bool_, bool),
+    (np.integer, int),
+    (np.floating, float),
+    (np.datetime64, lambda value: prepare_for_json(pd.Timestamp(value))),
+    (np.generic, lambda value: prepare_for_json(value.item())),
+    (type(pd.NaT), _to_none),
+    (ObjectId, str),
+    ((datetime, date, time), _isoformat),
+    (timedelta, lambda value: value.total_seconds()),
+    (Enum, lambda value: prepare_for_json(value.value)),
+    ((str, int, float, type(None)), _identity),
+    (Decimal, float),
+)
+
+_CONVERTERS: Dict[type, Callable[[Any], Any]] = {}
+
+
+def _resolve_converter(cls: type) -> Callable[[Any], Any]:
+    """Conversor de una clase (se calcula una vez por clase)"""
+    for types, converter in _CONVERSION_RULES:
+        if issubclass(cls, types):
+            break
+    else:
+        # Modelos con su volcado JSON; objetos con __dict__ por sus atributos; el resto, a str
+        has_dict = any("__dict__" in vars(base) for base in cls.__mro__)
+        if hasattr(cls, "model_dump"):
+            converter = _model_dump
+        else:
+            converter = _convert_object if has_dict else str
+    _CONVERTERS[cls] = converter
+    return converter
+
+
+def prepare_for_json(data: Any) -> Any:
+    """
+    Preparar un documento para JSON: "_id" -> "id", ObjectId -> str, fechas ->
+    ISO 8601, NumPy/pandas -> tipos nativos y listas, objetos -> su __dict__.
+    """
+    convert = _converter(data)
+    return data if convert is _identity else convert(data)
+
+
+# ========== VELAS ==========
+#
+# Las respuestas de velas se construyen desde los arrays de columnas, no fila a
+# fila: "rows" es la lista de dicts de siempre (generada con to_dict) y
+# "columns" son arrays paralelos, con el tiempo en segundos epoch.
+
+CANDLE_FORMATS = ("rows", "columns")
+
+
+def _candle_times(index: pd.Index, epoch: bool) -> np.ndarray:
+    if not isinstance(index, pd.DatetimeIndex):
+        return index.astype(str).to_numpy()
+    if epoch:
+        return index.as_unit("s").asi8
+    if index.tz is None:
+        return np.datetime_as_string(index.to_numpy(), unit="s")
+    return np.array([timestamp.isoformat() for timestamp in index])
+
+
+def _candle_values(df: pd.DataFrame, columns: Dict[str, Optional[str]], epoch: bool):
+    values = {
+        name: (pd.to_numeric(df[source], errors="coerce").to_numpy(dtype=np.float64)
+               if source is not None else np.zeros(len(df)))
+        for name, source in columns.items()
+    }
+    valid = ~np.isnan(np.column_stack(list(values.values()))).any(axis=1)
+    times = _candle_times(df.index, epoch)
+    if not valid.all():
+        times = times[valid]
+        values = {name: column[valid] for name, column in values.items()}
+    return times, values
+
+
+def candle_columns(df: pd.DataFrame,
+                   columns: Dict[str, Optional[str]],
+                   time_key: str = "time") -> Dict[str, np.ndarray]:
+    """
+    Velas como arrays paralelos: tiempo en segundos epoch (int64) y valores
+    float64. `columns` es nombre de salida -> columna del DataFrame (None =
+    ceros). Las filas con valores no numéricos se descartan.
+    """
+    times, values = _candle_values(df, columns, epoch=True)
+    return {time_key: times, **values}
+
+
+def serialize_candles(df: pd.DataFrame,
+                      columns: Dict[str, Optional[str]],
+                      candle_format: str = "rows",
+                      time_key: str = "time") -> Union[list, dict]:
+    """Velas en formato de filas (lista de dicts) o columnar (ver candle_columns)"""
+    if candle_format not in CANDLE_FORMATS:
+        raise ValueError(f"Formato de velas no soportado: {candle_format}")
+
+    if candle_format == "columns":
+        return {name: column.tolist() for name, column in candle_columns(df, columns, time_key).items()}
+    times, values = _candle_values(df, columns, epoch=False)
+    frame = pd.DataFrame(values)
+    frame.insert(0, time_key, times)
+    return frame.to_dict(orient="records")
+
+
+def _finite(data: Any) -> Any:
+    """Copia con NaN/inf como None, como hace orjson (los tipos no nativos pasan por json_default)"""
+    if isinstance(data, float):
+        return data if math.isfinite(data) else None
+    if isinstance(data, dict):
+        return {key: _finite(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_finite(item) for item in data]
+    if isinstance(data, (str, int, type(None))):
+        return data
+    return _finite(json_default(data))
+
+
+def _json_dumps(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=json_default,
+    ).encode("utf-8")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializar a JSON (bytes) en una sola pasada. Con y sin orjson la salida es
+    la misma: NaN/inf -> null y fechas de NumPy -> ISO 8601 (NaT -> null).
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=json_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # orjson no serializa NaT dentro de arrays datetime64: se reintenta
+            # con los arrays convertidos por json_default
+            return orjson.dumps(content, default=json_default, option=_ORJSON_FALLBACK_OPTIONS)
+    try:
+        return _json_dumps(content)
+    except ValueError:
+        # NaN/inf: segunda pasada sólo cuando aparecen
+        return _json_dumps(_finite(content))
+
+
+class JSONResponse(StarletteJSONResponse):
+    """
+    JSONResponse que serializa ObjectId, datetime, NumPy y pandas directamente
+    (con orjson si está disponible), sin limpiar los datos antes ni después.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,20 +1,24 @@
 from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse  # AGREGAR ESTA LÍNEA
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
 import asyncio
 import json
 from datetime import datetime, timedelta
 import logging
-import numpy as np
 from datetime import datetime
-import pandas as pd
 from database.user import User
 from database.enums import Signal
-from database.ai_settings import User, AnalysisConfig
+from database.ai_settings import User, AnalysisConfig, BatchAnalysisRequest
 from database.connection import get_database
+from config import settings
 from mt5.data_provider import MT5DataProvider
+from mt5.async_provider import AsyncMT5Provider
+from mt5.tick_hub import get_tick_hub
 from ai.confluence_detector import ConfluenceDetector
+from ai.analysis_scheduler import AnalysisScheduler
 from api.auth import get_current_user
+from api.serialization import JSONResponse, prepare_for_json
+from api.wire_format import encode_market_data, negotiate_subprotocol, tick_columns
 from database.enums import SignalType
 from bson import ObjectId
 from fastapi import Body
@@ -27,18 +31,23 @@ class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.user_connections: Dict[str, WebSocket] = {}
+        # Formato de los datos de mercado por usuario (subprotocolo negociado)
+        self.user_formats: Dict[str, str] = {}
     
     async def connect(self, websocket: WebSocket, user_id: str):
-        await websocket.accept()
+        subprotocol, wire_format = negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
         self.active_connections.append(websocket)
         self.user_connections[user_id] = websocket
-        logger.info(f"Usuario {user_id} conectado via WebSocket")
+        self.user_formats[user_id] = wire_format
+        logger.info(f"Usuario {user_id} conectado via WebSocket ({wire_format})")
     
     def disconnect(self, websocket: WebSocket, user_id: str):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
         if user_id in self.user_connections:
             del self.user_connections[user_id]
+        self.user_formats.pop(user_id, None)
         logger.info(f"Usuario {user_id} desconectado")
     
     async def send_personal_message(self, message: str, user_id: str):
@@ -49,6 +58,24 @@ class ConnectionManager:
             except Exception as e:
                 logger.error(f"Error enviando mensaje a {user_id}: {e}")
     
+    async def send_market_data(self, content: Dict, data_key: str, columns: Dict, user_id: str):
+        """
+        Datos de mercado en el formato negociado: con JSON, `content` como texto;
+        con binario/MessagePack, un frame binario con `content` sin `data_key`
+        como metadatos y `columns` en su lugar.
+        """
+        wire_format = self.user_formats.get(user_id, "json")
+        if wire_format == "json":
+            await self.send_personal_message(json.dumps(content), user_id)
+            return
+        websocket = self.user_connections.get(user_id)
+        if websocket:
+            meta = {key: value for key, value in content.items() if key != data_key}
+            try:
+                await websocket.send_bytes(encode_market_data(meta, columns, wire_format))
+            except Exception as e:
+                logger.error(f"Error enviando datos de mercado a {user_id}: {e}")
+    
     async def broadcast(self, message: str):
         disconnected = []
         for connection in self.active_connections:
@@ -67,7 +94,22 @@ manager = ConnectionManager()
 
 # Inicializar componentes
 mt5_provider = MT5DataProvider()
-confluence_detector = ConfluenceDetector()
+# Llamadas a MT5 fuera del event loop (hilo dedicado)
+mt5_async = AsyncMT5Provider(mt5_provider)
+# Hub de ticks compartido: un solo sondeo por símbolo para todos los usuarios
+tick_hub = get_tick_hub(mt5_async)
+confluence_detector = ConfluenceDetector(analysis_timeout=settings.analysis_timeout_seconds)
+# Planificador compartido: un análisis por (par, timeframe, config) al cerrar cada vela
+analysis_scheduler = AnalysisScheduler(
+    confluence_detector,
+    lambda pair, timeframe, count: fetch_realtime_data(pair, timeframe, count),
+    max_concurrent=settings.max_concurrent_analysis,
+    bar_close_delay=settings.realtime_bar_close_delay,
+    intrabar_throttle=settings.realtime_intrabar_throttle,
+    server_clock=lambda: mt5_async.get_server_time(),
+)
+# Tareas de reenvío de precios por WebSocket: {user_id: {pair: task}}
+price_streams: Dict[str, Dict[str, asyncio.Task]] = {}
 
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
@@ -89,11 +131,17 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     json.dumps({"error": "Formato de comando inválido"}), 
                     user_id
                 )
+            except ValueError as e:
+                await manager.send_personal_message(json.dumps({"error": str(e)}), user_id)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user_id)
         logger.info(f"WebSocket disconnected for user {user_id}")
     except Exception as e:
         logger.error(f"Error en websocket_endpoint: {e}")
+    finally:
+        # Sin socket no hay a quién enviar: parar streams y análisis del usuario
+        manager.disconnect(websocket, user_id)
+        stop_price_streams(user_id)
+        stop_realtime_analysis(user_id)
 
 async def get_recent_signals(user_id: str, pair: str = None) -> List[Dict]:
     """Obtiene señales recientes para un usuario"""
@@ -125,7 +173,11 @@ async def handle_websocket_command(command: Dict, user_id: str):
     if command_type == "subscribe_pair":
         pair = command.get("pair")
         timeframe = command.get("timeframe", "H1")
-        await subscribe_to_pair(user_id, pair, timeframe)
+        await subscribe_to_pair(
+            user_id, pair, timeframe,
+            intrabar=bool(command.get("intrabar", False)),
+            throttle=command.get("throttle")
+        )
         
     elif command_type == "unsubscribe_pair":
         pair = command.get("pair")
@@ -198,55 +250,6 @@ async def get_signals(
             }
         )
 
-# FUNCIÓN PREPARE_FOR_JSON MEJORADA
-def prepare_for_json(data):
-    """
-    Prepara datos para serialización JSON convirtiendo tipos especiales.
-    VERSIÓN MEJORADA que maneja todos los casos edge.
-    """
-    if data is None:
-        return None
-    elif isinstance(data, dict):
-        result = {}
-        for key, value in data.items():
-            # Convertir _id a id
-            if key == "_id":
-                if isinstance(value, ObjectId):
-                    result["id"] = str(value)
-                else:
-                    result["id"] = str(value)
-            else:
-                result[key] = prepare_for_json(value)
-        return result
-    elif isinstance(data, (list, tuple)):
-        return [prepare_for_json(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    elif isinstance(data, datetime):
-        return data.isoformat()
-    elif isinstance(data, pd.Timestamp):
-        return data.isoformat()
-    elif isinstance(data, (np.float32, np.float64, np.floating)):
-        return float(data)
-    elif isinstance(data, (np.int32, np.int64, np.integer)):
-        return int(data)
-    elif isinstance(data, (np.bool_)):
-        return bool(data)
-    elif hasattr(data, '__dict__'):
-        # Para objetos personalizados, convertir su __dict__
-        try:
-            return prepare_for_json(data.__dict__)
-        except:
-            return str(data)
-    else:
-        # Para cualquier otro tipo, intentar convertir a string como fallback
-        try:
-            # Verificar si es JSON serializable
-            json.dumps(data)
-            return data
-        except (TypeError, ValueError):
-            return str(data)
-
 # Modificar solo el endpoint analyze_pair en signals.py
 ALLOWED_TIMEFRAMES = {"M1","M5","M15","M30","H1","H4","D1","W1"}
 ALIASES = {
@@ -280,6 +283,30 @@ def ensure_risk_fields(config):
     class Config:
         json_encoders = {ObjectId: str}
 
+def build_signal_dict(signal, timeframe: str, config) -> Dict:
+    """Convierte la señal del ConfluenceDetector al diccionario que se guarda/envía"""
+    return {
+        "symbol": signal.symbol,
+        "timeframe": timeframe,
+        "signal_type": getattr(signal.signal_type, "value", str(signal.signal_type)),
+        "entry_price": signal.entry_price,
+        "stop_loss": signal.stop_loss,
+        "take_profit": signal.take_profit,
+        "confluence_score": signal.confluence_score,
+        # Compatibilidad con gestión de riesgo usada
+        "lot_size": getattr(config, "lot_size", None),
+        "risk_per_trade": getattr(config, "risk_per_trade", None),
+        "technical_analyses": [
+            {
+                "type": ta.type.value if hasattr(ta.type, "value") else str(ta.type),
+                "confidence": ta.confidence,
+                "data": prepare_for_json(ta.data),
+                "description": ta.description,
+            }
+            for ta in (signal.technical_analyses or [])
+        ] if getattr(signal, "technical_analyses", None) else [],
+    }
+
 @router.post("/signals/analyze/{pair}")
 async def analyze_pair(
     pair: str,
@@ -307,16 +334,34 @@ async def analyze_pair(
         )
 
         # Conectar con MT5
-        if not mt5_provider.connect():
+        if not await mt5_async.connect():
             raise HTTPException(status_code=503, detail="Error conectando con MT5")
 
-        # Cargar datos con el timeframe efectivo
-        data = mt5_provider.get_realtime_data(pair, effective_timeframe, 500)
-        if data is None or data.empty:
-            raise HTTPException(status_code=404, detail=f"No se pudieron obtener datos para {pair}")
+        if config.combined_timeframes:
+            # Multi-timeframe: se descarga la temporalidad base y el resto se agrega en memoria,
+            # salvo las que el límite de velas base dejaría cortas, que se descargan aparte
+            multi_timeframe = confluence_detector.multi_timeframe
+            base_timeframe, timeframes, bars = multi_timeframe.plan(effective_timeframe, config, 500)
+            data = await mt5_async.get_realtime_data(pair, base_timeframe, bars)
+            if data is None or data.empty:
+                raise HTTPException(status_code=404, detail=f"No se pudieron obtener datos para {pair}")
+            native = {
+                tf: await mt5_async.get_realtime_data(pair, tf, 500)
+                for tf in multi_timeframe.native_timeframes(base_timeframe, timeframes, 500)
+            }
 
-        # Analizar con ConfluenceDetector usando el timeframe efectivo
-        signal = await confluence_detector.analyze_symbol(pair, data, effective_timeframe, config)
+            logger.info(f"Multi-timeframe {pair}: {', '.join(timeframes)} desde {len(data)} velas {base_timeframe}")
+            signal = await confluence_detector.analyze_multi_timeframe(
+                pair, data, base_timeframe, effective_timeframe, config, native=native
+            )
+        else:
+            # Cargar datos con el timeframe efectivo
+            data = await mt5_async.get_realtime_data(pair, effective_timeframe, 500)
+            if data is None or data.empty:
+                raise HTTPException(status_code=404, detail=f"No se pudieron obtener datos para {pair}")
+
+            # Analizar con ConfluenceDetector usando el timeframe efectivo
+            signal = await confluence_detector.analyze_symbol(pair, data, effective_timeframe, config)
 
         saved_signals = []
         collection = db.trading_signals
@@ -327,27 +372,7 @@ async def analyze_pair(
 
         if signal:
             # Convertir señal a diccionario
-            signal_dict = {
-                "symbol": signal.symbol,
-                "timeframe": effective_timeframe,
-                "signal_type": getattr(signal.signal_type, "value", str(signal.signal_type)),
-                "entry_price": signal.entry_price,
-                "stop_loss": signal.stop_loss,
-                "take_profit": signal.take_profit,
-                "confluence_score": signal.confluence_score,
-                # Compatibilidad con gestión de riesgo usada
-                "lot_size": getattr(config, "lot_size", None),
-                "risk_per_trade": getattr(config, "risk_per_trade", None),
-                "technical_analyses": [
-                    {
-                        "type": ta.type.value if hasattr(ta.type, "value") else str(ta.type),
-                        "confidence": ta.confidence,
-                        "data": prepare_for_json(ta.data),
-                        "description": ta.description,
-                    }
-                    for ta in (signal.technical_analyses or [])
-                ] if getattr(signal, "technical_analyses", None) else [],
-            }
+            signal_dict = build_signal_dict(signal, effective_timeframe, config)
 
             # Documento para MongoDB
             signal_doc = {
@@ -404,14 +429,109 @@ async def analyze_pair(
                 "timestamp": datetime.utcnow().isoformat(),
             },
         )
+
+@router.post("/signals/analyze-batch/")
+async def analyze_batch(
+    request: BatchAnalysisRequest = Body(...),
+    current_user=Depends(get_current_user),
+    db=Depends(get_database),
+):
+    """
+    Analiza varios pares/temporalidades con una misma configuración.
+    Sin `items` analiza todos los pares de MT5 en `timeframes` (por defecto config.timeframe).
+    Las velas se descargan en una sola llamada a MT5 y los resultados se envían
+    como NDJSON (una línea por par) a medida que cada análisis termina.
+    """
+    config = ensure_risk_fields(request.config or AnalysisConfig())
+    default_timeframe = getattr(config, "timeframe", None) or "H1"
+
+    if not await mt5_async.ensure_connected():
+        raise HTTPException(status_code=503, detail="Error conectando con MT5")
+
+    if request.items:
+        items = [(item.pair, validate_timeframe(item.timeframe or default_timeframe)) for item in request.items]
+    else:
+        timeframes = [validate_timeframe(tf) for tf in (request.timeframes or [default_timeframe])]
+        pairs = await mt5_async.get_available_pairs()
+        items = [(pair["symbol"], tf) for pair in pairs for tf in timeframes]
+    # Sin duplicados, conservando el orden
+    items = list(dict.fromkeys(items))
+
+    candles = await mt5_async.get_candles_batch(items, request.bars)
+    semaphore = asyncio.Semaphore(settings.max_concurrent_analysis)
+
+    async def analyze_item(pair: str, timeframe: str) -> Dict:
+        try:
+            pair_candles = candles.get((pair, timeframe))
+            if pair_candles is None or len(pair_candles) == 0:
+                return {"type": "error", "pair": pair, "timeframe": timeframe,
+                        "detail": f"No se pudieron obtener datos para {pair}"}
+
+            async with semaphore:
+                signal = await confluence_detector.analyze_symbol(
+                    pair, pair_candles.to_frame(), timeframe, config
+                )
+
+            config_out = config.dict()
+            config_out["timeframe"] = timeframe
+            saved_signals = []
+            if signal:
+                signal_doc = {
+                    **build_signal_dict(signal, timeframe, config),
+                    "timestamp": datetime.utcnow(),
+                    "status": "ACTIVE",
+                    "config_used": config_out,
+                }
+                if request.save_signals:
+                    signal_doc["user_id"] = current_user.id
+                    result = await db.trading_signals.insert_one(signal_doc)
+                    signal_doc["_id"] = result.inserted_id
+                saved_signals.append(prepare_for_json(signal_doc))
+
+            return {
+                "type": "result",
+                "pair": pair,
+                "timeframe": timeframe,
+                "signals": saved_signals,
+                "analysis_time": datetime.utcnow().isoformat(),
+            }
+        except Exception as e:
+            logger.error(f"Error analizando {pair} {timeframe} en lote: {e}")
+            return {"type": "error", "pair": pair, "timeframe": timeframe, "detail": str(e)}
+
+    async def stream_results():
+        started = datetime.utcnow()
+        yield json.dumps({"type": "start", "total": len(items), "timestamp": started.isoformat()}) + "\n"
+
+        tasks = [asyncio.create_task(analyze_item(pair, tf)) for pair, tf in items]
+        signals_found = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                signals_found += len(result.get("signals", []))
+                yield json.dumps(result) + "\n"
+        finally:
+            # El cliente cortó la conexión: no seguir analizando
+            for task in tasks:
+                task.cancel()
+
+        yield json.dumps({
+            "type": "done",
+            "total": len(items),
+            "signals": signals_found,
+            "elapsed_seconds": round((datetime.utcnow() - started).total_seconds(), 3),
+        }) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @router.get("/signals/pairs/")
 async def get_available_pairs(current_user: User = Depends(get_current_user)):
     """Obtiene los pares disponibles en MT5"""
     try:
-        if not mt5_provider.connect():
+        if not await mt5_async.connect():
             raise HTTPException(status_code=503, detail="Error conectando con MT5")
         
-        pairs = mt5_provider.get_available_pairs()
+        pairs = await mt5_async.get_available_pairs()
         
         # Usar JSONResponse para consistencia
         return JSONResponse(content={"pairs": pairs})
@@ -427,6 +547,15 @@ async def get_available_pairs(current_user: User = Depends(get_current_user)):
             }
         )
 
+@router.get("/signals/cache/stats")
+async def get_analysis_cache_stats(current_user: User = Depends(get_current_user)):
+    """Estadísticas de la caché de análisis y del planificador en tiempo real"""
+    return JSONResponse(content={
+        "cache": confluence_detector.cache.get_stats() if confluence_detector.cache else None,
+        "scheduler": analysis_scheduler.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
 @router.post("/signals/settings/")
 async def update_signal_settings(
     settings: Dict,
@@ -513,73 +642,81 @@ async def delete_signal(
 
 # Funciones auxiliares para análisis en tiempo real
 async def start_realtime_analysis(user_id: str):
-    """Inicia el análisis en tiempo real para un usuario"""
-    asyncio.create_task(realtime_analysis_loop(user_id))
-
-async def realtime_analysis_loop(user_id: str):
-    """Loop principal de análisis en tiempo real"""
+    """Registra los pares monitoreados del usuario en el planificador compartido"""
     try:
         db = await get_database()
+        user_settings = await get_user_settings(user_id, db)
         
-        while user_id in manager.user_connections:
-            # Obtener configuración del usuario
-            user_settings = await get_user_settings(user_id, db)
-            
-            if user_settings and user_settings.get("pairs_to_monitor"):
-                for pair_config in user_settings["pairs_to_monitor"]:
-                    pair = pair_config.get("pair")
-                    timeframe = pair_config.get("timeframe", "H1")
-                    
+        if user_settings and user_settings.get("pairs_to_monitor"):
+            for pair_config in user_settings["pairs_to_monitor"]:
+                pair = pair_config.get("pair")
+                timeframe = pair_config.get("timeframe", "H1")
+                if pair:
                     try:
-                        await analyze_pair_realtime(user_id, pair, timeframe, db)
-                    except Exception as e:
-                        logger.error(f"Error analizando par en tiempo real {pair}: {e}")
-            
-            await asyncio.sleep(30)  # Espera antes de siguiente análisis
-            
+                        await subscribe_realtime_analysis(
+                            user_id, pair, timeframe, db,
+                            intrabar=bool(pair_config.get("intrabar", False)),
+                            throttle=pair_config.get("throttle")
+                        )
+                    except ValueError as e:
+                        logger.warning(f"Suscripción de {user_id} a {pair} ignorada: {e}")
+                    
     except Exception as e:
-        logger.error(f"Error en realtime_analysis_loop: {e}")
+        logger.error(f"Error iniciando análisis en tiempo real para {user_id}: {e}")
 
-async def analyze_pair_realtime(user_id: str, pair: str, timeframe: str, db):
-    """Analiza un par en tiempo real y envía señales por WebSocket"""
-    if not mt5_provider.connect():
-        logger.error("MT5 no conectado para análisis en tiempo real")
-        return
-    
-    data = mt5_provider.get_realtime_data(pair, timeframe, 200)
-    if data is None or data.empty:
-        logger.warning(f"No se pudieron obtener datos para {pair} en tiempo real")
-        return
-    
-    signals = confluence_detector.detect_confluence_signals(data, timeframe)
+def stop_realtime_analysis(user_id: str):
+    """Quita todas las suscripciones de análisis del usuario"""
+    analysis_scheduler.unsubscribe(user_id)
+
+async def subscribe_realtime_analysis(user_id: str, pair: str, timeframe: str, db=None,
+                                      intrabar: bool = False, throttle: Optional[float] = None):
+    """
+    Suscribe al usuario al análisis compartido de un par (uno por par/timeframe/config).
+    Por defecto se analiza al cierre de cada vela; `intrabar` re-analiza la vela en
+    formación cada `throttle` segundos.
+    """
+    if db is None:
+        db = await get_database()
+    config = await get_user_analysis_config(user_id, timeframe, db)
+    analysis_scheduler.subscribe(user_id, pair, config.timeframe, config, send_realtime_signal,
+                                 intrabar=intrabar, throttle=throttle)
+
+async def get_user_analysis_config(user_id: str, timeframe: str, db) -> AnalysisConfig:
+    """Config de análisis del usuario (ai_settings guardados) con el timeframe indicado"""
+    try:
+        settings_doc = await db.ai_settings.find_one({"user_id": user_id})
+        fields = {k: v for k, v in (settings_doc or {}).items() if k in AnalysisConfig.model_fields}
+        config = AnalysisConfig(**fields)
+    except Exception as e:
+        logger.warning(f"Config de IA inválida para {user_id}, usando valores por defecto: {e}")
+        config = AnalysisConfig()
     
-    if not signals:
+    config = ensure_risk_fields(config)
+    config.timeframe = normalize_timeframe(timeframe)
+    return config
+
+async def fetch_realtime_data(pair: str, timeframe: str, count: int):
+    """Descarga de velas para el planificador (conecta si hace falta)"""
+    if not await mt5_async.ensure_connected():
+        logger.error("MT5 no conectado para análisis en tiempo real")
+        return None
+    return await mt5_async.get_realtime_data(pair, timeframe, count)
+
+async def send_realtime_signal(user_id: str, pair: str, timeframe: str, config, signal):
+    """Guarda la señal del análisis compartido para un suscriptor y la envía por WebSocket"""
+    if not signal:
         return
     
-    collection = db.trading_signals
-    
-    saved_signals = []
-    for signal in signals:
-        signal_doc = {
-            "user_id": user_id,
-            "pair": pair,
-            "timeframe": timeframe,
-            "signal_type": signal.signal_type,
-            "direction": signal.direction,
-            "confidence": signal.confidence,
-            "entry_price": signal.entry_price,
-            "stop_loss": signal.stop_loss,
-            "take_profit": signal.take_profit,
-            "confluences": [conf.to_dict() for conf in signal.confluences],
-            "timestamp": datetime.utcnow(),
-            "status": "ACTIVE"
-        }
-        result = await collection.insert_one(signal_doc)
-        signal_doc["_id"] = result.inserted_id
-        
-        # Limpiar ObjectId antes de enviar por WebSocket
-        cleaned_signal = prepare_for_json(signal_doc)
-        saved_signals.append(cleaned_signal)
+    db = await get_database()
+    signal_doc = {
+        "user_id": user_id,
+        "pair": pair,
+        **build_signal_dict(signal, timeframe, config),
+        "timestamp": datetime.utcnow(),
+        "status": "ACTIVE"
+    }
+    result = await db.trading_signals.insert_one(signal_doc)
+    signal_doc["_id"] = result.inserted_id
     
     # Enviar por WebSocket
     try:
@@ -587,7 +724,7 @@ async def analyze_pair_realtime(user_id: str, pair: str, timeframe: str, db):
             json.dumps({
                 "type": "new_realtime_signals",
                 "pair": pair,
-                "signals": saved_signals
+                "signals": [prepare_for_json(signal_doc)]
             }),
             user_id
         )
@@ -604,11 +741,48 @@ async def get_user_settings(user_id: str, db):
         logger.error(f"Error obteniendo configuración de usuario {user_id}: {e}")
         return None
 
-async def subscribe_to_pair(user_id: str, pair: str, timeframe: str):
-    """Suscribe al usuario a un par y timeframe"""
-    # Aquí podrías guardar la suscripción en la DB o en memoria
+async def subscribe_to_pair(user_id: str, pair: str, timeframe: str,
+                            intrabar: bool = False, throttle: Optional[float] = None):
+    """Suscribe al usuario a un par y timeframe (ValueError si el throttle no es válido)"""
+    if intrabar:
+        throttle = analysis_scheduler.intrabar_throttle_for(throttle)
+    if not await mt5_async.ensure_connected():
+        logger.error("MT5 no conectado para suscripción de precios")
+        return
+    
+    streams = price_streams.setdefault(user_id, {})
+    if pair not in streams or streams[pair].done():
+        streams[pair] = asyncio.create_task(forward_price_updates(user_id, pair))
+    await subscribe_realtime_analysis(user_id, pair, timeframe, intrabar=intrabar, throttle=throttle)
     logger.info(f"Usuario {user_id} suscrito a {pair} {timeframe}")
 
 async def unsubscribe_from_pair(user_id: str, pair: str):
     """Desuscribe al usuario de un par"""
-    logger.info(f"Usuario {user_id} desuscrito de {pair}")
\ No newline at end of file
+    task = price_streams.get(user_id, {}).pop(pair, None)
+    if task:
+        task.cancel()
+    analysis_scheduler.unsubscribe(user_id, pair)
+    logger.info(f"Usuario {user_id} desuscrito de {pair}")
+
+def stop_price_streams(user_id: str):
+    """Cancela todos los streams de precios de un usuario"""
+    for task in price_streams.pop(user_id, {}).values():
+        task.cancel()
+
+async def forward_price_updates(user_id: str, pair: str):
+    """Reenvía por WebSocket los cambios de precio de un par (vía TickHub)"""
+    subscription = tick_hub.subscribe([pair])
+    try:
+        async for prices in subscription:
+            await manager.send_market_data(
+                {
+                    "type": "price_update",
+                    "pair": pair,
+                    "price": prepare_for_json(prices[pair])
+                },
+                "price",
+                tick_columns(prices[pair]),
+                user_id
+            )
+    finally:
+        subscription.close()
\ No newline at end of file
@@ -0,0 +1,212 @@
+import json
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from fastapi.responses import Response
+
+from api.serialization import dumps, json_default
+
+# MessagePack opcional: sin el paquete sólo se negocian JSON y binario
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Formatos de transporte para datos de mercado (velas y ticks).
+#
+# JSON es el formato por defecto. Los clientes pueden pedir uno binario con la
+# cabecera Accept (HTTP) o con un subprotocolo WebSocket:
+#
+#     binary   application/vnd.market-data      market-data.binary.v1
+#     msgpack  application/msgpack              market-data.msgpack.v1   (si msgpack está instalado)
+#
+# Trama binaria (todo little-endian):
+#
+#     0   4  magic b"MKD1"
+#     4   4  uint32, longitud N de la cabecera
+#     8   N  cabecera JSON UTF-8, rellenada con espacios hasta múltiplo de 8:
+#            {"meta": {...}, "columns": [{"name", "dtype", "length"}, ...]}
+#            o, si las columnas siguen un esquema fijo (SCHEMAS),
+#            {"meta": {...}, "schema": "tick.v1", "length": n}
+#     8+N    columnas en el orden de la cabecera, cada una rellenada hasta
+#            múltiplo de 8 bytes (dtype "<f8", "<i8"...)
+#
+# Cada columna empieza en un offset múltiplo de 8: en el navegador se lee sin
+# copiar con new Float64Array(buffer, offset, length) / BigInt64Array.
+#
+# En MessagePack el mensaje es un mapa {...meta, "columns": {nombre: lista}}.
+
+JSON_MEDIA_TYPE = "application/json"
+BINARY_MEDIA_TYPE = "application/vnd.market-data"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+BINARY_SUBPROTOCOL = "market-data.binary.v1"
+MSGPACK_SUBPROTOCOL = "market-data.msgpack.v1"
+JSON_SUBPROTOCOL = "market-data.json.v1"
+
+MAGIC = b"MKD1"
+_PREFIX = struct.Struct("<4sI")
+_ALIGNMENT = 8
+
+# Esquemas fijos (nombre, dtype): en mensajes pequeños y frecuentes, como los
+# ticks, la cabecera sólo nombra el esquema en vez de describir cada columna
+SCHEMAS = {
+    "tick.v1": (
+        ("time", "<i8"), ("bid", "<f8"), ("ask", "<f8"),
+        ("last", "<f8"), ("volume", "<f8"), ("spread", "<f8"),
+    ),
+}
+_SCHEMA_NAMES = {layout: name for name, layout in SCHEMAS.items()}
+
+# Tipos de medio / subprotocolos aceptados -> formato
+_MEDIA_TYPES = {
+    JSON_MEDIA_TYPE: "json",
+    BINARY_MEDIA_TYPE: "binary",
+    MSGPACK_MEDIA_TYPE: "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+_SUBPROTOCOLS = {
+    JSON_SUBPROTOCOL: "json",
+    BINARY_SUBPROTOCOL: "binary",
+    MSGPACK_SUBPROTOCOL: "msgpack",
+}
+_FORMAT_MEDIA_TYPES = {
+    "json": JSON_MEDIA_TYPE,
+    "binary": BINARY_MEDIA_TYPE,
+    "msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+
+def available_formats() -> Tuple[str, ...]:
+    return ("json", "binary", "msgpack") if msgpack is not None else ("json", "binary")
+
+
+# ========== NEGOCIACIÓN ==========
+
+def negotiate(accept: Optional[str]) -> str:
+    """Formato a usar según la cabecera Accept (mayor q; a igual q, el primero). JSON por defecto"""
+    if not accept:
+        return "json"
+    formats = available_formats()
+    best, best_quality = "json", 0.0
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        wire_format = _MEDIA_TYPES.get(media_type.lower())
+        if wire_format not in formats:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = wire_format, quality
+    return best
+
+
+def negotiate_subprotocol(offered: Iterable[str]) -> Tuple[Optional[str], str]:
+    """(subprotocolo aceptado, formato) según la preferencia del cliente; sin coincidencia, (None, 'json')"""
+    formats = available_formats()
+    for subprotocol in offered:
+        wire_format = _SUBPROTOCOLS.get(subprotocol)
+        if wire_format in formats:
+            return subprotocol, wire_format
+    return None, "json"
+
+
+# ========== CODIFICACIÓN ==========
+
+def _padding(size: int) -> int:
+    return -size % _ALIGNMENT
+
+
+def encode_arrays(meta: Dict, columns: Dict[str, np.ndarray]) -> bytes:
+    """Trama binaria con metadatos JSON y columnas como arrays tipados little-endian"""
+    arrays = []
+    descriptors = []
+    for name, values in columns.items():
+        array = np.asarray(values)
+        if array.dtype.kind not in "biuf":
+            raise TypeError(f"Columna no numérica: {name} ({array.dtype})")
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        arrays.append(array)
+        descriptors.append({"name": name, "dtype": array.dtype.str, "length": len(array)})
+
+    schema = _SCHEMA_NAMES.get(tuple((item["name"], item["dtype"]) for item in descriptors))
+    if schema and len({item["length"] for item in descriptors}) == 1:
+        header = dumps({"meta": meta, "schema": schema, "length": descriptors[0]["length"]})
+    else:
+        header = dumps({"meta": meta, "columns": descriptors})
+    header += b" " * _padding(_PREFIX.size + len(header))
+
+    parts: List[bytes] = [_PREFIX.pack(MAGIC, len(header)), header]
+    for array in arrays:
+        data = array.tobytes()
+        parts.append(data)
+        parts.append(b"\0" * _padding(len(data)))
+    return b"".join(parts)
+
+
+def decode_arrays(payload: bytes) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """Inverso de encode_arrays: (meta, columnas como vistas sobre el payload)"""
+    magic, header_size = _PREFIX.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Trama binaria no reconocida")
+    offset = _PREFIX.size
+    header = json.loads(payload[offset:offset + header_size])
+    offset += header_size
+
+    descriptors = header.get("columns")
+    if descriptors is None:
+        descriptors = [
+            {"name": name, "dtype": dtype, "length": header["length"]}
+            for name, dtype in SCHEMAS[header["schema"]]
+        ]
+
+    columns = {}
+    for descriptor in descriptors:
+        dtype = np.dtype(descriptor["dtype"])
+        columns[descriptor["name"]] = np.frombuffer(payload, dtype=dtype, count=descriptor["length"], offset=offset)
+        size = dtype.itemsize * descriptor["length"]
+        offset += size + _padding(size)
+    return header["meta"], columns
+
+
+def encode_market_data(meta: Dict, columns: Dict[str, np.ndarray], wire_format: str) -> bytes:
+    """Codificar metadatos + columnas en el formato indicado ('json', 'binary' o 'msgpack')"""
+    if wire_format == "binary":
+        return encode_arrays(meta, columns)
+    content = {**meta, "columns": {name: np.asarray(values).tolist() for name, values in columns.items()}}
+    if wire_format == "msgpack":
+        if msgpack is None:
+            raise ValueError("MessagePack no está disponible")
+        return msgpack.packb(content, default=json_default, use_bin_type=True)
+    return dumps(content)
+
+
+def market_data_response(meta: Dict, columns: Dict[str, np.ndarray], wire_format: str,
+                         status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Respuesta HTTP con los datos codificados y su tipo de medio"""
+    return Response(
+        content=encode_market_data(meta, columns, wire_format),
+        status_code=status_code,
+        media_type=_FORMAT_MEDIA_TYPES[wire_format],
+        headers={**(headers or {}), "Vary": "Accept"},
+    )
+
+
+def tick_columns(price: Dict) -> Dict[str, np.ndarray]:
+    """Un tick (dict de get_current_price) como columnas de longitud 1; time en segundos epoch"""
+    time = price.get("time")
+    timestamp = time.timestamp() if hasattr(time, "timestamp") else (time or 0)
+    return {
+        "time": np.array([int(timestamp)], dtype=np.int64),
+        **{
+            field: np.array([float(price.get(field) or 0.0)])
+            for field in ("bid", "ask", "last", "volume", "spread")
+        },
+    }
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pipeline de análisis (MT5DataProvider -> ConfluenceDetector) sobre
+el backend de replay, sin terminal MetaTrader 5.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_pipeline --symbols EURUSD GBPUSD --steps 200 --step-seconds 60
+    python -m benchmarks.bench_pipeline --replay-path ../signals --symbols EURUSD
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from mt5.backends import ReplayBackend
+from mt5.bar_cache import BarCache
+from mt5.data_provider import MT5DataProvider
+from ai.confluence_detector import ConfluenceDetector
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _report(name, latencies, elapsed):
+    ms = [value * 1000 for value in latencies]
+    print(f"{name:<10} n={len(ms):<6} "
+          f"mean={statistics.mean(ms):8.3f}ms  p50={_percentile(ms, 50):8.3f}ms  "
+          f"p95={_percentile(ms, 95):8.3f}ms  p99={_percentile(ms, 99):8.3f}ms  "
+          f"throughput={len(ms) / elapsed:9.1f}/s")
+
+
+async def run(args):
+    backend = ReplayBackend(seed=args.seed)
+    if args.replay_path:
+        backend.load_json(args.replay_path, symbol=args.symbols[0], timeframe=args.timeframe)
+
+    provider = MT5DataProvider(bar_cache=BarCache(), backend=backend)
+    if not provider.connect():
+        raise SystemExit("No se pudo inicializar el backend de replay")
+
+    detector = ConfluenceDetector()
+    fetch_latencies, analysis_latencies = [], []
+    signals = 0
+
+    started = time.perf_counter()
+    for _ in range(args.steps):
+        for symbol in args.symbols:
+            t0 = time.perf_counter()
+            df = provider.get_realtime_data(symbol, args.timeframe, args.bars)
+            t1 = time.perf_counter()
+            fetch_latencies.append(t1 - t0)
+            if df is None or df.empty:
+                continue
+
+            signal = await detector.analyze_symbol(symbol, df, args.timeframe)
+            analysis_latencies.append(time.perf_counter() - t1)
+            signals += signal is not None
+        backend.advance(args.step_seconds)
+    elapsed = time.perf_counter() - started
+
+    print(f"Pipeline: {len(args.symbols)} símbolos x {args.steps} pasos, "
+          f"{args.bars} velas {args.timeframe}, {signals} señales, {elapsed:.2f}s")
+    _report("fetch", fetch_latencies, elapsed)
+    if analysis_latencies:
+        _report("analysis", analysis_latencies, elapsed)
+    print(f"bar cache: {provider.bar_cache.get_stats()}")
+    provider.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de análisis sobre replay")
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD", "GBPUSD", "USDJPY"])
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--bars", type=int, default=500)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--step-seconds", type=int, default=60,
+                        help="Segundos de mercado que avanza el reloj por paso")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--replay-path", help="JSON grabado (archivo o directorio)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la limpieza de documentos para JSON: prepare_for_json compartido
+(api.serialization, conversor por clase) frente a la versión original copiada en
+los routers, que encadenaba isinstance y probaba json.dumps en cada hoja.
+
+Los documentos son señales reales: el ConfluenceDetector analiza velas del
+backend de replay y cada señal se guarda con la forma de /signals/analyze
+(ObjectId, fechas, config usada y datos de cada análisis técnico).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --symbols EURUSD --bars 1500 --repeat 10
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+from ai.confluence_detector import ConfluenceDetector
+from api.serialization import dumps, prepare_for_json
+from database.ai_settings import AnalysisConfig
+from mt5.backends import ReplayBackend
+from mt5.bar_cache import BarCache
+from mt5.data_provider import MT5DataProvider
+
+
+# ========== IMPLEMENTACIÓN ORIGINAL (referencia) ==========
+
+def legacy_prepare_for_json(data):
+    if data is None:
+        return None
+    elif isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            if key == "_id":
+                if isinstance(value, ObjectId):
+                    result["id"] = str(value)
+                else:
+                    result["id"] = str(value)
+            else:
+                result[key] = legacy_prepare_for_json(value)
+        return result
+    elif isinstance(data, (list, tuple)):
+        return [legacy_prepare_for_json(item) for item in data]
+    elif isinstance(data, ObjectId):
+        return str(data)
+    elif isinstance(data, datetime):
+        return data.isoformat()
+    elif isinstance(data, pd.Timestamp):
+        return data.isoformat()
+    elif isinstance(data, (np.float32, np.float64, np.floating)):
+        return float(data)
+    elif isinstance(data, (np.int32, np.int64, np.integer)):
+        return int(data)
+    elif isinstance(data, (np.bool_)):
+        return bool(data)
+    elif hasattr(data, '__dict__'):
+        try:
+            return legacy_prepare_for_json(data.__dict__)
+        except Exception:
+            return str(data)
+    else:
+        try:
+            json.dumps(data)
+            return data
+        except (TypeError, ValueError):
+            return str(data)
+
+
+# ========== DOCUMENTOS ==========
+
+async def build_signal_documents(symbols, timeframe, bars, window, step, seed):
+    """Señales del detector con la forma del documento guardado en trading_signals"""
+    config = AnalysisConfig(confluence_threshold=0.1)
+    # En modo JSON: la versión original convertía los Enum de la config en su
+    # __dict__ interno, y la comparación de resultados fallaría por eso
+    config_used = config.model_dump(mode="json")
+    user_id = ObjectId()
+    documents = []
+
+    for symbol in symbols:
+        backend = ReplayBackend(seed=seed)
+        provider = MT5DataProvider(bar_cache=BarCache(), backend=backend)
+        if not provider.connect():
+            raise SystemExit("No se pudo inicializar el backend de replay")
+        history = provider.get_realtime_data(symbol, timeframe, bars)
+        detector = ConfluenceDetector(cache=None)
+
+        for end in range(window, len(history) + 1, step):
+            signal = await detector.analyze_symbol(symbol, history.iloc[end - window:end], timeframe, config)
+            if signal is None:
+                continue
+            documents.append({
+                "_id": ObjectId(),
+                "user_id": user_id,
+                "symbol": signal.symbol,
+                "timeframe": timeframe,
+                "signal_type": signal.signal_type.value,
+                "entry_price": signal.entry_price,
+                "stop_loss": signal.stop_loss,
+                "take_profit": signal.take_profit,
+                "confluence_score": signal.confluence_score,
+                "technical_analyses": [
+                    {
+                        "type": ta.type.value,
+                        "confidence": ta.confidence,
+                        "data": ta.data,
+                        "description": ta.description,
+                    }
+                    for ta in signal.technical_analyses
+                ],
+                "timestamp": datetime.utcnow(),
+                "status": "ACTIVE",
+                "config_used": config_used,
+            })
+        provider.disconnect()
+    return documents
+
+
+def with_arrays(documents, length=300, seed=0):
+    """
+    Los mismos documentos con series de indicadores (NumPy/pandas) adjuntas. La
+    versión original no convierte arrays, así que recibe las series ya pasadas a
+    listas de escalares, como tenían que hacerlo los llamadores.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01", periods=length, freq="h")
+    fast, legacy = [], []
+    for document in documents:
+        close = pd.Series(1.1 + rng.standard_normal(length).cumsum() * 1e-3, index=index)
+        indicators = {
+            "close": close,
+            "rsi": (50 + rng.standard_normal(length) * 10).astype(np.float32),
+            "volume": rng.integers(100, 1000, length),
+            "time": index,
+        }
+        fast.append({**document, "indicators": indicators})
+        legacy.append({**document, "indicators": {key: list(value) for key, value in indicators.items()}})
+    return fast, legacy
+
+
+# ========== BENCHMARK ==========
+
+def _time(fn, documents, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = [fn(document) for document in documents]
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de prepare_for_json")
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD", "GBPUSD", "USDJPY"])
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--bars", type=int, default=1500)
+    parser.add_argument("--window", type=int, default=300)
+    parser.add_argument("--step", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    documents = asyncio.run(build_signal_documents(
+        args.symbols, args.timeframe, args.bars, args.window, args.step, args.seed
+    ))
+    if not documents:
+        raise SystemExit("El detector no generó señales con estos parámetros")
+    array_documents, legacy_array_documents = with_arrays(documents)
+
+    cases = [
+        ("señales", documents, documents),
+        ("señales+arrays", array_documents, legacy_array_documents),
+    ]
+    print(f"{len(documents)} documentos de señal\n")
+    print(f"{'caso':<16} {'KB JSON':>9} {'original':>12} {'compartido':>12} {'speedup':>9}  resultado")
+    for name, fast_input, legacy_input in cases:
+        legacy_time, expected = _time(legacy_prepare_for_json, legacy_input, args.repeat)
+        fast_time, actual = _time(prepare_for_json, fast_input, args.repeat)
+        size = sum(len(dumps(document)) for document in actual) / 1024
+        status = "idéntico" if dumps(expected) == dumps(actual) else "DIFERENTE"
+        print(f"{name:<16} {size:>9.0f} {legacy_time * 1000:>10.2f}ms {fast_time * 1000:>10.2f}ms "
+              f"{legacy_time / fast_time:>8.1f}x  {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark del análisis de soportes y resistencias: motor vectorizado
+(ai.support_resistance) frente al cálculo original por nivel, que recorría el
+DataFrame completo varias veces por cada extremo local.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_support_resistance
+    python -m benchmarks.bench_support_resistance --sizes 500 5000 --repeat 5
+    python -m benchmarks.bench_support_resistance --legacy-max-bars 5000
+
+El cálculo original a 50.000 velas tarda decenas de segundos.
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.signal import argrelextrema
+
+from ai.support_resistance import SupportResistanceEngine
+
+
+# ========== IMPLEMENTACIÓN ORIGINAL (referencia) ==========
+
+def _count_touches(df, price, tolerance=0.001):
+    price_range = (price * (1 - tolerance), price * (1 + tolerance))
+    high_touches = ((df['High'] >= price_range[0]) & (df['High'] <= price_range[1])).sum()
+    low_touches = ((df['Low'] >= price_range[0]) & (df['Low'] <= price_range[1])).sum()
+    return int(max(high_touches, low_touches))
+
+
+def _volume_strength(df, price, tolerance=0.002):
+    price_range = (price * (1 - tolerance), price * (1 + tolerance))
+    touches_mask = (
+        ((df['High'] >= price_range[0]) & (df['High'] <= price_range[1])) |
+        ((df['Low'] >= price_range[0]) & (df['Low'] <= price_range[1]))
+    )
+    if not touches_mask.any() or 'Volume' not in df.columns:
+        return 0.0
+    touch_volume = df.loc[touches_mask, 'Volume'].mean()
+    avg_volume = df['Volume'].mean()
+    if avg_volume > 0:
+        volume_ratio = touch_volume / avg_volume
+        return min(volume_ratio - 1.0, 1.0) if volume_ratio > 1.0 else 0.0
+    return 0.0
+
+
+def _age_factor(df, price, tolerance=0.001):
+    price_range = (price * (1 - tolerance), price * (1 + tolerance))
+    touches_mask = (
+        ((df['High'] >= price_range[0]) & (df['High'] <= price_range[1])) |
+        ((df['Low'] >= price_range[0]) & (df['Low'] <= price_range[1]))
+    )
+    if not touches_mask.any():
+        return 0.0
+    touch_indices = df.index[touches_mask]
+    age_periods = df.index.get_loc(touch_indices[-1]) - df.index.get_loc(touch_indices[0])
+    max_age = len(df) * 0.5
+    return min(age_periods / max_age, 1.0) if max_age > 0 else 0.0
+
+
+def _level_strength(df, price):
+    base_strength = min(_count_touches(df, price) / 3.0, 1.0)
+    volume_factor = min(_volume_strength(df, price), 0.3)
+    age_bonus = min(_age_factor(df, price), 0.2)
+    return min(base_strength + volume_factor + age_bonus, 1.0)
+
+
+def legacy_support_resistance(df):
+    levels = []
+    highs = argrelextrema(df['High'].values, np.greater, order=5)[0]
+    lows = argrelextrema(df['Low'].values, np.less, order=5)[0]
+    for idx in highs:
+        price = float(df['High'].iloc[idx])
+        strength = _level_strength(df, price)
+        if strength > 0.3:
+            levels.append({'price': price, 'type': 'resistance', 'strength': strength,
+                           'touches': _count_touches(df, price)})
+    for idx in lows:
+        price = float(df['Low'].iloc[idx])
+        strength = _level_strength(df, price)
+        if strength > 0.3:
+            levels.append({'price': price, 'type': 'support', 'strength': strength,
+                           'touches': _count_touches(df, price)})
+    if not levels:
+        return None
+    avg_strength = sum(level['strength'] for level in levels) / len(levels)
+    return {
+        'levels': levels,
+        'confidence': min(avg_strength * 1.2, 1.0),
+        'description': f"Identificados {len(levels)} niveles de S/R"
+    }
+
+
+# ========== BENCHMARK ==========
+
+def make_bars(count, seed):
+    """Velas H1 sintéticas (random walk, precios a 5 decimales y tick volume)"""
+    rng = np.random.default_rng(seed)
+    close = 1.10 + np.cumsum(rng.normal(0, 0.0008, count))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.round(np.maximum(open_, close) + np.abs(rng.normal(0, 0.0006, count)), 5)
+    low = np.round(np.minimum(open_, close) - np.abs(rng.normal(0, 0.0006, count)), 5)
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Volume': rng.integers(50, 5000, count),
+    }, index=pd.date_range('2020-01-01', periods=count, freq='h', name='time'))
+
+
+def _time(fn, df, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        # Copia nueva por repetición: el motor memoriza sus series por instantánea
+        frame = df.copy()
+        started = time.perf_counter()
+        result = fn(frame)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def _max_difference(expected, actual):
+    """Diferencia máxima de fuerza entre resultados; None si difieren los niveles"""
+    if expected is None or actual is None:
+        return 0.0 if expected is actual else None
+    pairs = list(zip(expected['levels'], actual['levels']))
+    if len(expected['levels']) != len(actual['levels']) or any(
+        (a['price'], a['type'], a['touches']) != (b['price'], b['type'], b['touches']) for a, b in pairs
+    ):
+        return None
+    return max((abs(a['strength'] - b['strength']) for a, b in pairs), default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de soportes y resistencias")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[500, 5000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy-max-bars", type=int, default=50000,
+                        help="No medir el cálculo original por encima de este tamaño")
+    args = parser.parse_args()
+
+    engine = SupportResistanceEngine()
+    print(f"{'velas':>8} {'niveles':>8} {'original':>12} {'vectorizado':>12} {'speedup':>9}  resultado")
+    for size in args.sizes:
+        df = make_bars(size, args.seed)
+        fast_time, fast = _time(engine.analyze, df, args.repeat)
+        levels = len(fast['levels']) if fast else 0
+
+        if size > args.legacy_max_bars:
+            print(f"{size:>8} {levels:>8} {'-':>12} {fast_time * 1000:>10.2f}ms {'-':>9}")
+            continue
+
+        # El original es lento: una sola medición
+        legacy_time, legacy = _time(legacy_support_resistance, df, 1)
+        difference = _max_difference(legacy, fast)
+        check = "DISTINTO" if difference is None else f"idéntico (max |Δfuerza|={difference:.1e})"
+        print(f"{size:>8} {levels:>8} {legacy_time * 1000:>10.2f}ms {fast_time * 1000:>10.2f}ms "
+              f"{legacy_time / fast_time:>8.1f}x  {check}")
+
+
+if __name__ == "__main__":
+    main()
@@ -45,6 +45,12 @@ class Settings(BaseSettings):
     # Análisis en tiempo real
     realtime_analysis_interval: int = Field(default=60, env="REALTIME_ANALYSIS_INTERVAL")
     max_concurrent_analysis: int = Field(default=10, env="MAX_CONCURRENT_ANALYSIS")
+    # Segundos de espera tras el cierre de vela antes de analizar (publicación de la vela nueva)
+    realtime_bar_close_delay: float = Field(default=2.0, env="REALTIME_BAR_CLOSE_DELAY")
+    # Intervalo mínimo entre análisis de la vela en formación (modo intrabar)
+    realtime_intrabar_throttle: float = Field(default=15.0, env="REALTIME_INTRABAR_THROTTLE")
+    # Tiempo máximo por analizador (Elliott, patrones, ...); el que lo supera se descarta
+    analysis_timeout_seconds: float = Field(default=10.0, env="ANALYSIS_TIMEOUT_SECONDS")
     
     # Logging
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
@@ -63,6 +63,27 @@ class AnalysisConfig(BaseModel):
     
     # Pesos personalizados adicionales
     custom_weights: dict = {}
+    
+    # Agrupación de niveles de precio en confluencias
+    level_tolerance_model: str = "percent"  # percent | atr | density
+    level_tolerance_percent: float = 0.1    # % del precio actual (modelos percent y density)
+    level_tolerance_atr: float = 0.25       # Múltiplo del ATR(14) (modelo atr)
+
+
+class BatchAnalysisItem(BaseModel):
+    """Par y temporalidad a analizar en un lote"""
+    pair: str
+    timeframe: Optional[str] = None  # None = config.timeframe
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Análisis de varios pares/temporalidades con una misma configuración"""
+    # Vacío = todos los pares disponibles en MT5 para cada una de `timeframes`
+    items: List[BatchAnalysisItem] = []
+    timeframes: List[str] = []
+    config: Optional[AnalysisConfig] = None
+    bars: int = Field(default=500, ge=50, le=5000)
+    save_signals: bool = True
 
 
 class AISettingsRequest(BaseModel):
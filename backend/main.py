@@ -1,20 +1,16 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
 import uvicorn
 import logging
-import json
 from contextlib import asynccontextmanager
-from bson import ObjectId
 from datetime import datetime
-import numpy as np
-import pandas as pd
 
 # Routers
 from api.auth import router as auth_router
 from api.risk_management import router as risk_router 
 from api.ai_settings_router import router as ai_settings_router
+from api.serialization import JSONResponse
 
 # Componentes
 from database.connection import connect_to_mongo, close_mongo_connection
@@ -31,52 +27,6 @@ logger = logging.getLogger(__name__)
 # Globales
 mt5_provider = None
 
-# Serialización helper
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        elif isinstance(obj, datetime):
-            return obj.isoformat()
-        elif isinstance(obj, (np.float32, np.float64, np.floating)):
-            return float(obj)
-        elif isinstance(obj, (np.int32, np.int64, np.integer)):
-            return int(obj)
-        elif isinstance(obj, (pd.Timestamp)):
-            return obj.isoformat()
-        elif hasattr(obj, '__dict__'):
-            return self.default(obj.__dict__)
-        return super().default(obj)
-
-def prepare_for_json_serialization(data):
-    """Convierte recursivamente todos los tipos no serializables a JSON."""
-    if isinstance(data, dict):
-        result = {}
-        for key, value in data.items():
-            if key == "_id" and isinstance(value, ObjectId):
-                result["id"] = str(value)
-            else:
-                result[key] = prepare_for_json_serialization(value)
-        return result
-    elif isinstance(data, (list, tuple)):
-        return [prepare_for_json_serialization(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    elif isinstance(data, datetime):
-        return data.isoformat()
-    elif isinstance(data, (np.float32, np.float64, np.floating)):
-        return float(data)
-    elif isinstance(data, (np.int32, np.int64, np.integer)):
-        return int(data)
-    elif isinstance(data, pd.Timestamp):
-        return data.isoformat()
-    elif hasattr(data, '__dict__'):
-        return prepare_for_json_serialization(data.__dict__)
-    elif data is None:
-        return None
-    else:
-        return data
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Ciclo de vida de la aplicación."""
@@ -112,7 +62,8 @@ app = FastAPI(
     title="Trading AI API",
     description="Sistema de Trading con Inteligencia Artificial",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=JSONResponse
 )
 
 # CORS
@@ -161,38 +112,12 @@ async def cors_error_handler(request: Request, call_next):
             }
         )
 
-# Middleware para limpiar ObjectId
+# Errores de serialización (ObjectId). Las respuestas JSON ya salen limpias de
+# api.serialization.JSONResponse, así que pasan sin leerlas ni volver a codificarlas
 @app.middleware("http")
 async def objectid_serialization_middleware(request: Request, call_next):
     try:
-        response = await call_next(request)
-        content_type = response.headers.get("content-type", "")
-        if "application/json" not in content_type:
-            return response
-
-        if hasattr(response, 'body'):
-            try:
-                body = b""
-                async for chunk in response.body_iterator:
-                    body += chunk
-
-                if body:
-                    try:
-                        data = json.loads(body.decode())
-                        cleaned = prepare_for_json_serialization(data)
-                        return JSONResponse(
-                            content=cleaned,
-                            status_code=response.status_code,
-                            headers=dict(response.headers)
-                        )
-                    except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                        logger.warning(f"Error decodificando respuesta JSON: {e}")
-                        return response
-            except Exception as e:
-                logger.warning(f"Error procesando respuesta en middleware: {e}")
-                return response
-
-        return response
+        return await call_next(request)
 
     except ValueError as e:
         if "ObjectId" in str(e):
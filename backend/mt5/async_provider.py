@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from .candles import Candles
+from .data_provider import MT5DataProvider
+
+
+class MT5Executor:
+    """
+    Hilo dedicado para las llamadas a la API C de MetaTrader 5.
+
+    La API de MT5 no es thread-safe y es bloqueante: todas las llamadas se
+    serializan en un único hilo fuera del event loop. Registra profundidad de
+    cola, espera y latencia por método.
+    """
+
+    def __init__(self, thread_name_prefix: str = "mt5"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._max_pending = 0
+        self._methods: Dict[str, Dict[str, float]] = {}
+        self.logger = logging.getLogger(__name__)
+
+    async def run(self, fn: Callable, *args, name: Optional[str] = None, **kwargs) -> Any:
+        """Ejecutar `fn(*args, **kwargs)` en el hilo de MT5 y esperar el resultado"""
+        name = name or getattr(fn, '__name__', 'call')
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(name, started - submitted, time.perf_counter() - started)
+
+        with self._lock:
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+        future = self._executor.submit(task)
+        # También descuenta las tareas canceladas antes de empezar
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def _record(self, name: str, wait: float, latency: float):
+        with self._lock:
+            stats = self._methods.get(name)
+            if stats is None:
+                stats = self._methods[name] = {
+                    'calls': 0, 'total_latency': 0.0, 'max_latency': 0.0,
+                    'total_wait': 0.0, 'max_wait': 0.0,
+                }
+            stats['calls'] += 1
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+
+    @property
+    def queue_depth(self) -> int:
+        """Llamadas enviadas que aún no terminaron (incluye la que está en curso)"""
+        return self._pending
+
+    def get_metrics(self) -> Dict:
+        """Profundidad de cola y latencias por método (en milisegundos)"""
+        with self._lock:
+            methods = {
+                name: {
+                    'calls': int(s['calls']),
+                    'avg_latency_ms': round(s['total_latency'] / s['calls'] * 1000, 3),
+                    'max_latency_ms': round(s['max_latency'] * 1000, 3),
+                    'avg_wait_ms': round(s['total_wait'] / s['calls'] * 1000, 3),
+                    'max_wait_ms': round(s['max_wait'] * 1000, 3),
+                }
+                for name, s in self._methods.items()
+            }
+            return {
+                'queue_depth': self._pending,
+                'max_queue_depth': self._max_pending,
+                'methods': methods,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+class AsyncMT5Provider:
+    """Fachada asíncrona sobre MT5DataProvider: cada llamada se ejecuta en el hilo de MT5"""
+
+    def __init__(self, provider: MT5DataProvider, executor: Optional[MT5Executor] = None):
+        self.provider = provider
+        self.executor = executor if executor is not None else mt5_executor
+
+    @property
+    def connected(self) -> bool:
+        return self.provider.connected
+
+    async def run(self, fn: Callable, *args, name: Optional[str] = None, **kwargs) -> Any:
+        """Ejecutar cualquier llamable que use el terminal en el hilo de MT5"""
+        return await self.executor.run(fn, *args, name=name, **kwargs)
+
+    async def connect(self) -> bool:
+        return await self.run(self.provider.connect)
+
+    async def ensure_connected(self) -> bool:
+        """Conectar sólo si no hay conexión activa"""
+        if self.provider.connected:
+            return True
+        return await self.connect()
+
+    async def disconnect(self):
+        return await self.run(self.provider.disconnect)
+
+    async def get_available_pairs(self) -> List[Dict]:
+        return await self.run(self.provider.get_available_pairs)
+
+    async def get_realtime_data(self, symbol: str, timeframe: str = "H1",
+                                count: int = 500) -> Optional[pd.DataFrame]:
+        # La conversión a DataFrame no toca el terminal: se hace fuera del hilo de MT5
+        candles = await self.get_candles(symbol, timeframe, count)
+        if candles is None:
+            return None
+        return candles.to_frame()
+
+    async def get_candles(self, symbol: str, timeframe: str = "H1",
+                          count: int = 500) -> Optional[Candles]:
+        return await self.run(self.provider.get_candles, symbol, timeframe, count)
+
+    async def get_candles_batch(self, requests: List[Tuple[str, str]],
+                                count: int = 500) -> Dict[Tuple[str, str], Optional[Candles]]:
+        """Velas de varios (símbolo, temporalidad) en una única llamada al hilo de MT5"""
+        return await self.run(self.provider.get_candles_batch, requests, count)
+
+    async def get_current_price(self, symbol: str) -> Optional[Dict]:
+        return await self.run(self.provider.get_current_price, symbol)
+
+    async def get_symbol_info(self, symbol: str) -> Optional[Dict]:
+        return await self.run(self.provider.get_symbol_info, symbol)
+
+    async def get_server_time(self, symbol: str = "EURUSD") -> Optional[int]:
+        return await self.run(self.provider.get_server_time, symbol)
+
+    async def execute_order(self, symbol: str, order_type: str, volume: float,
+                            price: float = None, sl: float = None, tp: float = None,
+                            comment: str = "") -> Dict:
+        return await self.run(self.provider.execute_order, symbol, order_type, volume,
+                              price, sl, tp, comment)
+
+    def get_metrics(self) -> Dict:
+        return self.executor.get_metrics()
+
+
+# Hilo único compartido por todos los proveedores (el terminal es único por proceso)
+mt5_executor = MT5Executor()
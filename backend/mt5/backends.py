@@ -0,0 +1,452 @@
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+# Estructuras equivalentes a las que devuelve el paquete MetaTrader5
+SymbolInfo = namedtuple('SymbolInfo', [
+    'name', 'description', 'currency_base', 'currency_profit', 'point', 'digits',
+    'visible', 'spread', 'volume_min', 'volume_max', 'volume_step',
+    'margin_initial', 'trade_mode', 'filling_mode'
+])
+Tick = namedtuple('Tick', ['time', 'bid', 'ask', 'last', 'volume'])
+OrderSendResult = namedtuple('OrderSendResult', ['retcode', 'order', 'price', 'volume', 'comment'])
+AccountInfo = namedtuple('AccountInfo', [
+    'login', 'name', 'server', 'currency', 'leverage',
+    'balance', 'equity', 'margin', 'margin_free', 'margin_level'
+])
+
+# dtype de copy_rates_* en MetaTrader5
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+
+class MarketDataBackend:
+    """
+    Interfaz de backend de datos de mercado usada por MT5DataProvider.
+
+    Replica el subconjunto de la API del módulo MetaTrader5 que usa el proveedor
+    (mismas funciones y constantes), de modo que el paquete oficial puede usarse
+    directamente como backend en vivo.
+    """
+
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_M15 = 15
+    TIMEFRAME_M30 = 30
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_H4 = 16388
+    TIMEFRAME_D1 = 16408
+    TIMEFRAME_W1 = 32769
+    TIMEFRAME_MN1 = 49153
+
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    TRADE_ACTION_DEAL = 1
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_FILLING_RETURN = 2
+    SYMBOL_FILLING_FOK = 1
+    SYMBOL_FILLING_IOC = 2
+    TRADE_RETCODE_DONE = 10009
+
+    def initialize(self, *args, **kwargs) -> bool:
+        raise NotImplementedError
+
+    def shutdown(self):
+        raise NotImplementedError
+
+    def last_error(self) -> Tuple[int, str]:
+        raise NotImplementedError
+
+    def symbols_get(self) -> Tuple[SymbolInfo, ...]:
+        raise NotImplementedError
+
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        raise NotImplementedError
+
+    def symbol_select(self, symbol: str, enable: bool = True) -> bool:
+        raise NotImplementedError
+
+    def symbol_info_tick(self, symbol: str) -> Optional[Tick]:
+        raise NotImplementedError
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def order_send(self, request: Dict) -> Optional[OrderSendResult]:
+        raise NotImplementedError
+
+    def account_info(self) -> Optional[AccountInfo]:
+        raise NotImplementedError
+
+
+# Segundos por vela (MN1 aproximado a 30 días)
+TIMEFRAME_SECONDS = {
+    MarketDataBackend.TIMEFRAME_M1: 60,
+    MarketDataBackend.TIMEFRAME_M5: 300,
+    MarketDataBackend.TIMEFRAME_M15: 900,
+    MarketDataBackend.TIMEFRAME_M30: 1800,
+    MarketDataBackend.TIMEFRAME_H1: 3600,
+    MarketDataBackend.TIMEFRAME_H4: 14400,
+    MarketDataBackend.TIMEFRAME_D1: 86400,
+    MarketDataBackend.TIMEFRAME_W1: 604800,
+    MarketDataBackend.TIMEFRAME_MN1: 2592000,
+}
+
+TIMEFRAME_BY_NAME = {
+    "M1": MarketDataBackend.TIMEFRAME_M1,
+    "M5": MarketDataBackend.TIMEFRAME_M5,
+    "M15": MarketDataBackend.TIMEFRAME_M15,
+    "M30": MarketDataBackend.TIMEFRAME_M30,
+    "H1": MarketDataBackend.TIMEFRAME_H1,
+    "H4": MarketDataBackend.TIMEFRAME_H4,
+    "D1": MarketDataBackend.TIMEFRAME_D1,
+    "W1": MarketDataBackend.TIMEFRAME_W1,
+    "MN1": MarketDataBackend.TIMEFRAME_MN1,
+}
+
+
+class _BarSeries:
+    """Serie de velas completas para un (símbolo, temporalidad) del backend de replay"""
+
+    def __init__(self, rates: np.ndarray, timeframe_seconds: int,
+                 rng: Optional[np.random.Generator] = None, volatility: float = 0.0):
+        self.rates = rates
+        self.timeframe_seconds = timeframe_seconds
+        # Sólo las series sintéticas pueden extenderse
+        self.rng = rng
+        self.volatility = volatility
+
+    def extend_until(self, now: int):
+        """Generar velas sintéticas hasta cubrir `now` (determinista por semilla)"""
+        if self.rng is None or len(self.rates) == 0:
+            return
+        missing = (now - int(self.rates['time'][-1])) // self.timeframe_seconds
+        if missing <= 0:
+            return
+        start_time = int(self.rates['time'][-1]) + self.timeframe_seconds
+        new_rates = _random_walk(self.rng, float(self.rates['close'][-1]), start_time,
+                                 self.timeframe_seconds, int(missing), self.volatility)
+        self.rates = np.concatenate((self.rates, new_rates))
+
+    def window(self, now: int, start_pos: int, count: int) -> np.ndarray:
+        """
+        Velas visibles en `now` contando desde la más reciente (como copy_rates_from_pos).
+        La vela abierta en `now` se recorta como vela en formación.
+        """
+        self.extend_until(now)
+        end = int(np.searchsorted(self.rates['time'], now, side='right')) - start_pos
+        if end <= 0:
+            return self.rates[:0].copy()
+        bars = self.rates[max(end - count, 0):end].copy()
+        if start_pos > 0:
+            return bars
+
+        elapsed = now - int(bars['time'][-1])
+        fraction = elapsed / self.timeframe_seconds
+        if self.rng is not None and fraction < 1.0:
+            # Interpolar la vela en formación según el tiempo transcurrido
+            bar_open, bar_high, bar_low, bar_close = (
+                float(bars[field][-1]) for field in ('open', 'high', 'low', 'close')
+            )
+            close = bar_open + (bar_close - bar_open) * fraction
+            bars['close'][-1] = close
+            bars['high'][-1] = max(bar_open, close) + (bar_high - max(bar_open, bar_close)) * fraction
+            bars['low'][-1] = min(bar_open, close) - (min(bar_open, bar_close) - bar_low) * fraction
+            bars['tick_volume'][-1] = int(bars['tick_volume'][-1] * fraction)
+        return bars
+
+
+def _random_walk(rng: np.random.Generator, start_price: float, start_time: int,
+                 timeframe_seconds: int, count: int, volatility: float) -> np.ndarray:
+    """Generar `count` velas con un paseo aleatorio log-normal"""
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    returns = rng.normal(0.0, volatility, count)
+    closes = start_price * np.exp(np.cumsum(returns))
+    opens = np.concatenate(([start_price], closes[:-1]))
+    wicks = np.abs(rng.normal(0.0, volatility * 0.5, (2, count)))
+
+    rates['time'] = start_time + np.arange(count, dtype=np.int64) * timeframe_seconds
+    rates['open'] = opens
+    rates['close'] = closes
+    rates['high'] = np.maximum(opens, closes) * (1 + wicks[0])
+    rates['low'] = np.minimum(opens, closes) * (1 - wicks[1])
+    rates['tick_volume'] = rng.integers(100, 1000, count)
+    rates['spread'] = 10
+    return rates
+
+
+def _parse_time(value) -> int:
+    """Convertir epoch (s/ms) o fecha ISO a segundos epoch"""
+    if isinstance(value, (int, float)):
+        return int(value / 1000) if value > 1e11 else int(value)
+    return int(pd.Timestamp(value).timestamp())
+
+
+class ReplayBackend(MarketDataBackend):
+    """
+    Backend local determinista para pruebas de carga y benchmarks sin terminal MT5.
+
+    Sirve velas grabadas (JSON en disco) o paseos aleatorios con semilla. El reloj
+    es manual (`advance`) o avanza a `speed` segundos de mercado por segundo real.
+    """
+
+    DEFAULT_SYMBOLS = ['EURUSD', 'GBPUSD', 'USDJPY', 'USDCHF', 'AUDUSD', 'USDCAD', 'NZDUSD',
+                       'EURJPY', 'GBPJPY', 'EURGBP', 'EURAUD', 'EURCHF', 'AUDCAD', 'GBPCHF']
+
+    BASE_PRICES = {
+        'EURUSD': 1.0850, 'GBPUSD': 1.2650, 'USDJPY': 148.50, 'AUDUSD': 0.6750,
+        'USDCHF': 0.8950, 'USDCAD': 1.3450, 'EURJPY': 161.20, 'GBPJPY': 187.80,
+        'NZDUSD': 0.6150, 'EURGBP': 0.8580, 'EURAUD': 1.6400, 'EURCHF': 0.9700,
+        'AUDCAD': 0.9050, 'GBPCHF': 1.1300,
+    }
+
+    def __init__(self, seed: int = 42, symbols: Optional[List[str]] = None,
+                 start_time: Optional[int] = None, history_bars: int = 5000,
+                 speed: Optional[float] = None, hourly_volatility: float = 0.0015):
+        self.seed = seed
+        self.symbols = list(symbols or self.DEFAULT_SYMBOLS)
+        self.history_bars = history_bars
+        self.hourly_volatility = hourly_volatility
+        self.speed = speed
+        self._start_time = start_time if start_time is not None else 1_700_000_000
+        self._now = self._start_time
+        self._wall_start = time.monotonic()
+        self._series: Dict[Tuple[str, int], _BarSeries] = {}
+        self._recorded_symbols = set()
+        self._lock = threading.RLock()
+        self._order_ticket = 0
+        self._initialized = False
+        self.logger = logging.getLogger(__name__)
+
+    # ========== RELOJ ==========
+
+    def now(self) -> int:
+        """Tiempo de mercado actual (segundos epoch)"""
+        if self.speed:
+            return self._now + int((time.monotonic() - self._wall_start) * self.speed)
+        return self._now
+
+    def advance(self, seconds: int = 60):
+        """Avanzar el reloj de mercado (modo manual)"""
+        with self._lock:
+            self._now += int(seconds)
+
+    def set_time(self, timestamp: int):
+        with self._lock:
+            self._now = int(timestamp)
+            self._wall_start = time.monotonic()
+
+    # ========== DATOS GRABADOS ==========
+
+    def load_rates(self, symbol: str, timeframe: str, rates: np.ndarray):
+        """Registrar velas grabadas (array con dtype de MT5) para un símbolo y temporalidad"""
+        tf = TIMEFRAME_BY_NAME[timeframe]
+        with self._lock:
+            self._series[(symbol, tf)] = _BarSeries(np.sort(rates, order='time'), TIMEFRAME_SECONDS[tf])
+            self._recorded_symbols.add(symbol)
+            if symbol not in self.symbols:
+                self.symbols.append(symbol)
+
+    def load_json(self, path: str, symbol: str, timeframe: str = "H1"):
+        """
+        Cargar datos grabados desde JSON (archivo o directorio de archivos).
+
+        Acepta velas (open/high/low/close) o ticks/señales con `price` y `timestamp`
+        (como los de `signals/`), que se agregan en velas de la temporalidad indicada.
+        """
+        records = []
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))
+                 if name.endswith('.json')] if os.path.isdir(path) else [path]
+        for file_path in paths:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                self.logger.warning(f"No se pudo leer {file_path}: {e}")
+                continue
+            records.extend(content if isinstance(content, list) else [content])
+
+        if not records:
+            raise ValueError(f"Sin registros válidos en {path}")
+
+        if all('close' in r for r in records):
+            rates = np.zeros(len(records), dtype=RATES_DTYPE)
+            for i, r in enumerate(records):
+                rates[i] = (
+                    _parse_time(r.get('time', r.get('timestamp'))),
+                    r['open'], r['high'], r['low'], r['close'],
+                    int(r.get('tick_volume', r.get('volume', 0))), int(r.get('spread', 0)),
+                    int(r.get('real_volume', 0))
+                )
+        else:
+            ticks = [(_parse_time(r['timestamp']), float(r['price']))
+                     for r in records if 'price' in r and 'timestamp' in r]
+            rates = self._ticks_to_rates(ticks, TIMEFRAME_SECONDS[TIMEFRAME_BY_NAME[timeframe]])
+
+        self.load_rates(symbol, timeframe, rates)
+        # Con datos grabados, el reloj arranca al final de la grabación
+        if self._now < int(rates['time'].max()):
+            self.set_time(int(rates['time'].max()))
+        self.logger.info(f"Replay: {len(rates)} velas cargadas para {symbol} {timeframe}")
+
+    @staticmethod
+    def _ticks_to_rates(ticks: List[Tuple[int, float]], timeframe_seconds: int) -> np.ndarray:
+        """Agregar ticks (tiempo, precio) en velas OHLC"""
+        if not ticks:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        times, prices = map(np.asarray, zip(*sorted(ticks)))
+        buckets = times - times % timeframe_seconds
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        rates = np.zeros(len(starts), dtype=RATES_DTYPE)
+        rates['time'] = buckets[starts]
+        rates['open'] = prices[starts]
+        rates['close'] = prices[np.r_[starts[1:] - 1, len(prices) - 1]]
+        rates['high'] = np.maximum.reduceat(prices, starts)
+        rates['low'] = np.minimum.reduceat(prices, starts)
+        rates['tick_volume'] = np.diff(np.r_[starts, len(prices)])
+        return rates
+
+    # ========== API COMPATIBLE CON METATRADER5 ==========
+
+    def initialize(self, *args, **kwargs) -> bool:
+        self._initialized = True
+        return True
+
+    def shutdown(self):
+        self._initialized = False
+
+    def last_error(self) -> Tuple[int, str]:
+        return (1, 'Success')
+
+    def _get_series(self, symbol: str, timeframe: int) -> Optional[_BarSeries]:
+        key = (symbol, timeframe)
+        series = self._series.get(key)
+        if series is None and symbol in self.symbols and symbol not in self._recorded_symbols:
+            tf_seconds = TIMEFRAME_SECONDS.get(timeframe)
+            if tf_seconds is None:
+                return None
+            # Semilla estable por (símbolo, temporalidad) para que la serie sea reproducible
+            rng = np.random.default_rng([self.seed, zlib.crc32(f"{symbol}:{timeframe}".encode())])
+            volatility = self.hourly_volatility * np.sqrt(tf_seconds / 3600)
+            first_time = self._start_time - self._start_time % tf_seconds - self.history_bars * tf_seconds
+            rates = _random_walk(rng, self.BASE_PRICES.get(symbol, 1.0), first_time,
+                                 tf_seconds, self.history_bars, volatility)
+            series = _BarSeries(rates, tf_seconds, rng, volatility)
+            self._series[key] = series
+        return series
+
+    def _point(self, symbol: str) -> float:
+        return 0.001 if 'JPY' in symbol else 0.00001
+
+    def symbols_get(self) -> Tuple[SymbolInfo, ...]:
+        return tuple(self.symbol_info(symbol) for symbol in self.symbols)
+
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        if symbol not in self.symbols:
+            return None
+        point = self._point(symbol)
+        return SymbolInfo(
+            name=symbol, description=f"{symbol[:3]} vs {symbol[3:]} (replay)",
+            currency_base=symbol[:3], currency_profit=symbol[3:], point=point,
+            digits=3 if point == 0.001 else 5, visible=True, spread=10,
+            volume_min=0.01, volume_max=100.0, volume_step=0.01, margin_initial=0.0,
+            trade_mode=4, filling_mode=self.SYMBOL_FILLING_FOK | self.SYMBOL_FILLING_IOC
+        )
+
+    def symbol_select(self, symbol: str, enable: bool = True) -> bool:
+        return symbol in self.symbols
+
+    def symbol_info_tick(self, symbol: str) -> Optional[Tick]:
+        with self._lock:
+            series = self._get_series(symbol, self.TIMEFRAME_H1) or next(
+                (s for (sym, _), s in self._series.items() if sym == symbol), None)
+            if series is None:
+                return None
+            now = self.now()
+            bars = series.window(now, 0, 1)
+        if len(bars) == 0:
+            return None
+        bid = float(bars['close'][-1])
+        ask = bid + 10 * self._point(symbol)
+        return Tick(time=now, bid=bid, ask=ask, last=bid, volume=int(bars['tick_volume'][-1]))
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int) -> Optional[np.ndarray]:
+        with self._lock:
+            series = self._get_series(symbol, timeframe)
+            if series is None:
+                return None
+            bars = series.window(self.now(), start_pos, count)
+        return bars if len(bars) else None
+
+    def order_send(self, request: Dict) -> Optional[OrderSendResult]:
+        tick = self.symbol_info_tick(request.get('symbol'))
+        if tick is None:
+            return None
+        with self._lock:
+            self._order_ticket += 1
+            ticket = self._order_ticket
+        price = tick.ask if request.get('type') == self.ORDER_TYPE_BUY else tick.bid
+        return OrderSendResult(retcode=self.TRADE_RETCODE_DONE, order=ticket, price=price,
+                               volume=request.get('volume'), comment='Replay fill')
+
+    def account_info(self) -> Optional[AccountInfo]:
+        return AccountInfo(login=0, name='Replay', server='Replay-Local', currency='USD', leverage=100,
+                           balance=10000.0, equity=10000.0, margin=0.0, margin_free=10000.0,
+                           margin_level=0.0)
+
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+
+def create_backend(name: Optional[str] = None):
+    """
+    Crear el backend indicado por MT5_BACKEND ('mt5' por defecto o 'replay').
+
+    Variables opcionales para replay: MT5_REPLAY_SEED, MT5_REPLAY_SPEED,
+    MT5_REPLAY_PATH, MT5_REPLAY_SYMBOL y MT5_REPLAY_TIMEFRAME.
+    """
+    name = (name or os.getenv("MT5_BACKEND", "mt5")).strip().lower()
+    logger = logging.getLogger(__name__)
+
+    if name == "replay":
+        backend = ReplayBackend(
+            seed=int(os.getenv("MT5_REPLAY_SEED", "42")),
+            speed=float(os.getenv("MT5_REPLAY_SPEED", "0")) or None,
+        )
+        replay_path = os.getenv("MT5_REPLAY_PATH")
+        if replay_path:
+            backend.load_json(
+                replay_path,
+                symbol=os.getenv("MT5_REPLAY_SYMBOL", "EURUSD"),
+                timeframe=os.getenv("MT5_REPLAY_TIMEFRAME", "H1"),
+            )
+        logger.info("Usando backend de replay para datos de mercado")
+        return backend
+
+    try:
+        import MetaTrader5  # type: ignore
+        return MetaTrader5
+    except ImportError:
+        logger.warning("Paquete MetaTrader5 no disponible; use MT5_BACKEND=replay para pruebas locales")
+        return None
+
+
+def get_default_backend():
+    """Backend compartido por el proceso (el terminal/replay es único)"""
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = create_backend()
+        return _default_backend
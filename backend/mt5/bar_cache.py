@@ -0,0 +1,180 @@
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import logging
+
+# Callable que descarga velas: (start_pos, count) -> array estructurado de MT5 o None
+RatesFetcher = Callable[[int, int], Optional[np.ndarray]]
+
+
+class BarBuffer:
+    """Buffer circular de velas (array estructurado de MT5) para un (símbolo, temporalidad)"""
+
+    def __init__(self, capacity: int, dtype: np.dtype):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._start = 0
+        self._size = 0
+        # True cuando el terminal devolvió menos velas de las pedidas (no hay más historial)
+        self.history_exhausted = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if self._size == 0:
+            return None
+        return int(self._data['time'][(self._start + self._size - 1) % self.capacity])
+
+    def reset(self, rates: np.ndarray):
+        """Reemplazar todo el contenido con las velas recibidas"""
+        rates = rates[-self.capacity:]
+        self._data[:len(rates)] = rates
+        self._start = 0
+        self._size = len(rates)
+
+    def merge(self, rates: np.ndarray) -> int:
+        """
+        Fusionar velas recientes: actualiza en sitio la vela en formación y
+        agrega las nuevas. Devuelve el número de velas nuevas agregadas.
+        """
+        last_time = self.last_time
+        if last_time is None:
+            self.reset(rates)
+            return len(rates)
+
+        last_pos = (self._start + self._size - 1) % self.capacity
+        times = rates['time']
+
+        # Parchear la vela en formación (mismo timestamp que la última cacheada)
+        same = np.flatnonzero(times == last_time)
+        if len(same):
+            self._data[last_pos] = rates[same[-1]]
+
+        # Agregar velas nuevas sobrescribiendo las más antiguas si el buffer está lleno
+        new_rates = rates[times > last_time]
+        for record in new_rates:
+            pos = (self._start + self._size) % self.capacity
+            self._data[pos] = record
+            if self._size < self.capacity:
+                self._size += 1
+            else:
+                self._start = (self._start + 1) % self.capacity
+        return len(new_rates)
+
+    def latest(self, count: int) -> np.ndarray:
+        """Últimas `count` velas en orden cronológico (vista si son contiguas)"""
+        count = min(count, self._size)
+        begin = (self._start + self._size - count) % self.capacity
+        end = begin + count
+        if end <= self.capacity:
+            return self._data[begin:end]
+        return np.concatenate((self._data[begin:], self._data[:end - self.capacity]))
+
+
+class BarCache:
+    """
+    Caché incremental de velas OHLCV por (símbolo, temporalidad).
+
+    En lugar de descargar `count` velas en cada llamada, sólo pide al terminal
+    las velas posteriores a la última cacheada (más la vela en formación).
+    """
+
+    DEFAULT_CAPACITY = 5000
+    INITIAL_PROBE = 2  # Vela en formación + la anterior
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], BarBuffer] = {}
+        self._lock = threading.RLock()
+        self.logger = logging.getLogger(__name__)
+        self.stats = {
+            'full_fetches': 0,
+            'incremental_fetches': 0,
+            'bars_downloaded': 0,
+            'bars_served': 0,
+        }
+
+    def get_rates(self, symbol: str, timeframe: str, count: int,
+                  fetch: RatesFetcher) -> Optional[np.ndarray]:
+        """Obtener las últimas `count` velas usando la caché y descargando sólo lo nuevo"""
+        key = (symbol, timeframe)
+        with self._lock:
+            buffer = self._buffers.get(key)
+
+            if buffer is None or (len(buffer) < count and not buffer.history_exhausted):
+                buffer = self._full_fetch(key, count, fetch)
+            else:
+                buffer = self._incremental_fetch(key, buffer, count, fetch)
+
+            if buffer is None or len(buffer) == 0:
+                return None
+
+            # Copia: la vela en formación se parchea en sitio en siguientes llamadas
+            rates = buffer.latest(count).copy()
+            self.stats['bars_served'] += len(rates)
+            return rates
+
+    def _full_fetch(self, key: Tuple[str, str], count: int,
+                    fetch: RatesFetcher) -> Optional[BarBuffer]:
+        rates = fetch(0, count)
+        self.stats['full_fetches'] += 1
+        if rates is None or len(rates) == 0:
+            return None
+
+        self.stats['bars_downloaded'] += len(rates)
+        buffer = BarBuffer(max(self.capacity, count), rates.dtype)
+        buffer.reset(rates)
+        buffer.history_exhausted = len(rates) < count
+        self._buffers[key] = buffer
+        return buffer
+
+    def _incremental_fetch(self, key: Tuple[str, str], buffer: BarBuffer, count: int,
+                           fetch: RatesFetcher) -> Optional[BarBuffer]:
+        last_time = buffer.last_time
+        probe = self.INITIAL_PROBE
+
+        # Ampliar la ventana hasta solapar con la última vela cacheada
+        while True:
+            rates = fetch(0, probe)
+            self.stats['incremental_fetches'] += 1
+            if rates is None or len(rates) == 0:
+                self.logger.warning(f"Sin velas recientes para {key[0]} {key[1]}, usando caché")
+                return buffer
+            self.stats['bars_downloaded'] += len(rates)
+            if int(rates['time'][0]) <= last_time or probe >= count:
+                break
+            probe = min(probe * 4, count)
+
+        if int(rates['time'][0]) > last_time:
+            # Hueco mayor que la ventana pedida: recargar completo
+            return self._full_fetch(key, count, fetch)
+
+        buffer.merge(rates)
+        return buffer
+
+    def invalidate(self, symbol: Optional[str] = None, timeframe: Optional[str] = None):
+        """Eliminar entradas de la caché (todas, por símbolo o por símbolo y temporalidad)"""
+        with self._lock:
+            for key in list(self._buffers):
+                if symbol is not None and key[0] != symbol:
+                    continue
+                if timeframe is not None and key[1] != timeframe:
+                    continue
+                del self._buffers[key]
+
+    def clear(self):
+        self.invalidate()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._buffers),
+                'cached_bars': sum(len(b) for b in self._buffers.values()),
+            }
+
+
+# Caché compartida por todas las instancias de MT5DataProvider (el terminal es único por proceso)
+bar_cache = BarCache()
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+
+class Candles:
+    """
+    Contenedor columnar de velas OHLCV sobre arrays NumPy.
+
+    Construido desde el array estructurado de MT5 sin copiar datos (cada columna
+    es una vista del registro). Sólo se convierte a pandas cuando se pide.
+    """
+
+    COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+    # Campos del array de MT5 -> nombre de columna usado por los analizadores
+    RATE_FIELDS = {
+        'Open': 'open',
+        'High': 'high',
+        'Low': 'low',
+        'Close': 'close',
+        'Volume': 'tick_volume',
+    }
+
+    __slots__ = ('time', 'open', 'high', 'low', 'close', 'volume', '_frame')
+
+    def __init__(self, time: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.time = time  # Segundos epoch (int64)
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self._frame: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def from_rates(cls, rates: np.ndarray) -> 'Candles':
+        """Crear desde el array estructurado devuelto por copy_rates_* (vistas, sin copia)"""
+        return cls(
+            time=rates['time'],
+            open=rates['open'],
+            high=rates['high'],
+            low=rates['low'],
+            close=rates['close'],
+            volume=rates['tick_volume'],
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'Candles':
+        """Crear desde un DataFrame con columnas Open/High/Low/Close/Volume e índice temporal"""
+        candles = cls(
+            time=pd.DatetimeIndex(df.index).as_unit('s').asi8,
+            open=df['Open'].to_numpy(dtype=np.float64),
+            high=df['High'].to_numpy(dtype=np.float64),
+            low=df['Low'].to_numpy(dtype=np.float64),
+            close=df['Close'].to_numpy(dtype=np.float64),
+            volume=df['Volume'].to_numpy() if 'Volume' in df.columns else np.zeros(len(df)),
+        )
+        candles._frame = df
+        return candles
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """Acceso por nombre de columna ('Close' o 'close')"""
+        name = column.lower()
+        if name == 'volume':
+            return self.volume
+        if name in ('time', 'open', 'high', 'low', 'close'):
+            return getattr(self, name)
+        raise KeyError(column)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.time) == 0
+
+    @property
+    def last_time(self) -> Optional[int]:
+        return int(self.time[-1]) if len(self.time) else None
+
+    @property
+    def index(self) -> np.ndarray:
+        """Marcas de tiempo como datetime64[s]"""
+        return self.time.astype('datetime64[s]')
+
+    def tail(self, count: int) -> 'Candles':
+        """Últimas `count` velas (vistas)"""
+        start = max(len(self.time) - count, 0)
+        return Candles(
+            self.time[start:], self.open[start:], self.high[start:],
+            self.low[start:], self.close[start:], self.volume[start:]
+        )
+
+    def between(self, start: Optional[int] = None, end: Optional[int] = None) -> 'Candles':
+        """Velas con start <= time <= end (segundos epoch; None = sin límite), como vistas"""
+        begin = int(np.searchsorted(self.time, start, side='left')) if start is not None else 0
+        stop = int(np.searchsorted(self.time, end, side='right')) if end is not None else len(self.time)
+        return Candles(
+            self.time[begin:stop], self.open[begin:stop], self.high[begin:stop],
+            self.low[begin:stop], self.close[begin:stop], self.volume[begin:stop]
+        )
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {
+            'Open': self.open,
+            'High': self.high,
+            'Low': self.low,
+            'Close': self.close,
+            'Volume': self.volume,
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """Convertir a DataFrame (mismo formato que get_realtime_data); se cachea"""
+        if self._frame is None:
+            index = pd.DatetimeIndex(pd.to_datetime(self.time, unit='s'), name='time')
+            self._frame = pd.DataFrame(self.columns(), index=index)
+        return self._frame
@@ -1,22 +1,36 @@
-import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Tuple, Union
 import asyncio
 import logging
 
+from .backends import get_default_backend
+from .bar_cache import BarCache, bar_cache as shared_bar_cache
+from .candles import Candles
+
 class MT5DataProvider:
-    def __init__(self):
+    def __init__(self, bar_cache: Optional[BarCache] = None, backend=None):
         self.connected = False
         self.available_symbols = []
         self.logger = logging.getLogger(__name__)
+        # Backend de datos: paquete MetaTrader5 o ReplayBackend (ver mt5/backends.py)
+        self.mt5 = backend if backend is not None else get_default_backend()
+        # Caché incremental de velas: la compartida es la del terminal por defecto; un
+        # backend inyectado (p. ej. replay) tiene la suya para no mezclar sus velas
+        if bar_cache is None:
+            bar_cache = BarCache() if backend is not None else shared_bar_cache
+        self.bar_cache = bar_cache
         
     def connect(self) -> bool:
         """Conectar a MetaTrader 5"""
+        if self.mt5 is None:
+            self.logger.error("No hay backend de MetaTrader 5 disponible")
+            return False
+        
         try:
-            if not mt5.initialize():
-                self.logger.error(f"MT5 initialization failed: {mt5.last_error()}")
+            if not self.mt5.initialize():
+                self.logger.error(f"MT5 initialization failed: {self.mt5.last_error()}")
                 return False
             
             self.connected = True
@@ -31,14 +45,16 @@ class MT5DataProvider:
     def disconnect(self):
         """Desconectar de MetaTrader 5"""
         if self.connected:
-            mt5.shutdown()
+            self.mt5.shutdown()
             self.connected = False
+            # Con la caché compartida: shutdown() cierra el terminal para todo el proceso
+            self.bar_cache.clear()
             self.logger.info("Desconectado de MetaTrader 5")
     
     def _load_available_symbols(self):
         """Cargar símbolos disponibles"""
         try:
-            symbols = mt5.symbols_get()
+            symbols = self.mt5.symbols_get()
             if symbols:
                 self.available_symbols = [
                     {
@@ -65,23 +81,23 @@ class MT5DataProvider:
             filling_modes = symbol_info.filling_mode
             
             # Priorizar ORDER_FILLING_FOK si está disponible
-            if filling_modes & mt5.SYMBOL_FILLING_FOK:
+            if filling_modes & self.mt5.SYMBOL_FILLING_FOK:
                 self.logger.info("Using ORDER_FILLING_FOK")
-                return mt5.ORDER_FILLING_FOK
+                return self.mt5.ORDER_FILLING_FOK
             
             # Si no, usar ORDER_FILLING_IOC
-            elif filling_modes & mt5.SYMBOL_FILLING_IOC:
+            elif filling_modes & self.mt5.SYMBOL_FILLING_IOC:
                 self.logger.info("Using ORDER_FILLING_IOC") 
-                return mt5.ORDER_FILLING_IOC
+                return self.mt5.ORDER_FILLING_IOC
             
             # Como último recurso, usar RETURN (más compatible)
             else:
                 self.logger.info("Using ORDER_FILLING_RETURN (fallback)")
-                return mt5.ORDER_FILLING_RETURN
+                return self.mt5.ORDER_FILLING_RETURN
                 
         except Exception as e:
             self.logger.warning(f"Error detecting filling mode, using FOK: {e}")
-            return mt5.ORDER_FILLING_FOK
+            return self.mt5.ORDER_FILLING_FOK
 
     # ========== MÉTODOS DE TRADING ==========
 
@@ -97,7 +113,7 @@ class MT5DataProvider:
         
         try:
             # Validar símbolo
-            symbol_info = mt5.symbol_info(symbol)
+            symbol_info = self.mt5.symbol_info(symbol)
             if symbol_info is None:
                 self.logger.error(f"❌ Símbolo {symbol} no encontrado")
                 return {"success": False, "error": f"Symbol {symbol} not found"}
@@ -105,17 +121,17 @@ class MT5DataProvider:
             # Asegurar que el símbolo está visible
             if not symbol_info.visible:
                 self.logger.warning(f"⚠️ Símbolo {symbol} no visible, seleccionando...")
-                mt5.symbol_select(symbol, True)
+                self.mt5.symbol_select(symbol, True)
 
             # Preparar la solicitud de orden
             order_type = order_type.upper()
             if order_type == "BUY":
-                trade_type = mt5.ORDER_TYPE_BUY
-                tick = mt5.symbol_info_tick(symbol)
+                trade_type = self.mt5.ORDER_TYPE_BUY
+                tick = self.mt5.symbol_info_tick(symbol)
                 order_price = tick.ask if tick else price
             elif order_type == "SELL":
-                trade_type = mt5.ORDER_TYPE_SELL
-                tick = mt5.symbol_info_tick(symbol)
+                trade_type = self.mt5.ORDER_TYPE_SELL
+                tick = self.mt5.symbol_info_tick(symbol)
                 order_price = tick.bid if tick else price
             else:
                 return {"success": False, "error": f"Invalid order type: {order_type}"}
@@ -139,7 +155,7 @@ class MT5DataProvider:
             
             # Crear la solicitud de orden
             request = {
-                "action": mt5.TRADE_ACTION_DEAL,
+                "action": self.mt5.TRADE_ACTION_DEAL,
                 "symbol": symbol,
                 "volume": volume,
                 "type": trade_type,
@@ -147,7 +163,7 @@ class MT5DataProvider:
                 "deviation": 20,
                 "magic": 234000,
                 "comment": comment,
-                "type_time": mt5.ORDER_TIME_GTC,
+                "type_time": self.mt5.ORDER_TIME_GTC,
                 "type_filling": filling_mode,
             }
 
@@ -160,14 +176,14 @@ class MT5DataProvider:
             self.logger.info(f"📤 Enviando orden: {request}")
 
             # Enviar la orden
-            result = mt5.order_send(request)
+            result = self.mt5.order_send(request)
             
             if result is None:
-                error_msg = f"MT5 order_send returned None. Last error: {mt5.last_error()}"
+                error_msg = f"MT5 order_send returned None. Last error: {self.mt5.last_error()}"
                 self.logger.error(error_msg)
                 return {"success": False, "error": error_msg}
             
-            if result.retcode != mt5.TRADE_RETCODE_DONE:
+            if result.retcode != self.mt5.TRADE_RETCODE_DONE:
                 return {
                     "success": False, 
                     "error": f"Order failed: {result.comment}",
@@ -221,6 +237,13 @@ class MT5DataProvider:
     
     def get_realtime_data(self, symbol: str, timeframe: str = "H1", count: int = 500) -> Optional[pd.DataFrame]:
         """Obtener datos en tiempo real"""
+        candles = self.get_candles(symbol, timeframe, count)
+        if candles is None:
+            return None
+        return candles.to_frame()
+    
+    def get_candles(self, symbol: str, timeframe: str = "H1", count: int = 500) -> Optional[Candles]:
+        """Obtener velas en formato columnar (sin construir DataFrame)"""
         if not self.connected:
             self.logger.error("No hay conexión con MT5")
             return None
@@ -228,47 +251,50 @@ class MT5DataProvider:
         try:
             # Mapear timeframes
             tf_map = {
-                "M1": mt5.TIMEFRAME_M1,
-                "M5": mt5.TIMEFRAME_M5,
-                "M15": mt5.TIMEFRAME_M15,
-                "M30": mt5.TIMEFRAME_M30,
-                "H1": mt5.TIMEFRAME_H1,
-                "H4": mt5.TIMEFRAME_H4,
-                "D1": mt5.TIMEFRAME_D1,
-                "W1": mt5.TIMEFRAME_W1,
-                "MN1": mt5.TIMEFRAME_MN1
+                "M1": self.mt5.TIMEFRAME_M1,
+                "M5": self.mt5.TIMEFRAME_M5,
+                "M15": self.mt5.TIMEFRAME_M15,
+                "M30": self.mt5.TIMEFRAME_M30,
+                "H1": self.mt5.TIMEFRAME_H1,
+                "H4": self.mt5.TIMEFRAME_H4,
+                "D1": self.mt5.TIMEFRAME_D1,
+                "W1": self.mt5.TIMEFRAME_W1,
+                "MN1": self.mt5.TIMEFRAME_MN1
             }
             
-            tf = tf_map.get(timeframe, mt5.TIMEFRAME_H1)
+            tf = tf_map.get(timeframe, self.mt5.TIMEFRAME_H1)
             
-            # Obtener datos históricos
-            rates = mt5.copy_rates_from_pos(symbol, tf, 0, count)
+            # Obtener datos históricos (sólo se descargan las velas nuevas)
+            rates = self.bar_cache.get_rates(
+                symbol, timeframe, count,
+                lambda start_pos, n: self.mt5.copy_rates_from_pos(symbol, tf, start_pos, n)
+            )
             
             if rates is None or len(rates) == 0:
                 self.logger.warning(f"No se pudieron obtener datos para {symbol}")
                 return None
             
-            # Convertir a DataFrame
-            df = pd.DataFrame(rates)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            df.set_index('time', inplace=True)
-            
-            # Renombrar columnas para consistencia
-            df.columns = ['Open', 'High', 'Low', 'Close', 'Volume', 'Spread', 'Real_Volume']
-            
-            return df[['Open', 'High', 'Low', 'Close', 'Volume']]
+            # Vistas columnares sobre el array de MT5 (sin copia)
+            return Candles.from_rates(rates)
             
         except Exception as e:
             self.logger.error(f"Error getting data for {symbol}: {e}")
             return None
     
+    def get_candles_batch(self, requests: List[Tuple[str, str]], count: int = 500) -> Dict[Tuple[str, str], Optional[Candles]]:
+        """Obtener velas de varios (símbolo, temporalidad) en una sola pasada"""
+        return {
+            (symbol, timeframe): self.get_candles(symbol, timeframe, count)
+            for symbol, timeframe in requests
+        }
+    
     def get_current_price(self, symbol: str) -> Optional[Dict]:
         """Obtener precio actual de un símbolo"""
         if not self.connected:
             return None
         
         try:
-            tick = mt5.symbol_info_tick(symbol)
+            tick = self.mt5.symbol_info_tick(symbol)
             if tick is None:
                 return None
             
@@ -285,24 +311,36 @@ class MT5DataProvider:
             self.logger.error(f"Error getting current price for {symbol}: {e}")
             return None
     
+    def get_server_time(self, symbol: str = "EURUSD") -> Optional[int]:
+        """Hora del servidor de MT5 (epoch) según el último tick del símbolo"""
+        if not self.connected:
+            return None
+        
+        try:
+            tick = self.mt5.symbol_info_tick(symbol)
+            return int(tick.time) if tick else None
+        except Exception as e:
+            self.logger.error(f"Error getting server time: {e}")
+            return None
+    
     async def stream_prices(self, symbols: List[str], callback):
-        """Stream de precios en tiempo real"""
-        while self.connected:
-            try:
-                prices = {}
-                for symbol in symbols:
-                    price_data = self.get_current_price(symbol)
-                    if price_data:
-                        prices[symbol] = price_data
-                
-                if prices:
-                    await callback(prices)
-                
-                await asyncio.sleep(1)  # Actualizar cada segundo
-                
-            except Exception as e:
-                self.logger.error(f"Error in price stream: {e}")
-                await asyncio.sleep(5)
+        """Stream de precios en tiempo real (vía TickHub compartido, sólo cambios de bid/ask)"""
+        # Import diferido: tick_hub depende de este módulo
+        from .async_provider import AsyncMT5Provider
+        from .tick_hub import get_tick_hub
+        
+        subscription = get_tick_hub(AsyncMT5Provider(self)).subscribe(symbols)
+        try:
+            while self.connected:
+                try:
+                    prices = await subscription.get(timeout=5)
+                    if prices:
+                        await callback(prices)
+                except Exception as e:
+                    self.logger.error(f"Error in price stream: {e}")
+                    await asyncio.sleep(5)
+        finally:
+            subscription.close()
     
     def get_symbol_info(self, symbol: str) -> Optional[Dict]:
         """Obtener información detallada de un símbolo"""
@@ -310,7 +348,7 @@ class MT5DataProvider:
             return None
         
         try:
-            info = mt5.symbol_info(symbol)
+            info = self.mt5.symbol_info(symbol)
             if info is None:
                 return None
             
@@ -0,0 +1,180 @@
+from typing import Dict, Iterable, Optional, Set, Tuple
+import asyncio
+import logging
+
+from .async_provider import AsyncMT5Provider
+from .data_provider import MT5DataProvider
+
+
+class TickSubscription:
+    """
+    Suscripción a precios de un conjunto de símbolos.
+
+    Cada publicación es un dict {símbolo: precio} con los símbolos que cambiaron.
+    La cola es acotada: si el consumidor se atrasa se descarta la actualización
+    más antigua.
+    """
+
+    def __init__(self, hub: 'TickHub', symbols: Iterable[str], maxsize: int):
+        self.hub = hub
+        self.symbols: Set[str] = set(symbols)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def publish(self, prices: Dict[str, Dict]):
+        """Encolar sin bloquear (drop-oldest si la cola está llena)"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(prices)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Dict]]:
+        """Siguiente actualización; None si vence `timeout`"""
+        if timeout is None:
+            return await self.queue.get()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Dict]:
+        if self.closed:
+            raise StopAsyncIteration
+        return await self.queue.get()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub.unsubscribe(self)
+
+
+class TickHub:
+    """
+    Distribuidor compartido de ticks.
+
+    Consulta cada símbolo suscrito una sola vez por ciclo (en una única llamada
+    al hilo de MT5), sin importar cuántos consumidores haya, y publica sólo los
+    símbolos cuyo bid/ask cambió.
+    """
+
+    def __init__(self, provider: AsyncMT5Provider, interval: float = 1.0, queue_size: int = 100):
+        self.provider = provider
+        self.interval = interval
+        self.queue_size = queue_size
+        self._subscriptions: Set[TickSubscription] = set()
+        self._last_quotes: Dict[str, Tuple[float, float]] = {}
+        self._last_prices: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+        self.stats = {
+            'polls': 0,
+            'symbols_polled': 0,
+            'publications': 0,
+        }
+
+    def subscribe(self, symbols: Iterable[str], maxsize: Optional[int] = None) -> TickSubscription:
+        """Crear una suscripción; recibe de inmediato el último precio conocido"""
+        subscription = TickSubscription(self, symbols, maxsize or self.queue_size)
+        self._subscriptions.add(subscription)
+
+        snapshot = {s: self._last_prices[s] for s in subscription.symbols if s in self._last_prices}
+        if snapshot:
+            subscription.publish(snapshot)
+
+        self._ensure_running()
+        return subscription
+
+    def unsubscribe(self, subscription: TickSubscription):
+        self._subscriptions.discard(subscription)
+        subscription.closed = True
+        if not self._subscriptions:
+            self.stop()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _symbols(self) -> Set[str]:
+        symbols: Set[str] = set()
+        for subscription in self._subscriptions:
+            symbols |= subscription.symbols
+        return symbols
+
+    def _poll(self, symbols: Set[str]) -> Dict[str, Dict]:
+        """Leer los precios de todos los símbolos (se ejecuta en el hilo de MT5)"""
+        prices = {}
+        for symbol in symbols:
+            price_data = self.provider.provider.get_current_price(symbol)
+            if price_data:
+                prices[symbol] = price_data
+        return prices
+
+    async def _run(self):
+        """Loop de consulta: una ronda por intervalo para la unión de símbolos suscritos"""
+        while self._subscriptions:
+            try:
+                symbols = self._symbols()
+                if symbols and self.provider.connected:
+                    prices = await self.provider.run(self._poll, symbols, name='poll_ticks')
+                    self.stats['polls'] += 1
+                    self.stats['symbols_polled'] += len(symbols)
+                    self._publish(prices)
+
+                await asyncio.sleep(self.interval)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error in tick hub: {e}")
+                await asyncio.sleep(5)
+
+    def _publish(self, prices: Dict[str, Dict]):
+        changed = {}
+        for symbol, price_data in prices.items():
+            quote = (price_data['bid'], price_data['ask'])
+            if self._last_quotes.get(symbol) != quote:
+                self._last_quotes[symbol] = quote
+                self._last_prices[symbol] = price_data
+                changed[symbol] = price_data
+
+        if not changed:
+            return
+
+        for subscription in list(self._subscriptions):
+            update = {s: p for s, p in changed.items() if s in subscription.symbols}
+            if update:
+                subscription.publish(update)
+                self.stats['publications'] += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'subscriptions': len(self._subscriptions),
+            'symbols': sorted(self._symbols()),
+            'dropped': sum(s.dropped for s in self._subscriptions),
+        }
+
+
+# Un hub por MT5DataProvider: todas las fachadas asíncronas del mismo proveedor
+# comparten el sondeo, y el hub consulta la conexión de ese proveedor
+_tick_hubs: Dict[MT5DataProvider, TickHub] = {}
+
+
+def get_tick_hub(provider: AsyncMT5Provider) -> TickHub:
+    """Hub compartido del proveedor de datos de `provider` (se crea en la primera llamada)"""
+    hub = _tick_hubs.get(provider.provider)
+    if hub is None:
+        hub = _tick_hubs[provider.provider] = TickHub(provider)
+    return hub